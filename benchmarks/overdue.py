@@ -0,0 +1,79 @@
+"""
+The daily overdue run over --loans loans, of which --active are not returned yet and
+--overdue of those are past their due date. Runs against a throwaway test database.
+
+    uv run python -m benchmarks.overdue --loans 2000000
+"""
+
+import argparse
+import datetime as dt
+import random
+import time
+
+from benchmarks.views import fill_catalog  # sets up django
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+
+from catalog.models import Borrows
+from catalog.overdue import mark_overdue_loans
+
+BOOKS = 10_000
+
+
+def fill_loans(count, active, overdue, seed=0):
+    rng = random.Random(seed)
+    now = timezone.now()
+    # one active loan per (user, book) at most, every user borrows from their own range
+    users = User.objects.bulk_create(
+        User(username=f"reader{number}") for number in range(count // BOOKS + 1)
+    )
+
+    def loans():
+        for number in range(count):
+            due = now - dt.timedelta(days=rng.uniform(14, 365))
+            is_active = rng.random() < active
+            if is_active:
+                due = now + (-1 if rng.random() < overdue else 1) * dt.timedelta(
+                    days=rng.uniform(0, 14)
+                )
+            yield Borrows(
+                user=users[number // BOOKS],
+                book_id=number % BOOKS + 1,
+                due=due,
+                returned=None if is_active else due,
+            )
+
+    Borrows.objects.bulk_create(loans(), batch_size=5000)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--loans", type=int, default=1_000_000)
+    parser.add_argument("--active", type=float, default=0.2)
+    parser.add_argument("--overdue", type=float, default=0.1)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        fill_catalog(BOOKS)
+        fill_loans(args.loans, args.active, args.overdue)
+
+        for run in ("first run", "rerun", "full run"):
+            started = time.perf_counter()
+            marked = mark_overdue_loans(
+                batch_size=args.batch_size, full=run == "full run"
+            )
+            print(f"{run:>9}: {time.perf_counter() - started:6.2f}s, {marked} marked")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Requests per second of a mix of catalog readers and wishlist writers, with every read on the
+primary and with the catalog views reading from a replica refreshed in the background.
+Both databases are SQLite files in a temporary directory.
+
+    uv run python -m benchmarks.replica --books 10000 --readers 8 --writers 2 --seconds 10
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.views import fill_catalog  # sets up django
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from the_library.replica import copy_database
+
+
+def reader(client, books, counts):
+    page = random.randint(1, max(books // 20, 1))
+    response = client.get(reverse("books"), {"page": page})
+    counts["reads" if response.status_code < 400 else "errors"] += 1
+
+
+def writer(client, books, counts):
+    url = reverse("wishlist", args=[random.randint(1, books)])
+    response = client.post(url, {"remove": random.choice(("", "1"))})
+    counts["writes" if response.status_code < 400 else "errors"] += 1
+
+
+def refresher(interval, stop, counts):
+    while not stop.wait(interval):
+        copy_database()
+        counts["refreshes"] += 1
+
+
+def work(request, client, books, stop, counts):
+    # every thread has its own counts and its own database connections
+    while not stop.is_set():
+        try:
+            request(client, books, counts)
+        except Exception:  # "database is locked" once the busy timeout runs out
+            counts["errors"] += 1
+    connections.close_all()
+
+
+def run(args, clients, routed):
+    settings.REPLICA_READ_VIEWS = ["books"] if routed else []
+    copy_database()
+
+    stop = threading.Event()
+    counts = [
+        dict.fromkeys(("reads", "writes", "errors", "refreshes"), 0) for _ in clients
+    ]
+    threads = [
+        threading.Thread(
+            target=work,
+            args=(
+                reader if number < args.readers else writer,
+                client,
+                args.books,
+                stop,
+                counts[number],
+            ),
+        )
+        for number, client in enumerate(clients)
+    ]
+    if routed:
+        counts.append({"refreshes": 0})
+        threads.append(
+            threading.Thread(target=refresher, args=(args.refresh, stop, counts[-1]))
+        )
+
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    total = {key: sum(count.get(key, 0) for count in counts) for key in counts[0]}
+    print(
+        f"{'replica' if routed else 'primary':>8}:"
+        f" {total['reads'] / args.seconds:8.1f} reads/s"
+        f" {total['writes'] / args.seconds:8.1f} writes/s"
+        f" {total['errors']:>5} errors {total['refreshes']:>4} refreshes"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--refresh", type=float, default=2, metavar="SECONDS")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # files rather than the in-memory test database, the locking is what is measured
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "primary")
+        connections.settings[settings.REPLICA_DATABASE] = {
+            **connection.settings_dict,
+            "NAME": os.path.join(directory, "replica"),
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            fill_catalog(args.books)
+            copy_database()
+            clients = []
+            for number in range(args.readers + args.writers):
+                User.objects.create_user(username=f"bench{number}", password="bench")
+                client = Client()
+                client.login(username=f"bench{number}", password="bench")
+                client.get(reverse("index"))  # warms the session cache
+                clients.append(client)
+
+            for routed in (False, True):
+                run(args, clients, routed)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
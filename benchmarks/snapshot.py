@@ -0,0 +1,104 @@
+"""
+Book list searches against a synthetic catalog snapshot, and what mapping it costs a worker.
+The file is written to a temporary directory, the database is not touched.
+
+    uv run python -m benchmarks.snapshot --books 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "the_library.settings")
+
+import django
+
+django.setup()
+
+from catalog import snapshot  # noqa: E402
+
+WORDS = (
+    "python django library river night garden stone letter winter house "
+    "shadow glass music city ocean iron silver secret empire star"
+).split()
+
+
+def rss_mb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def synthetic_rows(count, seed=0):
+    rng = random.Random(seed)
+    rows = [
+        (
+            book_id,
+            f"{9780000000000 + book_id}",
+            f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+            rng.randint(1800, 2025),
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5))).title(),
+            rng.choice(("English", "French", "German")),
+        )
+        for book_id in range(1, count + 1)
+    ]
+    rows.sort(key=lambda row: (row[4], row[0]))
+    return rows
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "catalog.snapshot"
+
+        started = time.perf_counter()
+        snapshot.write_snapshot(path, 1, synthetic_rows(args.books))
+        print(f"{'write':>24}: {time.perf_counter() - started:8.2f}s")
+        print(f"{'file size':>24}: {path.stat().st_size / 2**20:8.1f} MB")
+
+        before = rss_mb()
+        mapped = snapshot.CatalogSnapshot(path)
+        first_page = lambda result: result[:20]  # noqa: E731
+
+        for label, function in (
+            ("first page", lambda: first_page(snapshot.search(mapped))),
+            (
+                "first page by year",
+                lambda: first_page(snapshot.search(mapped, sort="publication_year")),
+            ),
+            ("title search", lambda: first_page(snapshot.search(mapped, "garden"))),
+            (
+                "title and author",
+                lambda: first_page(
+                    snapshot.search(mapped, "garden", "stone", match_all=True)
+                ),
+            ),
+            ("no match", lambda: first_page(snapshot.search(mapped, "zzz"))),
+        ):
+            print(f"{label:>24}: {timed(function, args.repeat):8.1f} ms")
+
+        # pages touched by the searches are shared page cache, not private memory
+        print(f"{'worker RSS growth':>24}: {rss_mb() - before:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Startup cost of a single web worker: django.setup(), the WSGI handler (middleware) and the
+URLconf import (which pulls in every view module), plus the resulting RSS.
+Each run is a fresh interpreter, just like a newly forked worker.
+
+    uv run python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import json, os, resource, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "the_library.settings")
+
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+
+# the redirect middleware reverses urls in __init__, so this usually imports the URLconf too
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+handler_done = time.perf_counter()
+
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_done = time.perf_counter()
+
+def peak_rss_mb():
+    # ru_maxrss survives exec() on Linux, so it would report the parent's peak when the
+    # parent is big (e.g. the test runner); VmHWM belongs to this process' own memory map
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+print(json.dumps({
+    "setup_ms": (setup_done - start) * 1000,
+    "handler_ms": (handler_done - setup_done) * 1000,
+    "urlconf_ms": (urls_done - handler_done) * 1000,
+    "total_ms": (urls_done - start) * 1000,
+    "max_rss_mb": peak_rss_mb(),
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def measure_worker_startup(python=sys.executable):
+    """
+    Boots a worker in a fresh interpreter and returns its timings, peak RSS and loaded modules.
+    """
+    result = subprocess.run(
+        [python, "-c", PROBE],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure_worker_startup() for _ in range(args.runs)]
+
+    for key in ("setup_ms", "handler_ms", "urlconf_ms", "total_ms", "max_rss_mb"):
+        values = [run[key] for run in runs]
+        print(
+            f"{key:>12}: median {statistics.median(values):8.1f}"
+            f"  min {min(values):8.1f}  max {max(values):8.1f}"
+        )
+    print(f"{'modules':>12}: {len(runs[-1]['modules'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Stock-take reconciliation of a catalog of --books books, where --changed of the rows differ.
+Runs against a throwaway test database.
+
+    uv run python -m benchmarks.stock_take --books 1000000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.views import fill_catalog  # sets up django
+
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+from catalog.ingest import reconcile_stock
+
+
+def write_stock_take(path, books, changed, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w") as out:
+        out.write("book_id,total_copies\n")
+        for book_id in range(1, books + 1):
+            # fill_catalog gives every book 2 copies
+            total = rng.randint(3, 5) if rng.random() < changed else 2
+            out.write(f"{book_id},{total}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--changed", type=float, default=0.1)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        fill_catalog(args.books)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "stock.csv"
+            write_stock_take(path, args.books, args.changed)
+
+            for dry_run in (True, False):
+                started = time.perf_counter()
+                options = {"batch_size": args.batch_size} if args.batch_size else {}
+                report = reconcile_stock(path, dry_run=dry_run, **options)
+                print(
+                    f"{'dry run' if dry_run else 'applied':>8}:"
+                    f" {time.perf_counter() - started:6.2f}s,"
+                    f" {report['changed']} changed, {report['unchanged']} unchanged,"
+                    f" {len(report['invalid'])} invalid"
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
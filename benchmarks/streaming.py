@@ -0,0 +1,82 @@
+"""
+Time to first byte, total time and bytes on the wire of the book list at 20, 200 and 2000
+rows, rendered in one go or streamed, with and without compression.
+
+    uv run python -m benchmarks.streaming --runs 10
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks.views import fill_catalog  # sets up django
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from catalog.views import BookListView
+from the_library.middleware import compression
+
+PAGE_SIZES = (20, 200, 2000)
+
+
+def measure(client, per_page, encoding):
+    started = time.perf_counter()
+    response = client.get(
+        reverse("books"), {"per_page": per_page}, headers={"accept-encoding": encoding}
+    )
+    if not response.streaming:
+        elapsed = time.perf_counter() - started
+        return elapsed, elapsed, len(response.content)
+
+    chunks = iter(response.streaming_content)
+    size = len(next(chunks))
+    first_byte = time.perf_counter() - started
+    size += sum(len(chunk) for chunk in chunks)
+    return first_byte, time.perf_counter() - started, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        fill_catalog(max(PAGE_SIZES))
+        User.objects.create_user(username="bench", password="bench")
+        client = Client()
+        client.login(username="bench", password="bench")
+        client.get(reverse("index"))
+
+        encodings = ["identity", "gzip"] + (["br"] if compression.brotli else [])
+        print(
+            f"{'rows':>5} {'mode':>9} {'encoding':>9} {'ttfb ms':>9}"
+            f" {'total ms':>9} {'bytes':>9}"
+        )
+        for per_page in PAGE_SIZES:
+            for streamed in (False, True):
+                BookListView.stream_rows = streamed
+                for encoding in encodings:
+                    measure(client, per_page, encoding)  # warm-up
+                    runs = [
+                        measure(client, per_page, encoding) for _ in range(args.runs)
+                    ]
+                    first_byte, total, size = (
+                        statistics.median(values) for values in zip(*runs)
+                    )
+                    print(
+                        f"{per_page:>5} {'streamed' if streamed else 'rendered':>9}"
+                        f" {encoding:>9} {first_byte * 1000:>9.1f}"
+                        f" {total * 1000:>9.1f} {size:>9.0f}"
+                    )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
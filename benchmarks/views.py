@@ -0,0 +1,132 @@
+"""
+Wall-clock microbenchmarks for the catalog endpoints, compared against a JSON baseline.
+Runs against a throwaway test database filled with --books books.
+
+    uv run python -m benchmarks.views --books 1000 --update   # record the baseline
+    uv run python -m benchmarks.views --books 1000            # exits 1 on a regression
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "the_library.settings")
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from catalog.tests.utils import create_books  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parent / "views_baseline.json"
+THRESHOLD = 0.25  # a median this much slower than the baseline is a regression
+
+
+def fill_catalog(count):
+    create_books(count, total_copies=2, varied=True)
+
+
+def median_ms(request, runs):
+    timings = []
+    for run in range(runs):
+        started = time.perf_counter()
+        response = request(run)
+        timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.status_code} from {response.request}")
+    return statistics.median(timings)
+
+
+def run_benchmarks(books, runs):
+    User.objects.create_user(username="bench", password="bench")
+    client = Client()
+    client.login(username="bench", password="bench")
+    client.get(reverse("index"))  # warms the session cache
+
+    wishlisted = reverse("wishlist", args=[1])
+    # the titles are padded to the width of the largest book_id, this finds books 100-199
+    searched = f"Title {1:0{len(str(books)) - 2}d}"
+    endpoints = {
+        "index": lambda run: client.get(reverse("index")),
+        "books": lambda run: client.get(reverse("books")),
+        "books_search": lambda run: client.get(
+            reverse("books"),
+            {"title": searched, "author": "Author 1", "search_type": "0"},
+        ),
+        "books_search_form": lambda run: client.get(reverse("books_search")),
+        # a different book every run, a second borrow of the same book is a no-op
+        "borrow": lambda run: client.post(
+            reverse("borrow", args=[2 + run % (books - 1)])
+        ),
+        # adds on even runs and removes on odd ones
+        "wishlist": lambda run: (
+            client.post(wishlisted, {"remove": "1"})
+            if run % 2
+            else client.post(wishlisted)
+        ),
+    }
+
+    results = {}
+    for name, request in endpoints.items():
+        request(0)  # warm-up, fills the caches a steady-state server would have
+        results[name] = median_ms(request, runs)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, value in results.items():
+        before = baseline.get(name)
+        change = "" if before is None else f"{(value - before) / before:+7.1%}"
+        print(f"{name:>18}: {value:8.2f} ms  {change}")
+        if before is not None and value > before * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument(
+        "--update", action="store_true", help="Store the results as the new baseline."
+    )
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        fill_catalog(args.books)
+        results = run_benchmarks(args.books, args.runs)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    # baselines are per catalog size, one file can hold several
+    stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    key = str(args.books)
+    regressions = compare(results, stored.get(key, {}), args.threshold)
+
+    if args.update or key not in stored:
+        stored[key] = results
+        args.baseline.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline for {args.books} books written to {args.baseline}.")
+    elif regressions:
+        print(f"Slower than the baseline by more than {args.threshold:.0%}: ", end="")
+        print(", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,251 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from django.utils.text import smart_split, unescape_string_literal
 
-from .models import Book, Availability
+from .models import (
+    Book,
+    Availability,
+    Borrows,
+    Wishlist,
+    AmazonLink,
+    OverdueNotice,
+)
+from .paginators import EstimatedCountPaginator
+from .signals import batched_removed_interactions
+from .versioning import batched_catalog_changes, bump_catalog_version
 
 
-admin.site.register(Book)
-admin.site.register(Availability)
+class CatalogModelAdmin(admin.ModelAdmin):
+    # the catalog tables can get to millions of rows, so no exact COUNT(*) on the changelists
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    # one catalog version bump per admin action, not one per row the signals see. Deleting
+    # N books cascades to their availability, loans and wishlist items, whose removals are
+    # recorded for build_recommendations in one bulk insert
+    def save_model(self, request, obj, form, change):
+        with batched_catalog_changes():
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with batched_catalog_changes(), batched_removed_interactions():
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with batched_catalog_changes(), batched_removed_interactions():
+            super().delete_queryset(request, queryset)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        The admin search, with conditions that can all seek an index. SQLite only uses
+        indexes for ORed conditions when every one of them can, so `^field` is a prefix
+        LIKE on a column with a NOCASE index, `=field` is an exact match (not Django's
+        iexact) and is left out for terms the field can't hold, and fields of a related
+        model are matched in a subquery on the foreign key instead of through a join.
+        """
+        if not search_term:
+            return queryset, False
+
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            conditions = [
+                search_condition(queryset.model, search_field, bit)
+                for search_field in self.get_search_fields(request)
+            ]
+            conditions = [condition for condition in conditions if condition]
+            if not conditions:
+                return queryset.none(), False
+            queryset = queryset.filter(Q(*conditions, _connector=Q.OR))
+        return queryset, False
+
+
+def search_condition(model, search_field, term):
+    """
+    The Q for one of the search_fields, None when `term` can't be a value of the field.
+    """
+    path = search_field.lstrip("^=")
+    relation, _, rest = path.partition("__")
+    if rest:
+        related = model._meta.get_field(relation).related_model
+        condition = search_condition(related, search_field[: -len(path)] + rest, term)
+        if condition is None:
+            return None
+        return Q(**{f"{relation}__in": related._default_manager.filter(condition)})
+
+    try:
+        value = model._meta.get_field(path).to_python(term)
+    except ValidationError:  # e.g. a title in a book_id search
+        return None
+    if search_field.startswith("^"):
+        return Q(**{f"{path}__istartswith": value})
+    if search_field.startswith("="):
+        return Q(**{path: value})
+    return Q(**{f"{path}__icontains": value})
+
+
+class StockListFilter(admin.SimpleListFilter):
+    # a fixed list of choices, the default field filter would run a DISTINCT over the table
+    title = "stock"
+    parameter_name = "stock"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("available", "Available to borrow"),
+            ("out", "Out of stock"),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "available":
+            return queryset.filter(available_copies__gt=0)
+        if self.value() == "out":
+            return queryset.filter(available_copies__lte=0)
+        return queryset
+
+
+class LanguageListFilter(admin.SimpleListFilter):
+    # fixed choices like StockListFilter, the default field filter would run a SELECT DISTINCT
+    # language over the whole catalog on every changelist page. A choice is an IN on the
+    # language codes, which seeks the book_language_year_idx index
+    title = "language"
+    parameter_name = "language"
+    LANGUAGES = {
+        "english": ("English", ("eng", "en-US", "en-GB", "en-CA")),
+        "spanish": ("Spanish", ("spa",)),
+        "french": ("French", ("fre",)),
+        "german": ("German", ("ger",)),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(value, name) for value, (name, _) in self.LANGUAGES.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() in self.LANGUAGES:
+            _, codes = self.LANGUAGES[self.value()]
+            return queryset.filter(language__in=codes)
+        return queryset
+
+
+@admin.register(Book)
+class BookAdmin(CatalogModelAdmin):
+    list_display = ("book_id", "title", "authors", "publication_year", "language")
+    list_filter = (LanguageListFilter,)
+    # exact and prefix lookups only, these seek the pk/isbn index and the NOCASE indexes on
+    # title/authors where the default `icontains` would scan the whole table
+    search_fields = ("=book_id", "=isbn", "^title", "^authors")
+    # ending the ordering with the pk stops the admin from adding its own tiebreaker
+    ordering = ("title", "book_id")
+
+
+@admin.register(Availability)
+class AvailabilityAdmin(CatalogModelAdmin):
+    list_display = ("book", "available_copies", "total_copies")
+    list_select_related = ("book",)  # __str__ reads book.title
+    list_filter = (StockListFilter,)
+    search_fields = ("=book__book_id", "=book__isbn", "^book__title")
+    autocomplete_fields = ("book",)
+    actions = ("add_copy", "remove_copy")
+    ordering = ("book_id",)  # the pk, pages don't overlap or skip rows
+
+    @admin.action(description="Add one copy to the selected books")
+    def add_copy(self, request, queryset):
+        # one UPDATE for the whole selection, no instance is loaded
+        updated = queryset.update(
+            total_copies=F("total_copies") + 1,
+            available_copies=F("available_copies") + 1,
+        )
+        bump_catalog_version()  # update() doesn't send signals
+        self.message_user(request, f"Added one copy to {updated} books.")
+
+    @admin.action(description="Remove one available copy from the selected books")
+    def remove_copy(self, request, queryset):
+        # only copies on the shelf can be removed, borrowed ones still have to come back
+        updated = queryset.filter(available_copies__gt=0).update(
+            total_copies=F("total_copies") - 1,
+            available_copies=F("available_copies") - 1,
+        )
+        bump_catalog_version()
+        self.message_user(request, f"Removed one copy from {updated} books.")
+
+
+class ActiveLoanListFilter(admin.SimpleListFilter):
+    title = "status"
+    parameter_name = "status"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("active", "Borrowed"),
+            ("overdue", "Overdue"),
+            ("returned", "Returned"),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "active":
+            return queryset.filter(returned__isnull=True)
+        if self.value() == "overdue":
+            return queryset.filter(returned__isnull=True, overdue=True)
+        if self.value() == "returned":
+            return queryset.filter(returned__isnull=False)
+        return queryset
+
+
+@admin.register(Borrows)
+class BorrowsAdmin(CatalogModelAdmin):
+    list_display = ("user", "book", "created", "due", "returned", "overdue")
+    list_select_related = ("user", "book")
+    list_filter = (ActiveLoanListFilter,)
+    # whole usernames, auth_user's unique index on username can't serve a LIKE
+    search_fields = ("=book__book_id", "^book__title", "=user__username")
+    autocomplete_fields = ("user", "book")
+
+
+@admin.register(OverdueNotice)
+class OverdueNoticeAdmin(CatalogModelAdmin):
+    list_display = ("user", "loan", "created")
+    list_select_related = ("user", "loan__book", "loan__user")
+    search_fields = ("=user__username",)
+    raw_id_fields = ("loan",)
+    autocomplete_fields = ("user",)
+
+
+@admin.register(Wishlist)
+class WishlistAdmin(CatalogModelAdmin):
+    list_display = ("user", "book")
+    list_select_related = ("user", "book")
+    search_fields = ("=book__book_id", "^book__title", "=user__username")
+    autocomplete_fields = ("user", "book")
+
+
+class LinkHealthListFilter(admin.SimpleListFilter):
+    title = "health"
+    parameter_name = "health"
+
+    def lookups(self, request, model_admin):
+        return (
+            ("alive", "Alive"),
+            ("broken", "Broken"),
+            ("unchecked", "Not checked yet"),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == "alive":
+            return queryset.filter(status__lt=400)
+        if self.value() == "broken":
+            return queryset.filter(last_checked__isnull=False).exclude(status__lt=400)
+        if self.value() == "unchecked":
+            return queryset.filter(last_checked__isnull=True)
+        return queryset
+
+
+@admin.register(AmazonLink)
+class AmazonLinkAdmin(CatalogModelAdmin):
+    list_display = ("book", "url", "status", "last_checked", "latency_ms")
+    list_filter = (LinkHealthListFilter,)
+    # written by check_amazon_links
+    readonly_fields = ("status", "last_checked", "latency_ms", "etag", "last_modified")
+    list_select_related = ("book",)
+    # no url prefix, every link starts with the same one
+    search_fields = ("=book__book_id", "^book__title")
+    autocomplete_fields = ("book",)
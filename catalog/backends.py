@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that keeps the logged-in user in the cache, so AuthenticationMiddleware
+    doesn't need a query against auth_user on every request.
+    Cached users are dropped on save/delete (see catalog.signals), a queryset `update()` on
+    User bypasses that, so only use it together with `invalidate_cached_user`.
+    Only safe with a cache shared by all workers (settings.SHARED_CACHE), a dropped entry
+    stays in the other workers' LocMemCache otherwise.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+
+        if user is None:
+            user = super().get_user(user_id)  # None for missing or inactive users
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+
+        return user
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
@@ -0,0 +1,73 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Case, Count, F, When
+
+# facet counts only change with the books themselves, so they are cached under the books
+# version: loans and wishlists don't throw them away, and the GROUP BY runs once per search
+CACHE_TIMEOUT = 60 * 60
+
+
+def decade_expression():
+    # integer division truncates towards zero, shift BC years so -5 lands in -10 like floor would
+    year = F("publication_year")
+    return Case(
+        When(publication_year__lt=0, then=(year - 9) / 10 * 10),
+        default=year / 10 * 10,
+    )
+
+
+def parse_decade(value):
+    try:
+        decade = int(value)
+    except (TypeError, ValueError):
+        return None
+    return decade if decade % 10 == 0 else None
+
+
+def filter_books(queryset, language=None, decade=None):
+    """
+    Applies the facet selection, a decade is a range on publication_year so its index is used.
+    """
+    if language:
+        queryset = queryset.filter(language=language)
+    if decade is not None:
+        queryset = queryset.filter(
+            publication_year__gte=decade, publication_year__lte=decade + 9
+        )
+    return queryset
+
+
+def facet_counts(queryset, version, search_key, language=None, decade=None):
+    """
+    Returns {"language": [(value, count)], "decade": [(value, count)]} for the books in
+    `queryset` (the search without any facet selected). Each facet is counted with the other
+    facet's selection applied but not its own, so every option shows how many books picking it
+    would give. Both come out of a single grouped query on (language, decade), which is cached
+    for the books `version` and the search (`search_key`), so picking facets never runs it
+    again.
+    """
+    digest = hashlib.md5(repr(search_key).encode()).hexdigest()
+    key = f"facets:{version}:{digest}"
+    groups = cache.get(key)
+    if groups is None:
+        groups = list(
+            queryset.order_by()
+            .annotate(decade=decade_expression())
+            .values_list("language", "decade")
+            .annotate(books=Count("pk"))
+        )
+        cache.set(key, groups, CACHE_TIMEOUT)
+
+    languages = {}
+    decades = {}
+    for group_language, group_decade, books in groups:
+        if decade is None or group_decade == decade:
+            languages[group_language] = languages.get(group_language, 0) + books
+        if not language or group_language == language:
+            decades[group_decade] = decades.get(group_decade, 0) + books
+
+    return {
+        "language": sorted(languages.items(), key=lambda item: (-item[1], item[0])),
+        "decade": sorted(decades.items()),
+    }
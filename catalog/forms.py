@@ -11,3 +11,8 @@ class BookSearch(forms.Form):
     title = forms.CharField(required=False)
     author = forms.CharField(required=False)
     search_type = forms.ChoiceField(choices=SEARCH_CHOICES, required=True)
+
+
+class StockTakeForm(forms.Form):
+    file = forms.FileField(help_text="A csv with book_id or isbn and total_copies columns.")
+    dry_run = forms.BooleanField(required=False, help_text="Only show the report.")
@@ -0,0 +1,250 @@
+# Everything that needs pandas lives here. Don't import this module at the top of views.py or
+# any other module on the request path, pandas adds hundreds of ms and tens of MB to every
+# worker (see catalog/tests/test_startup.py).
+import random
+
+import pandas as pd
+from django.db import transaction
+from django.db.models import F
+
+from .models import Book, Availability
+from .signals import batched_removed_interactions
+from .versioning import batched_catalog_changes
+
+CSV_COLUMNS = {
+    "Id": "book_id",
+    "ISBN": "isbn",
+    "Authors": "authors",
+    "Publication Year": "publication_year",
+    "Title": "title",
+    "Language": "language",
+}
+
+
+def random_availability(book):
+    total_copies = random.randint(1, 5)
+    available_copies = random.randint(-total_copies, total_copies)
+
+    # Give more chance to cases where book is not available to borrow
+    available_copies = 0 if available_copies < 0 else available_copies
+
+    return Availability(
+        book=book, total_copies=total_copies, available_copies=available_copies
+    )
+
+
+@transaction.atomic
+def reset_catalog(csv_path):
+    """
+    Replaces the whole catalog with the books in the csv file and gives them random availability.
+    """
+    with batched_catalog_changes(books=True):  # bulk_create sends no signals
+        with batched_removed_interactions():
+            Book.objects.all().delete()
+        load_books(csv_path)
+
+
+def load_books(csv_path):
+    df = pd.read_csv(csv_path).rename(columns=CSV_COLUMNS)
+
+    books = Book.objects.bulk_create(
+        Book(**record) for record in df[list(CSV_COLUMNS.values())].to_dict("records")
+    )
+    # Let's add some random availability
+    Availability.objects.bulk_create(random_availability(book) for book in books)
+
+
+# stock-take reconciliation: a csv of (book_id or isbn, total_copies) is compared with the
+# current Availability rows and only the differences are written
+
+STOCK_TAKE_COLUMNS = ("book_id", "isbn", "total_copies")
+
+
+def read_stock_take(csv_file):
+    """
+    Reads a stock-take csv with a `total_copies` column and a `book_id` and/or `isbn` column.
+    Everything is read as text, rows that don't parse are reported instead of failing the file.
+    """
+    stock = pd.read_csv(csv_file, dtype=str, keep_default_na=False)
+    stock.columns = stock.columns.str.strip().str.lower()
+    if "total_copies" not in stock or not {"book_id", "isbn"} & set(stock.columns):
+        raise ValueError(
+            "The file needs a total_copies column and a book_id or isbn column."
+        )
+
+    for column in STOCK_TAKE_COLUMNS:
+        if column not in stock:
+            stock[column] = ""
+        stock[column] = stock[column].str.strip()
+    stock = stock[list(STOCK_TAKE_COLUMNS)]
+    stock.insert(0, "line", stock.index + 2)  # the header is line 1
+    return stock
+
+
+def current_stock():
+    rows = Book.objects.values_list(
+        "book_id",
+        "isbn",
+        "availability__total_copies",
+        "availability__available_copies",
+    ).iterator(chunk_size=10_000)
+    current = pd.DataFrame.from_records(
+        rows, columns=["book_id", "isbn", "old_total", "old_available"]
+    )
+    # books without an Availability have NaN here
+    return current.astype({"old_total": float, "old_available": float})
+
+
+def diff_stock(stock, current):
+    """
+    Matches the stock-take rows to books and works out the new numbers. Returns the rows with
+    book, old_total, old_available, total, available and a `status` of "new" (the book had no
+    Availability), "changed", "unchanged" or "invalid", with a `reason` for invalid rows.
+    Copies that are on loan (total - available) stay on loan, so available = total - on loan.
+    """
+    ids = pd.to_numeric(stock["book_id"], errors="coerce")
+    by_isbn = stock["isbn"].map(
+        pd.Series(current["book_id"].values, index=current["isbn"])
+    )
+    total = pd.to_numeric(stock["total_copies"], errors="coerce")
+
+    stock = stock.assign(book=ids.where(stock["book_id"] != "", by_isbn), total=total)
+    stock = stock.merge(
+        current[["book_id", "old_total", "old_available"]],
+        how="left",
+        left_on="book",
+        right_on="book_id",
+        suffixes=("", "_current"),
+    ).drop(columns="book_id_current")
+
+    on_loan = (stock["old_total"] - stock["old_available"]).clip(lower=0).fillna(0)
+    stock["available"] = stock["total"] - on_loan
+
+    # in this order, a row gets the first reason that applies. each check gets the rows that
+    # passed the ones before, so e.g. a row of an unknown book doesn't count as a duplicate
+    checks = [
+        (
+            lambda valid: stock["total"].isna()
+            | (stock["total"] < 0)
+            | (stock["total"] % 1 != 0),
+            "total_copies is not a whole number of 0 or more",
+        ),
+        (
+            lambda valid: (stock["book_id"] == "") & (stock["isbn"] == ""),
+            "no book_id or isbn",
+        ),
+        (
+            lambda valid: (stock["book_id"] != "") & ~ids.isin(current["book_id"]),
+            "unknown book",
+        ),
+        (lambda valid: (stock["isbn"] != "") & by_isbn.isna(), "unknown isbn"),
+        (
+            lambda valid: (stock["book_id"] != "")
+            & (stock["isbn"] != "")
+            & (stock["book"] != by_isbn),
+            "book_id and isbn are different books",
+        ),
+        (
+            lambda valid: stock["book"].where(valid).duplicated(keep=False),
+            "the book is listed more than once",
+        ),
+        (lambda valid: stock["available"] < 0, "fewer copies than are on loan"),
+    ]
+    stock["reason"] = ""
+    for check, reason in checks:
+        valid = stock["reason"] == ""
+        stock.loc[valid & check(valid), "reason"] = reason
+
+    valid = stock["reason"] == ""
+    stock["status"] = "invalid"
+    stock.loc[valid & stock["old_total"].isna(), "status"] = "new"
+    stock.loc[valid & (stock["old_total"] == stock["total"]), "status"] = "unchanged"
+    stock.loc[
+        valid & stock["old_total"].notna() & (stock["old_total"] != stock["total"]),
+        "status",
+    ] = "changed"
+    return stock
+
+
+@transaction.atomic
+def reconcile_stock(csv_file, dry_run=False, batch_size=5000):
+    """
+    Applies a stock-take csv to Availability. Only new and changed rows are written, loans and
+    wishlists are not touched. Returns a report dict with the counts, the invalid rows and the
+    books with an Availability that the file didn't list (they are left as they are).
+    """
+    stock = read_stock_take(csv_file)
+    current = current_stock()
+    diff = diff_stock(stock, current)
+
+    counts = diff["status"].value_counts()
+    missing = current[
+        current["old_total"].notna() & ~current["book_id"].isin(diff["book"])
+    ]
+    report = {
+        "rows": len(diff),
+        "new": int(counts.get("new", 0)),
+        "changed": int(counts.get("changed", 0)),
+        "unchanged": int(counts.get("unchanged", 0)),
+        "invalid": diff.loc[
+            diff["status"] == "invalid",
+            ["line", "book_id", "isbn", "total_copies", "reason"],
+        ].to_dict("records"),
+        "missing": missing["book_id"].tolist(),
+        "dry_run": dry_run,
+    }
+    if dry_run:
+        return report
+
+    def rows(status, columns=("book", "total", "available")):
+        return diff.loc[diff["status"] == status, list(columns)].astype(int)
+
+    with batched_catalog_changes():
+        Availability.objects.bulk_create(
+            (
+                Availability(
+                    book_id=book, total_copies=total, available_copies=available
+                )
+                for book, total, available in rows("new").itertuples(index=False)
+            ),
+            batch_size=batch_size,
+        )
+        # the changed rows share a handful of (old total, total) pairs, so they are written
+        # as one UPDATE ... WHERE book_id IN (...) per pair and batch. bulk_update would build
+        # a CASE WHEN per row, which took ~1ms per row.
+        # The difference is applied to the row as it is now: a borrow or return since the read
+        # keeps its effect on available_copies, and a row whose total changed meanwhile or that
+        # has too many copies on loan by now is left alone and reported
+        changed = rows("changed", ("book", "old_total", "total")).groupby(
+            ["old_total", "total"]
+        )["book"]
+        conflicts = []
+        for (old_total, total), books in changed:
+            # the groupby keys are numpy ints, which sqlite3 binds as blobs inside an
+            # expression (Python 3.12+), so the F() update would be a silent no-op
+            old_total, total = int(old_total), int(total)
+            books = books.tolist()
+            for start in range(0, len(books), batch_size):
+                batch = books[start : start + batch_size]
+                updated = Availability.objects.filter(
+                    book_id__in=batch,
+                    total_copies=old_total,
+                    available_copies__gte=old_total - total,
+                ).update(
+                    total_copies=total,
+                    available_copies=F("available_copies") + (total - old_total),
+                )
+                if updated < len(batch):
+                    conflicts += (
+                        Availability.objects.filter(book_id__in=batch)
+                        .exclude(total_copies=total)
+                        .values_list("book_id", flat=True)
+                    )
+
+    if conflicts:
+        conflicting = diff[diff["book"].isin(conflicts) & (diff["status"] == "changed")]
+        report["changed"] -= len(conflicting)
+        report["invalid"] += conflicting.assign(
+            reason="changed while the stock-take was applied"
+        )[["line", "book_id", "isbn", "total_copies", "reason"]].to_dict("records")
+    return report
@@ -0,0 +1,265 @@
+import datetime as dt
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Book,
+    Borrows,
+    Wishlist,
+    JobCheckpoint,
+    PopularityCounter,
+    PopularityWindow,
+)
+
+# window name -> number of daily buckets, None is the all-time bucket
+WINDOWS = {
+    "week": 7,
+    "month": 30,
+    "all": None,
+}
+LONGEST_WINDOW = max(days for days in WINDOWS.values() if days)
+
+# the top N lists are cached for a short while, the counters themselves are always up to date
+CACHE_TIMEOUT = 60
+
+# the day the window totals were last recomputed for, see roll_windows
+WINDOWS_CHECKPOINT = "leaderboard_windows"
+
+
+def increment(model, rows):
+    """
+    Adds every row's `count` to the model's counter for the row's other fields, creating the
+    counters that don't exist yet. One INSERT ... ON CONFLICT DO UPDATE for all the rows, so
+    concurrent increments of the same counter all count.
+    """
+    opts = model._meta
+    fields = [opts.get_field(name) for name in rows[0]]
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    columns = ", ".join(quote(field.column) for field in fields)
+    keys = ", ".join(quote(field.column) for field in fields if field.name != "count")
+    values = ", ".join(["(" + ", ".join(["%s"] * len(fields)) + ")"] * len(rows))
+    params = [
+        field.get_db_prep_value(row[field.attname], connection)
+        for row in rows
+        for field in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) VALUES {values} "
+            f"ON CONFLICT ({keys}) DO UPDATE "
+            f'SET "count" = {table}."count" + excluded."count"',
+            params,
+        )
+
+
+def record_borrow(book_id, when):
+    kind = PopularityCounter.BORROWED
+    day = timezone.localdate(when)
+    increment(
+        PopularityCounter,
+        [
+            {"book_id": book_id, "kind": kind, "bucket": bucket, "count": 1}
+            for bucket in (day, PopularityCounter.ALL_TIME)
+        ],
+    )
+    windows = [
+        {"book_id": book_id, "kind": kind, "days": days, "count": 1}
+        for days in WINDOWS.values()
+        if days and day > timezone.localdate() - dt.timedelta(days=days)
+    ]
+    if windows:
+        increment(PopularityWindow, windows)
+
+
+def record_wishlist(book_id, amount):
+    if amount > 0:
+        increment(
+            PopularityCounter,
+            [
+                {
+                    "book_id": book_id,
+                    "kind": PopularityCounter.WISHLISTED,
+                    "bucket": PopularityCounter.ALL_TIME,
+                    "count": amount,
+                }
+            ],
+        )
+    else:
+        # never creates a row, the book may be on its way out through a cascade delete
+        PopularityCounter.objects.filter(
+            book_id=book_id,
+            kind=PopularityCounter.WISHLISTED,
+            bucket=PopularityCounter.ALL_TIME,
+        ).update(count=F("count") + amount)
+
+
+def top_books(kind, window="all", limit=10):
+    """
+    Returns [(book, count)] of the `limit` most borrowed/wishlisted books in the window.
+    All-time and, once roll_windows ran today, the windows read the first `limit` entries of
+    an index, neither depends on the size of the catalog or the loan history. Until then the
+    windows sum at most WINDOWS[window] daily buckets per book.
+    """
+    key = f"leaderboard:{kind}:{window}:{limit}"
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    days = WINDOWS[window]
+    if days is None:
+        rows = (
+            PopularityCounter.objects.filter(
+                kind=kind, bucket=PopularityCounter.ALL_TIME, count__gt=0
+            )
+            .order_by("-count", "book_id")
+            .values_list("book_id", "count")[:limit]
+        )
+    elif windows_rolled():
+        rows = (
+            PopularityWindow.objects.filter(kind=kind, days=days, count__gt=0)
+            .order_by("-count", "book_id")
+            .values_list("book_id", "count")[:limit]
+        )
+    else:
+        rows = (
+            window_buckets(kind, days, timezone.localdate())
+            .order_by("-total", "book_id")
+            .values_list("book_id", "total")[:limit]
+        )
+
+    rows = list(rows)
+    books = Book.objects.in_bulk([book_id for book_id, _ in rows])
+    result = [(books[book_id], count) for book_id, count in rows if book_id in books]
+
+    cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def window_buckets(kind, days, today):
+    """
+    The sum of every book's daily buckets in the `days` days up to `today`.
+    """
+    first_day = today - dt.timedelta(days=days - 1)
+    return (
+        PopularityCounter.objects.filter(
+            kind=kind, bucket__gte=first_day, bucket__gt=PopularityCounter.ALL_TIME
+        )
+        .values("book_id")
+        .annotate(total=Sum("count"))
+    )
+
+
+def windows_rolled():
+    today = timezone.localdate().isoformat()
+    key = f"leaderboard:rolled:{today}"
+    if cache.get(key):
+        return True
+
+    state = (
+        JobCheckpoint.objects.filter(name=WINDOWS_CHECKPOINT)
+        .values_list("state", flat=True)
+        .first()
+    )
+    rolled = bool(state) and state.get("day") == today
+    if rolled:  # only until the next roll, which is looked for from tomorrow on
+        cache.set(key, True, 24 * 60 * 60)
+    return rolled
+
+
+@transaction.atomic
+def roll_windows(today=None, batch_size=5000):
+    """
+    Recomputes the window totals from the daily buckets, so the day that left each window
+    drops out. Run daily after midnight, until then top_books sums the buckets itself.
+    Returns the number of totals written.
+    """
+    today = today or timezone.localdate()
+    # the delete first takes the write lock, no borrow is counted between the read and the write
+    PopularityWindow.objects.all().delete()
+    totals = [
+        PopularityWindow(
+            book_id=book_id, kind=PopularityCounter.BORROWED, days=days, count=total
+        )
+        for days in WINDOWS.values()
+        if days
+        for book_id, total in window_buckets(PopularityCounter.BORROWED, days, today)
+        .values_list("book_id", "total")
+        .iterator()
+    ]
+    PopularityWindow.objects.bulk_create(totals, batch_size=batch_size)
+
+    JobCheckpoint.objects.update_or_create(
+        name=WINDOWS_CHECKPOINT, defaults={"state": {"day": today.isoformat()}}
+    )
+    return len(totals)
+
+
+def prune_buckets(today=None):
+    """
+    Deletes the daily buckets that no window looks at anymore.
+    """
+    today = today or timezone.localdate()
+    cutoff = today - dt.timedelta(days=LONGEST_WINDOW - 1)
+    deleted, _ = PopularityCounter.objects.filter(
+        bucket__lt=cutoff, bucket__gt=PopularityCounter.ALL_TIME
+    ).delete()
+    return deleted
+
+
+@transaction.atomic
+def rebuild(batch_size=5000):
+    """
+    Recomputes every counter from Borrows and Wishlist, returns the number of counters written.
+    """
+    PopularityCounter.objects.all().delete()
+
+    cutoff = timezone.localdate() - dt.timedelta(days=LONGEST_WINDOW - 1)
+    daily = (
+        Borrows.objects.filter(  # a range on the created index
+            created__gte=timezone.make_aware(dt.datetime.combine(cutoff, dt.time.min))
+        )
+        .annotate(day=TruncDate("created"))
+        .values("book_id", "day")
+        .annotate(total=Count("id"))
+        .values_list("book_id", "day", "total")
+    )
+    all_time = (
+        Borrows.objects.values("book_id")
+        .annotate(total=Count("id"))
+        .values_list("book_id", "total")
+    )
+    wishlisted = (
+        Wishlist.objects.values("book_id")
+        .annotate(total=Count("id"))
+        .values_list("book_id", "total")
+    )
+
+    counters = [
+        PopularityCounter(
+            book_id=book_id, kind=PopularityCounter.BORROWED, bucket=day, count=total
+        )
+        for book_id, day, total in daily.iterator()
+    ]
+    counters += [
+        PopularityCounter(
+            book_id=book_id,
+            kind=kind,
+            bucket=PopularityCounter.ALL_TIME,
+            count=total,
+        )
+        for kind, rows in (
+            (PopularityCounter.BORROWED, all_time),
+            (PopularityCounter.WISHLISTED, wishlisted),
+        )
+        for book_id, total in rows.iterator()
+    ]
+    PopularityCounter.objects.bulk_create(counters, batch_size=batch_size)
+    roll_windows(batch_size=batch_size)
+
+    # cached top N lists catch up within CACHE_TIMEOUT
+    return len(counters)
@@ -0,0 +1,210 @@
+# Health checks for the AmazonLink urls, run by the check_amazon_links command.
+#
+# Links are checked concurrently on one event loop: a bounded semaphore caps the number of
+# open connections overall and HostLimiter caps how hard a single host is hit. A link that
+# answered with an ETag or Last-Modified before is re-checked with If-None-Match /
+# If-Modified-Since, so an unchanged page answers with a bodiless 304. Only the status line
+# and headers are read, the body is never downloaded.
+
+import asyncio
+import datetime as dt
+import http.client
+import io
+import ssl
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from urllib.parse import urljoin, urlsplit
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AmazonLink
+
+CHECK_TTL = dt.timedelta(days=1)
+CONCURRENCY = 50
+PER_HOST = 4  # open connections per host
+HOST_INTERVAL = 0.05  # seconds between two requests to the same host
+TIMEOUT = 10
+MAX_REDIRECTS = 3
+USER_AGENT = "the-library-linkcheck/1.0"
+
+CHECKED_FIELDS = ["status", "last_checked", "latency_ms", "etag", "last_modified"]
+
+
+class HostLimiter:
+    """
+    At most `per_host` requests in flight per host, and their starts `interval` seconds apart.
+    """
+
+    def __init__(self, per_host=PER_HOST, interval=HOST_INTERVAL):
+        self.interval = interval
+        self._slots = defaultdict(lambda: asyncio.Semaphore(per_host))
+        self._locks = defaultdict(asyncio.Lock)
+        self._next_start = defaultdict(float)
+
+    @asynccontextmanager
+    async def slot(self, host):
+        async with self._slots[host]:
+            async with self._locks[host]:
+                loop = asyncio.get_running_loop()
+                delay = self._next_start[host] - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self._next_start[host] = loop.time() + self.interval
+            yield
+
+
+async def fetch_headers(url, headers, ssl_context=None):
+    """
+    Sends a GET for `url` and returns (status, response headers), the body is not read.
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    if secure and ssl_context is None:
+        ssl_context = ssl.create_default_context()
+
+    reader, writer = await asyncio.open_connection(
+        parts.hostname,
+        port,
+        ssl=ssl_context if secure else None,
+        server_hostname=parts.hostname if secure else None,
+    )
+    try:
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {parts.netloc.rpartition('@')[2]}",
+            f"User-Agent: {USER_AGENT}",
+            "Accept: */*",
+            "Connection: close",
+        ]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+        head = await reader.readuntil(b"\r\n\r\n")
+        status_line, _, raw_headers = head.partition(b"\r\n")
+        status = int(status_line.split()[1])
+        return status, http.client.parse_headers(io.BytesIO(raw_headers))
+    finally:
+        writer.close()
+
+
+async def check_link(link, semaphore, limiter, timeout=TIMEOUT, ssl_context=None):
+    """
+    Checks a single link and updates its fields in place, nothing is saved.
+    """
+    conditional = {}
+    if link.etag:
+        conditional["If-None-Match"] = link.etag
+    if link.last_modified:
+        conditional["If-Modified-Since"] = link.last_modified
+
+    url = link.url
+    status = response = None
+    # only the requests count towards the latency and the timeout, waiting for a connection
+    # or for the host's turn doesn't make a link slow
+    elapsed = 0.0
+    async with semaphore:
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                async with limiter.slot(urlsplit(url).hostname):
+                    started = time.perf_counter()
+                    try:
+                        async with asyncio.timeout(timeout - elapsed):
+                            status, response = await fetch_headers(
+                                url, conditional, ssl_context
+                            )
+                    finally:
+                        elapsed += time.perf_counter() - started
+                if status not in (301, 302, 303, 307, 308):
+                    break
+                location = response.get("Location")
+                if not location:  # a redirect to nowhere
+                    status = response = None
+                    break
+                url = urljoin(url, location)
+                conditional = {}  # the validators belong to the original url
+            else:
+                # still redirecting after MAX_REDIRECTS, a loop or a chain too long to follow
+                status = response = None
+        except (
+            OSError,
+            TimeoutError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            http.client.HTTPException,
+            IndexError,
+            ValueError,
+        ):
+            # unreachable, too slow or not speaking HTTP
+            status = response = None
+
+    link.last_checked = timezone.now()
+    link.latency_ms = round(elapsed * 1000)
+    if status == 304:
+        # unchanged since the last successful check, keep its status and validators
+        link.status = link.status or 200
+    else:
+        link.status = status
+        if status is not None and status < 300:
+            link.etag = response.get("ETag", "")[:255]
+            link.last_modified = response.get("Last-Modified", "")[:64]
+        else:
+            link.etag = link.last_modified = ""
+    return link
+
+
+async def check_links(
+    links,
+    concurrency=CONCURRENCY,
+    per_host=PER_HOST,
+    interval=HOST_INTERVAL,
+    timeout=TIMEOUT,
+    ssl_context=None,
+):
+    semaphore = asyncio.BoundedSemaphore(concurrency)
+    limiter = HostLimiter(per_host, interval)
+    return await asyncio.gather(
+        *(check_link(link, semaphore, limiter, timeout, ssl_context) for link in links)
+    )
+
+
+def links_due(ttl=CHECK_TTL, now=None):
+    """
+    Links that were never checked or whose last check is older than `ttl`.
+    """
+    now = now or timezone.now()
+    return AmazonLink.objects.filter(
+        Q(last_checked__isnull=True) | Q(last_checked__lt=now - ttl)
+    ).order_by("id")
+
+
+def check_due_links(ttl=CHECK_TTL, batch_size=1000, **options):
+    """
+    Checks every link that is due, `batch_size` links per event loop run and per bulk_update.
+    Returns the checked links' (alive, broken) counts.
+    """
+    alive = broken = 0
+    # keyset over the ids, checked links drop out of links_due() while we go
+    last_id = 0
+    while True:
+        batch = list(links_due(ttl).filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+
+        asyncio.run(check_links(batch, **options))
+        AmazonLink.objects.bulk_update(batch, CHECKED_FIELDS)
+
+        last_id = batch[-1].id
+        for link in batch:
+            if link.is_alive:
+                alive += 1
+            else:
+                broken += 1
+
+    return alive, broken
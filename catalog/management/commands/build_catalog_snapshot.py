@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.snapshot import CatalogSnapshot, build_snapshot
+from catalog.versioning import get_books_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the catalog into the mmap snapshot the workers serve the book list from. "
+        "Only rebuilds when a book changed, --watch keeps doing that."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=settings.CATALOG_SNAPSHOT_PATH)
+        parser.add_argument(
+            "--watch",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running and check the books version every SECONDS.",
+        )
+        parser.add_argument("--force", action="store_true")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path:
+            raise CommandError(
+                "No snapshot path, set LIBRARY_CATALOG_SNAPSHOT or pass --path."
+            )
+
+        self.refresh(path, options["force"])
+        while options["watch"]:
+            time.sleep(options["watch"])
+            self.refresh(path, force=False)
+
+    def refresh(self, path, force):
+        # read before exporting: a write during the export bumps the version past the one
+        # stored in the file, so workers never serve the snapshot as current by mistake
+        version = get_books_version()
+
+        if not force:
+            try:
+                if CatalogSnapshot(path).version == version:
+                    return
+            except (FileNotFoundError, ValueError):
+                pass
+
+        started = time.perf_counter()
+        count = build_snapshot(path, version)
+        self.stdout.write(
+            f"Wrote {count} books at books version {version} "
+            f"in {time.perf_counter() - started:.2f}s."
+        )
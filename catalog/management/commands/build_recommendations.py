@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from catalog.models import JobCheckpoint
+
+CHECKPOINT = "recommendations"
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the 'readers also borrowed' neighbours from loans and wishlists. "
+        "After the first run only the books affected by new or removed loans and wishlist "
+        "items are recomputed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute the neighbours of every book.",
+        )
+        parser.add_argument("--top-k", type=int, default=10)
+
+    def handle(self, *args, **options):
+        # numpy is only needed by this command
+        from catalog.recommendations import (
+            build_neighbours,
+            drop_removed_interactions,
+            refresh_neighbours,
+        )
+
+        checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+        since = parse_datetime(checkpoint.state.get("since") or "")
+        # taken before reading, anything written while we run is picked up next time
+        started = timezone.now()
+
+        if options["full"] or since is None:
+            stored = build_neighbours(top_k=options["top_k"])
+            self.stdout.write(f"Rebuilt all neighbours, {stored} rows.")
+        else:
+            books, stored = refresh_neighbours(since, top_k=options["top_k"])
+            if books:
+                self.stdout.write(
+                    f"Refreshed the neighbours of {books} books, {stored} rows."
+                )
+            else:
+                self.stdout.write("Nothing changed since the last run.")
+
+        checkpoint.state = {"since": started.isoformat()}
+        checkpoint.save()
+        drop_removed_interactions(until=started)
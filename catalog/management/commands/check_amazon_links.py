@@ -0,0 +1,46 @@
+import datetime as dt
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog import linkcheck
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks the Amazon links that were never checked or whose last check is older "
+        "than --ttl hours, and stores their status, latency and check time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl",
+            type=float,
+            default=linkcheck.CHECK_TTL.total_seconds() / 3600,
+            metavar="HOURS",
+        )
+        parser.add_argument("--concurrency", type=int, default=linkcheck.CONCURRENCY)
+        parser.add_argument("--per-host", type=int, default=linkcheck.PER_HOST)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=linkcheck.HOST_INTERVAL,
+            help="Seconds between two requests to the same host.",
+        )
+        parser.add_argument("--timeout", type=float, default=linkcheck.TIMEOUT)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        alive, broken = linkcheck.check_due_links(
+            ttl=dt.timedelta(hours=options["ttl"]),
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            per_host=options["per_host"],
+            interval=options["interval"],
+            timeout=options["timeout"],
+        )
+        self.stdout.write(
+            f"Checked {alive + broken} links in {time.perf_counter() - started:.2f}s, "
+            f"{alive} alive and {broken} broken."
+        )
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired sessions in small batches. Meant to run periodically (cron), "
+        "unlike `clearsessions` it never holds the table lock for one huge DELETE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        if settings.SESSION_ENGINE.endswith("signed_cookies"):
+            self.stdout.write(
+                "Signed cookie sessions are not stored, nothing to clear."
+            )
+            return
+
+        now = timezone.now()
+        deleted = 0
+        while True:
+            # expire_date is indexed, so each batch is an index range scan
+            keys = list(
+                Session.objects.filter(expire_date__lt=now).values_list(
+                    "session_key", flat=True
+                )[:batch_size]
+            )
+            if not keys:
+                break
+            # cached_db only caches live sessions and the cache entries expire together with
+            # the session, so deleting the rows is enough
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+
+        self.stdout.write(f"Deleted {deleted} expired sessions.")
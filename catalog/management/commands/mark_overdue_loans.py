@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog import overdue
+
+
+class Command(BaseCommand):
+    help = (
+        "Marks the active loans past their due date as overdue and creates their notices. "
+        "Meant for a daily cron job, every run starts where the last one stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=overdue.BATCH_SIZE)
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Look at every active loan instead of starting at the checkpoint.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        marked = overdue.mark_overdue_loans(
+            batch_size=options["batch_size"], full=options["full"]
+        )
+        self.stdout.write(
+            f"Marked {marked} loans as overdue in {time.perf_counter() - started:.2f}s."
+        )
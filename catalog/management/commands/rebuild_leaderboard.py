@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from catalog import leaderboard
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the leaderboard counters from Borrows and Wishlist. "
+        "With --prune only recomputes the week and month totals and drops the daily buckets "
+        "no window uses anymore (run it daily, right after midnight)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["prune"]:
+            written = leaderboard.roll_windows()
+            deleted = leaderboard.prune_buckets()
+            self.stdout.write(
+                f"Recomputed {written} window totals, deleted {deleted} expired buckets."
+            )
+        else:
+            written = leaderboard.rebuild()
+            self.stdout.write(f"Rebuilt the leaderboard, {written} counters.")
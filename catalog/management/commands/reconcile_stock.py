@@ -0,0 +1,53 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Applies a stock-take csv of (book_id or isbn, total_copies) to the book "
+        "availabilities. Only rows that differ are written, loans are kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report without writing anything."
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--report", metavar="PATH", help="Write the invalid rows to a csv file."
+        )
+
+    def handle(self, *args, **options):
+        # pandas is only needed by this command and the stock-take view
+        from catalog.ingest import reconcile_stock
+
+        started = time.perf_counter()
+        try:
+            report = reconcile_stock(
+                options["path"],
+                dry_run=options["dry_run"],
+                batch_size=options["batch_size"],
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        self.stdout.write(
+            f"{report['rows']} rows in {time.perf_counter() - started:.2f}s: "
+            f"{report['new']} new, {report['changed']} changed, "
+            f"{report['unchanged']} unchanged, {len(report['invalid'])} invalid. "
+            f"{len(report['missing'])} books with copies were not in the file."
+        )
+        if report["dry_run"]:
+            self.stdout.write("Dry run, nothing was written.")
+
+        if options["report"]:
+            with open(options["report"], "w", newline="") as out:
+                writer = csv.DictWriter(
+                    out,
+                    fieldnames=["line", "book_id", "isbn", "total_copies", "reason"],
+                )
+                writer.writeheader()
+                writer.writerows(report["invalid"])
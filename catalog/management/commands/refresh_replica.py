@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from catalog.models import CatalogVersion
+from catalog.versioning import VERSION_ROW_ID
+from the_library.replica import copy_database, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary database into the read replica with SQLite's online backup API. "
+        "Only copies when the catalog version changed, --watch keeps doing that."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running and check the catalog version every SECONDS.",
+        )
+        parser.add_argument("--force", action="store_true")
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError("No replica database, set LIBRARY_REPLICA_DB.")
+
+        self.refresh(options["force"])
+        while options["watch"]:
+            time.sleep(options["watch"])
+            self.refresh(force=False)
+
+    def refresh(self, force):
+        version = self.version("default")
+        copied = self.version(settings.REPLICA_DATABASE)
+        if not force and copied is not None and copied == version:
+            return
+
+        started = time.perf_counter()
+        try:
+            copy_database("default", settings.REPLICA_DATABASE)
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(
+            f"Copied the primary at catalog version {version} "
+            f"in {time.perf_counter() - started:.2f}s."
+        )
+
+    def version(self, alias):
+        try:
+            return (
+                CatalogVersion.objects.using(alias)
+                .filter(pk=VERSION_ROW_ID)
+                .values_list("version", flat=True)
+                .first()
+            )
+        except DatabaseError:  # an empty replica has no tables yet
+            return None
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="amazonlink",
+            name="pk",
+        ),
+        migrations.RemoveField(
+            model_name="wishlist",
+            name="pk",
+        ),
+        migrations.AddField(
+            model_name="amazonlink",
+            name="id",
+            field=models.BigAutoField(
+                auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+            ),
+        ),
+        migrations.AddField(
+            model_name="wishlist",
+            name="id",
+            field=models.BigAutoField(
+                auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["title"], name="book_title_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["authors"], name="book_authors_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["language"], name="book_language_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="amazonlink",
+            constraint=models.UniqueConstraint(
+                fields=("book", "url"), name="unique_amazonlink_book_url"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="wishlist",
+            constraint=models.UniqueConstraint(
+                fields=("user", "book"), name="unique_wishlist_user_book"
+            ),
+        ),
+    ]
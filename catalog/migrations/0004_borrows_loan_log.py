@@ -0,0 +1,118 @@
+# Borrows goes from a CompositePrimaryKey("user_id", "book_id") to an append-only loan log with
+# a surrogate key. Django can't migrate a table away from a composite primary key, so the rows
+# are moved into a new table with a single INSERT ... SELECT and the new table takes the old name.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_loans(apps, schema_editor):
+    old = apps.get_model("catalog", "Borrows")._meta.db_table
+    new = apps.get_model("catalog", "Loan")._meta.db_table
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"INSERT INTO {quote(new)} (user_id, book_id, created, returned) "
+        f"SELECT user_id, book_id, created, returned FROM {quote(old)} ORDER BY created"
+    )
+
+
+def copy_latest_loans_back(apps, schema_editor):
+    # the old table only has room for one row per (user, book), keep the latest loan
+    old = apps.get_model("catalog", "Borrows")._meta.db_table
+    new = apps.get_model("catalog", "Loan")._meta.db_table
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"INSERT INTO {quote(old)} (user_id, book_id, created, returned) "
+        f"SELECT user_id, book_id, created, returned FROM {quote(new)} "
+        f"WHERE id IN (SELECT MAX(id) FROM {quote(new)} GROUP BY user_id, book_id)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0003_catalog_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Loan",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("returned", models.DateTimeField(blank=True, default=None, null=True)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="catalog.book",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(copy_loans, copy_latest_loans_back),
+        migrations.DeleteModel(
+            name="Borrows",
+        ),
+        migrations.RenameModel(
+            old_name="Loan",
+            new_name="Borrows",
+        ),
+        migrations.AlterModelOptions(
+            name="borrows",
+            options={"verbose_name": "Loan", "verbose_name_plural": "Loans"},
+        ),
+        migrations.AlterField(
+            model_name="borrows",
+            name="book",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="borrowed_by",
+                to="catalog.book",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="borrows",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="borrowed_items",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        # indexes are created after the copy, building them once is cheaper than
+        # maintaining them for every inserted row
+        migrations.AddIndex(
+            model_name="borrows",
+            index=models.Index(
+                fields=["returned", "created"], name="borrows_returned_created_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="borrows",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("returned__isnull", True)),
+                fields=("user", "book"),
+                name="unique_active_loan",
+            ),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0004_borrows_loan_log"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookNeighbour",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveSmallIntegerField()),
+                ("score", models.FloatField()),
+            ],
+            options={
+                "verbose_name": "Book Neighbour",
+                "verbose_name_plural": "Book Neighbours",
+                "ordering": ["book", "rank"],
+            },
+        ),
+        migrations.CreateModel(
+            name="JobCheckpoint",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=100, primary_key=True, serialize=False),
+                ),
+                ("state", models.JSONField(default=dict)),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="wishlist",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="borrows",
+            index=models.Index(fields=["created"], name="borrows_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="wishlist",
+            index=models.Index(fields=["created"], name="wishlist_created_idx"),
+        ),
+        migrations.AddField(
+            model_name="bookneighbour",
+            name="book",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="neighbours",
+                to="catalog.book",
+            ),
+        ),
+        migrations.AddField(
+            model_name="bookneighbour",
+            name="neighbour",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="catalog.book",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="bookneighbour",
+            constraint=models.UniqueConstraint(
+                fields=("book", "rank"), name="unique_book_neighbour_rank"
+            ),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0005_recommendations"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PopularityCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("b", "Borrowed"), ("w", "Wishlisted")], max_length=1
+                    ),
+                ),
+                ("bucket", models.DateField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="catalog.book",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Popularity Counter",
+                "verbose_name_plural": "Popularity Counters",
+                "indexes": [
+                    models.Index(
+                        fields=["kind", "bucket", "-count"], name="popularity_top_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "bucket", "book"),
+                        name="unique_popularity_bucket",
+                    )
+                ],
+            },
+        ),
+    ]
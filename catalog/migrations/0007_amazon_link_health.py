@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0006_popularity_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="amazonlink",
+            name="etag",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="amazonlink",
+            name="last_checked",
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="amazonlink",
+            name="last_modified",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="amazonlink",
+            name="latency_ms",
+            field=models.PositiveIntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="amazonlink",
+            name="status",
+            field=models.PositiveSmallIntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="amazonlink",
+            index=models.Index(fields=["last_checked"], name="amazonlink_checked_idx"),
+        ),
+    ]
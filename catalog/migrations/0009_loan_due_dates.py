@@ -0,0 +1,95 @@
+# Loans get a due date, existing loans are due LOAN_PERIOD after they were made
+# instead of LOAN_PERIOD after the migration ran. The index on returned loans becomes
+# partial, see Borrows.Meta.
+
+import datetime as dt
+
+import catalog.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def due_after_created(apps, schema_editor):
+    Borrows = apps.get_model("catalog", "Borrows")
+    Borrows.objects.update(due=F("created") + dt.timedelta(days=14))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0008_book_facet_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OverdueNotice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Overdue Notice",
+                "verbose_name_plural": "Overdue Notices",
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="borrows",
+            name="borrows_returned_created_idx",
+        ),
+        migrations.AddField(
+            model_name="borrows",
+            name="due",
+            field=models.DateTimeField(default=catalog.models.loan_due_date),
+        ),
+        migrations.RunPython(due_after_created, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="borrows",
+            name="overdue",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="borrows",
+            index=models.Index(
+                condition=models.Q(("returned__isnull", False)),
+                fields=["returned", "created"],
+                name="borrows_returned_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrows",
+            index=models.Index(
+                condition=models.Q(("returned__isnull", True)),
+                fields=["due", "id"],
+                name="borrows_active_due_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="overduenotice",
+            name="loan",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="overdue_notice",
+                to="catalog.borrows",
+            ),
+        ),
+        migrations.AddField(
+            model_name="overduenotice",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="overdue_notices",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
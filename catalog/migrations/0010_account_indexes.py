@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0009_loan_due_dates"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrows",
+            index=models.Index(
+                condition=models.Q(("returned__isnull", True)),
+                fields=["user", "created", "id"],
+                name="borrows_user_active_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrows",
+            index=models.Index(
+                condition=models.Q(("returned__isnull", False)),
+                fields=["user", "created", "id"],
+                name="borrows_user_history_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wishlist",
+            index=models.Index(
+                fields=["user", "created", "id"], name="wishlist_user_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0010_account_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RemovedInteraction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id", models.IntegerField()),
+                ("book_id", models.IntegerField()),
+                ("removed", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                "verbose_name": "Removed Interaction",
+                "verbose_name_plural": "Removed Interactions",
+            },
+        ),
+    ]
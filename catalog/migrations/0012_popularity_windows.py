@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0011_removed_interactions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PopularityWindow",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("b", "Borrowed"), ("w", "Wishlisted")], max_length=1
+                    ),
+                ),
+                ("days", models.PositiveSmallIntegerField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="catalog.book",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Popularity Window",
+                "verbose_name_plural": "Popularity Windows",
+                "indexes": [
+                    models.Index(
+                        fields=["kind", "days", "-count", "book"],
+                        name="popularity_window_top_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "days", "book"), name="unique_popularity_window"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:20
+
+from django.db import migrations
+
+
+def create_books_version_row(apps, schema_editor):
+    # the version the catalog snapshot is keyed on, see catalog.versioning
+    CatalogVersion = apps.get_model("catalog", "CatalogVersion")
+    CatalogVersion.objects.get_or_create(pk=2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0012_popularity_windows"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_books_version_row, migrations.RunPython.noop),
+    ]
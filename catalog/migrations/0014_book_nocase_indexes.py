@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:18
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0013_books_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                django.db.models.functions.comparison.Collate("title", "NOCASE"),
+                name="book_title_nocase_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                django.db.models.functions.comparison.Collate("authors", "NOCASE"),
+                name="book_authors_nocase_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:05
+
+import datetime as dt
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# as in catalog.models.PopularityCounter and catalog.leaderboard, frozen for this migration
+BORROWED = "b"
+WISHLISTED = "w"
+ALL_TIME = dt.date.min
+LONGEST_WINDOW = 30
+WINDOWS_CHECKPOINT = "leaderboard_windows"
+
+
+def seed_popularity_counters(apps, schema_editor):
+    # 0006 created the counters empty, so the loans and wishlist items from before it were
+    # never counted. This is leaderboard.rebuild() with the models as of this migration, it
+    # replaces whatever the counters hold, so it is right on databases at any point since 0006
+    Borrows = apps.get_model("catalog", "Borrows")
+    Wishlist = apps.get_model("catalog", "Wishlist")
+    PopularityCounter = apps.get_model("catalog", "PopularityCounter")
+    PopularityWindow = apps.get_model("catalog", "PopularityWindow")
+    JobCheckpoint = apps.get_model("catalog", "JobCheckpoint")
+
+    PopularityCounter.objects.all().delete()
+
+    cutoff = timezone.localdate() - dt.timedelta(days=LONGEST_WINDOW - 1)
+    daily = (
+        Borrows.objects.filter(
+            created__gte=timezone.make_aware(dt.datetime.combine(cutoff, dt.time.min))
+        )
+        .annotate(day=TruncDate("created"))
+        .values("book_id", "day")
+        .annotate(total=Count("id"))
+        .values_list("book_id", "day", "total")
+    )
+    counters = [
+        PopularityCounter(book_id=book_id, kind=BORROWED, bucket=day, count=total)
+        for book_id, day, total in daily.iterator()
+    ]
+    counters += [
+        PopularityCounter(book_id=book_id, kind=kind, bucket=ALL_TIME, count=total)
+        for kind, model in ((BORROWED, Borrows), (WISHLISTED, Wishlist))
+        for book_id, total in model.objects.values("book_id")
+        .annotate(total=Count("id"))
+        .values_list("book_id", "total")
+        .iterator()
+    ]
+    PopularityCounter.objects.bulk_create(counters, batch_size=5000)
+
+    # without window totals the week and month lists are summed from the daily counters
+    # until `rebuild_leaderboard --prune` runs
+    PopularityWindow.objects.all().delete()
+    JobCheckpoint.objects.filter(name=WINDOWS_CHECKPOINT).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0014_book_nocase_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_popularity_counters, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,15 @@ import datetime as dt
 from django.core import exceptions
 from django.core import validators
 from django.db import models
+from django.db.models.functions import Collate
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+LOAN_PERIOD = dt.timedelta(days=14)
+
+
+def loan_due_date():
+    return timezone.now() + LOAN_PERIOD
 
 
 class Book(models.Model):
@@ -25,6 +33,21 @@ class Book(models.Model):
         verbose_name = "Book"
         verbose_name_plural = "Books"
         ordering = ["title"]
+        indexes = [
+            # title/authors back the ordering
+            models.Index(fields=["title"], name="book_title_idx"),
+            models.Index(fields=["authors"], name="book_authors_idx"),
+            # the admin's prefix searches are a case-insensitive LIKE 'term%', SQLite only
+            # turns that into a range on an index with the NOCASE collation
+            models.Index(Collate("title", "NOCASE"), name="book_title_nocase_idx"),
+            models.Index(Collate("authors", "NOCASE"), name="book_authors_nocase_idx"),
+            # facet filters, language alone uses the prefix of the first one
+            models.Index(
+                fields=["language", "publication_year"], name="book_language_year_idx"
+            ),
+            models.Index(fields=["publication_year"], name="book_year_idx"),
+        ]
+
 
 #  you can add book availability to book table but this is more normalized and also it is future proof
 #  so if you want to add shelf number, row number etc later
@@ -52,8 +75,9 @@ class Availability(models.Model):
         verbose_name_plural = "Book Availabilities"
 
 
+# Append-only loan log: every loan is a new row and returning a book only sets `returned`,
+# so the history of a user borrowing the same book several times is kept
 class Borrows(models.Model):
-    pk = models.CompositePrimaryKey("user_id", "book_id")
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,  # Delet Cascade
@@ -66,10 +90,59 @@ class Borrows(models.Model):
     )
     created = models.DateTimeField(auto_now_add=True)
     returned = models.DateTimeField(default=None, blank=True, null=True)
+    due = models.DateTimeField(default=loan_due_date)
+    # set by mark_overdue_loans together with the loan's OverdueNotice
+    overdue = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Loan"
+        verbose_name_plural = "Loans"
+        constraints = [
+            # a user can only have one active loan of a book, this also is the index used
+            # to find "is this book currently borrowed by me" and to count active loans
+            models.UniqueConstraint(
+                fields=["user", "book"],
+                condition=models.Q(returned__isnull=True),
+                name="unique_active_loan",
+            ),
+        ]
+        indexes = [
+            # covers the average lending time on the index page, only returned loans count.
+            # Partial, so the planner doesn't take it for `returned IS NULL`: with one value per
+            # row in its statistics it looks far more selective than it is for active loans
+            models.Index(
+                fields=["returned", "created"],
+                condition=models.Q(returned__isnull=False),
+                name="borrows_returned_created_idx",
+            ),
+            # batch jobs pick up the loans created since their last run
+            models.Index(fields=["created"], name="borrows_created_idx"),
+            # active loans in due order, mark_overdue_loans walks it in keyset batches
+            models.Index(
+                fields=["due", "id"],
+                condition=models.Q(returned__isnull=True),
+                name="borrows_active_due_idx",
+            ),
+            # a user's active loans and loan history, newest first, for the account page
+            models.Index(
+                fields=["user", "created", "id"],
+                condition=models.Q(returned__isnull=True),
+                name="borrows_user_active_idx",
+            ),
+            models.Index(
+                fields=["user", "created", "id"],
+                condition=models.Q(returned__isnull=False),
+                name="borrows_user_history_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} borrowed {self.book.title} on {self.created:%Y-%m-%d}"
 
 
+# Wishlist and AmazonLink used to have a CompositePrimaryKey, but the admin can't register
+# models with composite keys, so they have a surrogate id and a unique constraint instead
 class Wishlist(models.Model):
-    pk = models.CompositePrimaryKey("user_id", "book_id")  # this is new in Django 5
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,  # Delet Cascade
@@ -80,28 +153,221 @@ class Wishlist(models.Model):
         on_delete=models.CASCADE,  # Cascade if a book is deleted from table
         related_name="wishlisted_by",  # book.wishlisted_by.all()
     )
+    created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "Wishlist Item"
         verbose_name_plural = "Wishlist Items"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "book"], name="unique_wishlist_user_book"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["created"], name="wishlist_created_idx"),
+            # a user's wishlist, newest first, for the account page
+            models.Index(
+                fields=["user", "created", "id"], name="wishlist_user_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s wishlist: {self.book.title}"
 
 
 class AmazonLink(models.Model):
-    pk = models.CompositePrimaryKey("book_id", "url")  # this is new in Django 5
-
     book = models.ForeignKey(
         Book,
         on_delete=models.CASCADE,  # Delete cascade
         related_name="amazon_links",  #  book.amazon_links.all
     )
     url = models.URLField(max_length=200)
+    # filled in by the check_amazon_links command (see catalog.linkcheck), status stays empty
+    # when the link was checked but no response came back
+    status = models.PositiveSmallIntegerField(default=None, blank=True, null=True)
+    last_checked = models.DateTimeField(default=None, blank=True, null=True)
+    latency_ms = models.PositiveIntegerField(default=None, blank=True, null=True)
+    # validators of the last successful response, sent back for conditional requests
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
 
     class Meta:
         verbose_name = "Book link On Amazon"
         verbose_name_plural = "Book Links on Amazon"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "url"], name="unique_amazonlink_book_url"
+            ),
+        ]
+        indexes = [
+            # the checker picks up links that were never checked or are past their TTL
+            models.Index(fields=["last_checked"], name="amazonlink_checked_idx"),
+        ]
 
     def __str__(self):
         return f"{self.book.title} - {self.url} Amazon Link"
+
+    @property
+    def is_alive(self):
+        return self.status is not None and self.status < 400
+
+
+class CatalogVersion(models.Model):
+    # Row 1 is bumped on every write to Book, Availability, Borrows and Wishlist, row 2 only on
+    # writes to Book (see catalog.versioning). Anything derived from the catalog can be keyed
+    # on them
+    version = models.PositiveBigIntegerField(default=0)
+    changed = models.DateTimeField(default=None, blank=True, null=True)
+
+    def __str__(self):
+        return f"Catalog version {self.version} ({self.changed})"
+
+
+class BookNeighbour(models.Model):
+    # "Readers also borrowed": the top-k most similar books of a book, precomputed by the
+    # build_recommendations command. Reading them is one range scan on (book, rank).
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="neighbours",  # book.neighbours.all()
+    )
+    neighbour = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        verbose_name = "Book Neighbour"
+        verbose_name_plural = "Book Neighbours"
+        ordering = ["book", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["book", "rank"], name="unique_book_neighbour_rank"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.neighbour_id} ({self.score:.3f})"
+
+
+class RemovedInteraction(models.Model):
+    # A loan or wishlist item that was deleted, so build_recommendations knows whose
+    # neighbours to recompute. Plain ids rather than foreign keys: it is written while the
+    # user or book may be being deleted. The command drops the ones it has processed
+    user_id = models.IntegerField()
+    book_id = models.IntegerField()
+    removed = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Removed Interaction"
+        verbose_name_plural = "Removed Interactions"
+
+    def __str__(self):
+        return f"User {self.user_id} no longer has book {self.book_id}"
+
+
+class OverdueNotice(models.Model):
+    # One per overdue loan, created in bulk by mark_overdue_loans
+    loan = models.OneToOneField(
+        Borrows,
+        on_delete=models.CASCADE,
+        related_name="overdue_notice",  # loan.overdue_notice
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="overdue_notices",  # user.overdue_notices.all()
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Overdue Notice"
+        verbose_name_plural = "Overdue Notices"
+
+    def __str__(self):
+        return f"Loan {self.loan_id} of user {self.user_id} is overdue"
+
+
+class JobCheckpoint(models.Model):
+    # Where a batch job stopped last time, so the next run only processes what is new
+    name = models.CharField(max_length=100, primary_key=True)
+    state = models.JSONField(default=dict)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.state}"
+
+
+class PopularityCounter(models.Model):
+    # Incrementally maintained counters behind the leaderboard (see catalog.leaderboard).
+    # Loans are counted in daily buckets plus one all-time bucket, so "this week" is the sum of
+    # at most 7 rows per book and old buckets can simply be dropped.
+    # Wishlists only have the all-time bucket, which follows the current number of wishlist items.
+    BORROWED = "b"
+    WISHLISTED = "w"
+    KIND_CHOICES = (
+        (BORROWED, "Borrowed"),
+        (WISHLISTED, "Wishlisted"),
+    )
+    ALL_TIME = dt.date.min
+
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES)
+    bucket = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Popularity Counter"
+        verbose_name_plural = "Popularity Counters"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "bucket", "book"], name="unique_popularity_bucket"
+            ),
+        ]
+        indexes = [
+            # all-time top N is a scan of the first N entries of this index
+            models.Index(fields=["kind", "bucket", "-count"], name="popularity_top_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.book_id} on {self.bucket}: {self.count}"
+
+
+class PopularityWindow(models.Model):
+    # Running total of a book's daily buckets in the last `days` days (see catalog.leaderboard),
+    # so the week and month top N read the first N entries of an index like all-time does.
+    # Incremented together with the buckets and recomputed from them once a day, when the
+    # oldest day leaves the window.
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    kind = models.CharField(max_length=1, choices=PopularityCounter.KIND_CHOICES)
+    days = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Popularity Window"
+        verbose_name_plural = "Popularity Windows"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "days", "book"], name="unique_popularity_window"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["kind", "days", "-count", "book"],
+                name="popularity_window_top_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.book_id} in {self.days} days: {self.count}"
@@ -0,0 +1,80 @@
+# finds active loans past their due date, marks them and creates their notices.
+# The loans are read in keyset batches of (due, id) from borrows_active_due_idx, and the
+# position is kept in a JobCheckpoint: a run only reads the loans that fell due since the
+# last one, and a run that is interrupted carries on where it stopped
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Borrows, JobCheckpoint, OverdueNotice
+
+CHECKPOINT = "overdue_loans"
+BATCH_SIZE = 5000
+
+
+def after(position):
+    if position is None:
+        return Q()
+    # (due, id) > position, with a plain range on due that the index can seek to
+    due, loan_id = position
+    return Q(due__gte=due) & (Q(due__gt=due) | Q(id__gt=loan_id))
+
+
+def up_to(position):
+    due, loan_id = position
+    return Q(due__lte=due) & (Q(due__lt=due) | Q(id__lte=loan_id))
+
+
+def load_position(checkpoint):
+    due = parse_datetime(checkpoint.state.get("due") or "")
+    if due is None:
+        return None
+    return due, checkpoint.state["id"]
+
+
+def mark_overdue_loans(now=None, batch_size=BATCH_SIZE, full=False):
+    """
+    Marks the active loans due before `now` as overdue and creates an OverdueNotice for each,
+    one batch per transaction. `full` ignores the checkpoint, e.g. after due dates were
+    changed by hand. Returns the number of loans marked.
+    """
+    now = now or timezone.now()
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    position = None if full else load_position(checkpoint)
+
+    due_loans = Borrows.objects.filter(
+        returned__isnull=True, overdue=False, due__lte=now
+    ).order_by("due", "id")
+
+    marked = 0
+    while True:
+        batch = list(
+            due_loans.filter(after(position)).values_list("id", "user_id", "due")[
+                :batch_size
+            ]
+        )
+        if not batch:
+            break
+
+        last = (batch[-1][2], batch[-1][0])
+        with transaction.atomic():
+            # the same range as the batch, without a list of ids in the query
+            Borrows.objects.filter(
+                after(position), up_to(last), returned__isnull=True, overdue=False
+            ).update(overdue=True)
+            OverdueNotice.objects.bulk_create(
+                (
+                    OverdueNotice(loan_id=loan_id, user_id=user_id)
+                    for loan_id, user_id, _ in batch
+                ),
+                ignore_conflicts=True,  # a notice from a run that was cut short
+            )
+            checkpoint.state = {"due": last[0].isoformat(), "id": last[1]}
+            checkpoint.save()
+
+        marked += len(batch)
+        position = last
+
+    return marked
@@ -0,0 +1,96 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# below this many rows an exact COUNT(*) is cheap enough, and an estimate would just look wrong
+ESTIMATE_THRESHOLD = 10_000
+
+
+def estimated_row_count(model, using="default"):
+    """
+    Returns an estimate of the number of rows in the model's table, or None if the backend has
+    none. Postgres has one after a vacuum/analyze, SQLite after `ANALYZE` (sqlite_stat1).
+    The largest rowid is no estimate: it is the largest primary key for tables with an integer
+    one (Availability's book_id), which can be far from the number of rows.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table]
+            )
+            row = cursor.fetchone()
+            # reltuples is -1 for tables that were never analyzed
+            return row[0] if row and row[0] >= 0 else None
+
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is not None:
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+                )
+                row = cursor.fetchone()
+                if row:
+                    # first number of the stat column is the number of rows in the table
+                    return int(row[0].split()[0])
+
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids the exact COUNT(*) on big unfiltered tables.
+    Filtered querysets (search, list filters) still get an exact count, those are usually small.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, "query", None)
+
+        if query is not None and not query.where:
+            estimate = estimated_row_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+
+        return super().count
+
+
+def keyset_page(queryset, cursor, per_page):
+    """
+    One page of `queryset`, newest first by (created, id), starting after `cursor`. Returns the
+    rows and the cursor of the next page, or None on the last page. Every page is one query
+    that seeks in a (..., created, id) index, however far back it is, and there is no COUNT(*).
+    """
+    queryset = queryset.order_by("-created", "-id")
+    position = parse_cursor(cursor)
+    if position is not None:
+        created, pk = position
+        queryset = queryset.filter(
+            Q(created__lte=created) & (Q(created__lt=created) | Q(id__lt=pk))
+        )
+
+    rows = list(queryset[: per_page + 1])
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, f"{rows[-1].created.isoformat()}|{rows[-1].pk}"
+
+
+def parse_cursor(cursor):
+    # "<created>|<id>", anything else starts at the first page
+    created, _, pk = (cursor or "").partition("|")
+    try:
+        created = parse_datetime(created)
+        pk = int(pk)
+    except ValueError:
+        return None
+    if created is None:
+        return None
+    return created, pk
@@ -0,0 +1,220 @@
+# Builds the "readers also borrowed" neighbours (BookNeighbour) from Borrows and Wishlist.
+# Uses numpy, so like catalog.ingest it must only be imported by batch code, never on the request path.
+#
+# The user x book interactions are a sparse binary matrix A kept as (user, book) pairs sorted by
+# user. The item-item co-occurrence A^T A is built without materialising A: every user row is
+# expanded into its (book, other book) pairs with repeat/offset arithmetic and the pairs are
+# counted with np.unique. A user with n items has n^2 pairs, so the rows are expanded a chunk
+# of at most CHUNK_PAIRS pairs at a time and the counts of the chunks are added up.
+# Scores are cosine similarities, cooc(a, b) / sqrt(n(a) * n(b)).
+import numpy as np
+from django.db import transaction
+
+from .models import Borrows, Wishlist, BookNeighbour, RemovedInteraction
+from .versioning import batched_catalog_changes
+
+TOP_K = 10
+
+# pairs expanded at once, a few int64 arrays of this length are in memory during a chunk
+CHUNK_PAIRS = 2_000_000
+
+
+def load_interactions():
+    """
+    Returns the distinct (user_id, book_id) pairs of loans and wishlist items, sorted by user.
+    """
+    borrows = np.fromiter(
+        (
+            value
+            for pair in Borrows.objects.values_list("user_id", "book_id").iterator()
+            for value in pair
+        ),
+        dtype=np.int64,
+    )
+    wishes = np.fromiter(
+        (
+            value
+            for pair in Wishlist.objects.values_list("user_id", "book_id").iterator()
+            for value in pair
+        ),
+        dtype=np.int64,
+    )
+    pairs = np.concatenate([borrows, wishes]).reshape(-1, 2)
+    # unique on rows also sorts them by user, then book
+    return np.unique(pairs, axis=0)
+
+
+def compute_neighbours(pairs, top_k=TOP_K, books=None):
+    """
+    Returns (book, neighbour, rank, score) arrays with the top_k neighbours of every book,
+    or only of the given books. `pairs` must be sorted by user as load_interactions returns them.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if len(pairs) == 0:
+        return empty, empty, empty, np.empty(0)
+
+    users, items = pairs[:, 0], pairs[:, 1]
+
+    # row offsets of every user's items (CSR indptr)
+    _, user_start, user_count = np.unique(users, return_index=True, return_counts=True)
+    row_user = np.repeat(np.arange(len(user_start)), user_count)
+    row_start = user_start[row_user]
+    row_count = user_count[row_user]
+
+    # rows on the "a" side of the product, all of them or only the books to refresh
+    rows = np.arange(len(items))
+    if books is not None:
+        rows = rows[np.isin(items, np.asarray(list(books), dtype=np.int64))]
+
+    a, b, cooc = cooccurrence(items, row_start, row_count, rows)
+    if len(a) == 0:
+        return empty, empty, empty, np.empty(0)
+
+    # number of readers of every book, for the cosine normalisation
+    book_ids, book_readers = np.unique(items, return_counts=True)
+    readers_a = book_readers[np.searchsorted(book_ids, a)]
+    readers_b = book_readers[np.searchsorted(book_ids, b)]
+    score = cooc / np.sqrt(readers_a * readers_b)
+
+    # best score first within every book, ties broken by book id so the result is stable
+    order = np.lexsort((b, -score, a))
+    a, b, score = a[order], b[order], score[order]
+    _, group_start, group_count = np.unique(a, return_index=True, return_counts=True)
+    rank = np.arange(len(a)) - np.repeat(group_start, group_count)
+
+    top = rank < top_k
+    return a[top], b[top], rank[top], score[top]
+
+
+def cooccurrence(items, row_start, row_count, rows):
+    """
+    Returns (a, b, count) arrays with the co-occurrence count of every (a, b) pair of different
+    books, a taken from `rows`. The rows are expanded CHUNK_PAIRS pairs at a time, a single
+    row is never split (it has one pair per item of its user).
+    """
+    stride = items.max() + 1
+    keys, counts = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    row_pairs = row_count[rows]
+    row_end = np.cumsum(row_pairs)
+    start = 0
+    while start < len(rows):
+        done = row_end[start] - row_pairs[start]
+        end = max(
+            np.searchsorted(row_end, done + CHUNK_PAIRS, side="right"), start + 1
+        )
+        chunk, chunk_pairs = rows[start:end], row_pairs[start:end]
+        start = end
+
+        # expand every row of the chunk into one pair per item of the same user
+        a_rows = np.repeat(chunk, chunk_pairs)
+        pair_offsets = np.arange(len(a_rows)) - np.repeat(
+            np.cumsum(chunk_pairs) - chunk_pairs, chunk_pairs
+        )
+        b_rows = row_start[a_rows] + pair_offsets
+
+        a, b = items[a_rows], items[b_rows]
+        keep = a != b
+        chunk_keys, chunk_counts = np.unique(
+            a[keep] * stride + b[keep], return_counts=True
+        )
+
+        # add the chunk's counts to the ones so far
+        keys, position = np.unique(
+            np.concatenate([keys, chunk_keys]), return_inverse=True
+        )
+        counts = np.bincount(
+            position, weights=np.concatenate([counts, chunk_counts])
+        ).astype(np.int64)
+
+    return keys // stride, keys % stride, counts
+
+
+def changed_interactions(since):
+    """
+    The users and books of the loans and wishlist items created or removed after `since`.
+    """
+    users, books = set(), set()
+    for model in (Borrows, Wishlist):
+        for user_id, book_id in model.objects.filter(created__gt=since).values_list(
+            "user_id", "book_id"
+        ):
+            users.add(user_id)
+            books.add(book_id)
+    for user_id, book_id in RemovedInteraction.objects.filter(
+        removed__gt=since
+    ).values_list("user_id", "book_id"):
+        users.add(user_id)
+        books.add(book_id)
+    return users, books
+
+
+def affected_books(pairs, users, books):
+    """
+    The books whose neighbours change when `users` got or lost `books`: the books themselves,
+    every book that shares a reader with one of them (their co-occurrence count or reader
+    count changed) and the other books of those users (one of them may have lost a
+    co-occurrence that no other reader has).
+    """
+    pair_users, items = pairs[:, 0], pairs[:, 1]
+    books = np.asarray(list(books), dtype=np.int64)
+    readers = np.union1d(
+        pair_users[np.isin(items, books)], np.asarray(list(users), dtype=np.int64)
+    )
+    return set(books.tolist()) | set(items[np.isin(pair_users, readers)].tolist())
+
+
+@transaction.atomic
+def store_neighbours(book, neighbour, rank, score, books=None, batch_size=5000):
+    """
+    Replaces the stored neighbours of all books, or only of `books`.
+    """
+    with batched_catalog_changes():
+        stale = BookNeighbour.objects.all()
+        if books is not None:
+            stale = stale.filter(book_id__in=books)
+        stale.delete()
+
+        BookNeighbour.objects.bulk_create(
+            (
+                BookNeighbour(
+                    book_id=int(book_id),
+                    neighbour_id=int(neighbour_id),
+                    rank=int(position),
+                    score=float(value),
+                )
+                for book_id, neighbour_id, position, value in zip(
+                    book, neighbour, rank, score
+                )
+            ),
+            batch_size=batch_size,
+        )
+
+    return len(book)
+
+
+def build_neighbours(books=None, top_k=TOP_K):
+    """
+    Recomputes the neighbours of all books, or only of `books`, and returns the number of rows stored.
+    """
+    pairs = load_interactions()
+    book, neighbour, rank, score = compute_neighbours(pairs, top_k=top_k, books=books)
+    return store_neighbours(book, neighbour, rank, score, books=books)
+
+
+def refresh_neighbours(since, top_k=TOP_K):
+    """
+    Recomputes the neighbours of the books affected by the loans and wishlist items created or
+    removed after `since`. Returns the number of books recomputed and of rows stored.
+    """
+    users, books = changed_interactions(since)
+    if not books:
+        return 0, 0
+    pairs = load_interactions()
+    books = affected_books(pairs, users, books)
+    book, neighbour, rank, score = compute_neighbours(pairs, top_k=top_k, books=books)
+    return len(books), store_neighbours(book, neighbour, rank, score, books=books)
+
+
+def drop_removed_interactions(until):
+    RemovedInteraction.objects.filter(removed__lte=until).delete()
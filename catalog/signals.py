@@ -0,0 +1,82 @@
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import leaderboard
+from .backends import invalidate_cached_user
+from .models import Book, Availability, Borrows, Wishlist, RemovedInteraction
+from .versioning import bump_catalog_version
+
+_state = threading.local()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    # password, is_active, is_staff and last_login changes all go through save()
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Availability)
+@receiver(post_save, sender=Borrows)
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Availability)
+@receiver(post_delete, sender=Borrows)
+@receiver(post_delete, sender=Wishlist)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version(books=sender is Book)
+
+
+@receiver(post_delete, sender=Borrows)
+@receiver(post_delete, sender=Wishlist)
+def record_removed_interaction(sender, instance, **kwargs):
+    # build_recommendations finds new loans and wishlist items by their created time,
+    # removed ones only leave this behind
+    removed = RemovedInteraction(user_id=instance.user_id, book_id=instance.book_id)
+    batch = getattr(_state, "removed", None)
+    if batch is not None:
+        batch.append(removed)
+    else:
+        removed.save()
+
+
+@contextmanager
+def batched_removed_interactions(batch_size=5000):
+    """
+    Records the loans and wishlist items deleted inside the block with one bulk_create when it
+    ends instead of one INSERT per row, e.g. for a cascade delete of books or users.
+    Nothing is written if the block raises.
+    """
+    if getattr(_state, "removed", None) is not None:  # an outer block writes them
+        yield
+        return
+
+    _state.removed = []
+    try:
+        yield
+        removed = _state.removed
+    finally:
+        _state.removed = None
+    RemovedInteraction.objects.bulk_create(removed, batch_size=batch_size)
+
+
+@receiver(post_save, sender=Borrows)
+def count_borrow(sender, instance, created, **kwargs):
+    if created:  # returning a book saves the loan again, that is not a new borrow
+        leaderboard.record_borrow(instance.book_id, instance.created)
+
+
+@receiver(post_save, sender=Wishlist)
+def count_wishlist_add(sender, instance, created, **kwargs):
+    if created:
+        leaderboard.record_wishlist(instance.book_id, 1)
+
+
+@receiver(post_delete, sender=Wishlist)
+def count_wishlist_remove(sender, instance, **kwargs):
+    leaderboard.record_wishlist(instance.book_id, -1)
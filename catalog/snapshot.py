@@ -0,0 +1,301 @@
+# Read-only catalog snapshot shared by all worker processes through mmap.
+#
+# build_catalog_snapshot exports Book into one columnar file: fixed-width
+# arrays for the numbers and an offset-indexed string heap per text column. Every worker maps
+# the same file, so the pages are shared through the OS page cache instead of each worker
+# keeping its own copy of the catalog. A new file is written next to the old one and renamed
+# over it, workers notice the new inode and remap.
+#
+# Availability is left out, it changes with every borrow and return and would keep the
+# snapshot stale. The books of a page get theirs from the database, see load_availability.
+#
+# Only the standard library is used here, this module is on the request path.
+import bisect
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+
+from django.conf import settings
+
+from .models import Book, Availability
+
+MAGIC = b"LIBSNAP2"
+HEADER = struct.Struct("<8sQQ")  # magic, books version, number of books
+
+# (name, array typecode) in file order, all integer columns have one entry per book, in title order
+INT_COLUMNS = (
+    ("book_id", "I"),
+    ("publication_year", "i"),
+    ("id_order", "I"),  # rows sorted by book_id
+    ("year_order", "I"),  # rows sorted by publication_year, then title
+)
+TEXT_COLUMNS = ("isbn", "authors", "title", "language")
+# lowercased copies of these heaps are stored too, `bytes.lower()` only touches ASCII so they
+# share the offsets of the original, and match like SQLite's case-insensitive LIKE
+SEARCH_COLUMNS = ("authors", "title")
+
+SORT_ORDERS = ("title", "book_id", "publication_year")
+
+
+def _pad(size):
+    return -size % 8
+
+
+def write_snapshot(path, version, rows):
+    """
+    Writes a snapshot of `rows` to `path`, atomically replacing an existing file.
+    `rows` are (book_id, isbn, authors, publication_year, title, language) tuples already
+    sorted by title.
+    """
+    ints = {name: array(code) for name, code in INT_COLUMNS}
+    offsets = {name: array("Q", [0]) for name in TEXT_COLUMNS}
+    heaps = {name: bytearray() for name in TEXT_COLUMNS}
+
+    for book_id, isbn, authors, year, title, language in rows:
+        ints["book_id"].append(book_id)
+        ints["publication_year"].append(year)
+        for name, value in zip(TEXT_COLUMNS, (isbn, authors, title, language)):
+            heaps[name] += str(value).encode()
+            offsets[name].append(len(heaps[name]))
+
+    count = len(ints["book_id"])
+    ints["id_order"].extend(sorted(range(count), key=ints["book_id"].__getitem__))
+    ints["year_order"].extend(
+        sorted(range(count), key=ints["publication_year"].__getitem__)
+    )
+
+    sections = [ints[name].tobytes() for name, _ in INT_COLUMNS]
+    for name in TEXT_COLUMNS:
+        sections += [offsets[name].tobytes(), bytes(heaps[name])]
+    sections += [bytes(heaps[name]).lower() for name in SEARCH_COLUMNS]
+
+    path = Path(path)
+    handle, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(handle, "wb") as out:
+            out.write(HEADER.pack(MAGIC, version, count))
+            out.write(struct.pack(f"<{len(sections)}Q", *map(len, sections)))
+            for section in sections:
+                out.write(section)
+                out.write(b"\0" * _pad(len(section)))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, path)  # readers see either the old or the new file
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return count
+
+
+def build_snapshot(path, version):
+    """
+    Exports the books from the database, `version` is the books version it was read at.
+    """
+    rows = (
+        Book.objects.order_by("title", "book_id")
+        .values_list(
+            "book_id",
+            "isbn",
+            "authors",
+            "publication_year",
+            "title",
+            "language",
+        )
+        .iterator(chunk_size=10_000)
+    )
+    return write_snapshot(path, version, rows)
+
+
+class CatalogSnapshot:
+    def __init__(self, path):
+        with open(path, "rb") as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+
+        magic, self.version, self.count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+
+        names = [name for name, _ in INT_COLUMNS]
+        for name in TEXT_COLUMNS:
+            names += [f"{name}_offsets", name]
+        names += [f"{name}_lower" for name in SEARCH_COLUMNS]
+
+        sizes = struct.unpack_from(f"<{len(names)}Q", self._mmap, HEADER.size)
+        position = HEADER.size + 8 * len(names)
+        view = memoryview(self._mmap)
+        self._sections = {}
+        self._positions = {}
+        for name, size in zip(names, sizes):
+            self._sections[name] = view[position : position + size]
+            self._positions[name] = position
+            position += size + _pad(size)
+
+        # typed views straight on the mapped pages, nothing is copied
+        for name, code in INT_COLUMNS:
+            setattr(self, name, self._sections[name].cast(code))
+        for name in TEXT_COLUMNS:
+            self._sections[f"{name}_offsets"] = self._sections[f"{name}_offsets"].cast(
+                "Q"
+            )
+
+    def __len__(self):
+        return self.count
+
+    def text(self, column, row):
+        offsets = self._sections[f"{column}_offsets"]
+        return bytes(self._sections[column][offsets[row] : offsets[row + 1]]).decode()
+
+    def book(self, row):
+        """
+        An unsaved Book for the templates, without its availability.
+        """
+        return Book(
+            book_id=self.book_id[row],
+            isbn=self.text("isbn", row),
+            authors=self.text("authors", row),
+            publication_year=self.publication_year[row],
+            title=self.text("title", row),
+            language=self.text("language", row),
+        )
+
+    def find(self, column, needle):
+        """
+        Rows whose `column` contains `needle`, case-insensitive for ASCII like SQLite's LIKE.
+        Searches the whole heap with mmap.find, so the cost follows the number of matches.
+        """
+        offsets = self._sections[f"{column}_offsets"]
+        heap_start = self._positions[f"{column}_lower"]
+        heap_end = heap_start + len(self._sections[f"{column}_lower"])
+        needle = needle.encode().lower()
+        rows = set()
+
+        position = heap_start
+        while True:
+            hit = self._mmap.find(needle, position, heap_end)
+            if hit == -1:
+                break
+            hit -= heap_start
+            row = bisect.bisect_right(offsets, hit) - 1
+            if hit + len(needle) <= offsets[row + 1]:
+                rows.add(row)
+                position = heap_start + offsets[row + 1]  # one match per row is enough
+            else:
+                position = heap_start + hit + 1
+
+        return rows
+
+    def order(self, sort):
+        if sort == "book_id":
+            return self.id_order
+        if sort == "publication_year":
+            return self.year_order
+        return range(self.count)
+
+    def sort_key(self, sort):
+        if sort == "book_id":
+            return self.book_id.__getitem__
+        if sort == "publication_year":
+            return lambda row: (self.publication_year[row], row)
+        return None  # rows are stored in title order
+
+
+class SnapshotResult:
+    """
+    A lazy sequence of snapshot rows for the paginator, only the rows of the requested
+    page are turned into Book objects.
+    """
+
+    def __init__(self, snapshot, rows):
+        self.snapshot = snapshot
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.snapshot.book(row) for row in self.rows[index]]
+        return self.snapshot.book(self.rows[index])
+
+    def __iter__(self):
+        return (self.snapshot.book(row) for row in self.rows)
+
+
+def search(snapshot, title=None, author=None, match_all=False, sort="title"):
+    """
+    The snapshot version of the book list query, see BookListView.get_queryset.
+    """
+    matches = [
+        snapshot.find(column, value)
+        for column, value in (("title", title), ("authors", author))
+        if value
+    ]
+
+    if not matches:
+        return SnapshotResult(snapshot, snapshot.order(sort))
+
+    rows = set.intersection(*matches) if match_all else set.union(*matches)
+    return SnapshotResult(snapshot, sorted(rows, key=snapshot.sort_key(sort)))
+
+
+_current = None
+_lock = threading.Lock()
+
+
+def current_snapshot(version):
+    """
+    The mapped snapshot if it was built from `version` of the books, None when snapshots are
+    disabled, missing, stale or in an older format (callers fall back to the database then).
+    """
+    global _current
+
+    path = settings.CATALOG_SNAPSHOT_PATH
+    if not path:
+        return None
+
+    snapshot = _current
+    if snapshot is None or snapshot.version != version:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        if snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns):
+            with _lock:
+                snapshot = _current
+                if snapshot is None or snapshot.identity != (
+                    stat.st_ino,
+                    stat.st_mtime_ns,
+                ):
+                    # the old mapping is unmapped once the last request using it is done
+                    try:
+                        snapshot = _current = CatalogSnapshot(path)
+                    except ValueError:
+                        # written by an older version, until it is rebuilt
+                        return None
+
+    return snapshot if snapshot.version == version else None
+
+
+def load_availability(books):
+    """
+    Fills book.availability of the snapshot books of a page, with one query.
+    """
+    books = {book.pk: book for book in books}
+    found = {
+        availability.book_id: availability
+        for availability in Availability.objects.filter(book_id__in=books)
+    }
+    for book_id, book in books.items():
+        availability = found.get(book_id)
+        if availability is not None:
+            availability.book = book
+        # None for books without one, like select_related leaves it
+        Book.availability.related.set_cached_value(book, availability)
@@ -0,0 +1,45 @@
+from django.http import StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+# rendered where the rows go, the page is split around it
+ROWS_MARKER = "<!-- rows -->"
+
+
+def stream_rows(
+    request,
+    template_name,
+    context,
+    rows_template,
+    rows_key="object_list",
+    chunk_size=50,
+):
+    """
+    Renders `template_name` with the rows left out and streams it: everything up to the rows
+    goes out first, then `rows_template` for `chunk_size` rows at a time, then the rest.
+    The template shows `rows_marker` where the rows belong.
+    """
+    page = render_to_string(
+        template_name, {**context, "rows_marker": mark_safe(ROWS_MARKER)}, request
+    )
+    head, marker, tail = page.partition(ROWS_MARKER)
+
+    rows = context[rows_key]
+    template = get_template(rows_template)
+    rows_context = dict(context)
+    if marker:
+        # context processors ran for the page already, the rows only need the csrf token.
+        # it's read now, the csrf cookie is set before the body is sent
+        rows_context["csrf_token"] = get_token(request)
+
+    def content():
+        yield head
+        if marker:
+            for start in range(0, len(rows), chunk_size):
+                yield template.render(
+                    {**rows_context, rows_key: rows[start : start + chunk_size]}
+                )
+        yield tail
+
+    return StreamingHttpResponse(content())
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import Borrows, Wishlist
+from catalog.paginators import parse_cursor
+from catalog.tests.utils import create_books
+from catalog.views import ACCOUNT_ROWS
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    AUTHENTICATION_BACKENDS=["catalog.backends.CachedModelBackend"],
+)
+class AccountViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.other = User.objects.create_user(username="other", password="pass")
+        self.books = create_books(60, total_copies=3, available_copies=2)
+
+        now = timezone.now()
+        self.history = []
+        for day, book in enumerate(self.books[:30]):
+            loan = Borrows.objects.create(
+                user=self.user, book=book, returned=now - timedelta(days=day)
+            )
+            # created is auto_now_add, a loan a day going back
+            Borrows.objects.filter(pk=loan.pk).update(
+                created=now - timedelta(days=day + 7)
+            )
+            self.history.append(loan)
+        Borrows.objects.create(
+            user=self.user, book=self.books[40], due=now - timedelta(days=1)
+        )
+        Borrows.objects.create(user=self.user, book=self.books[41])
+        Wishlist.objects.create(user=self.user, book=self.books[50])
+        Borrows.objects.create(user=self.other, book=self.books[42])
+        Wishlist.objects.create(user=self.other, book=self.books[51])
+
+        self.client = Client()
+        self.client.login(username="reader", password="pass")
+        self.client.get(reverse("index"))  # the first request warms the session cache
+
+    def test_lists_the_users_loans_and_wishlist(self):
+        response = self.client.get(reverse("account"))
+
+        self.assertEqual([loan.book_id for loan in response.context["loans"]], [42, 41])
+        self.assertEqual([item.book_id for item in response.context["wishlist"]], [51])
+        self.assertContains(response, "overdue", count=1)
+        self.assertNotContains(response, "Title 43")  # other's loan
+        self.assertNotContains(response, "Title 52")  # other's wishlist
+
+    def test_history_is_paged_newest_first(self):
+        response = self.client.get(reverse("account"))
+        first = response.context["history"]
+        self.assertEqual(len(first), ACCOUNT_ROWS)
+        self.assertEqual(first[0].pk, self.history[0].pk)
+
+        response = self.client.get(
+            reverse("account"), {"history": response.context["history_next"]}
+        )
+        rest = response.context["history"]
+        self.assertIsNone(response.context["history_next"])
+        self.assertEqual(
+            [loan.pk for loan in first + rest], [loan.pk for loan in self.history]
+        )
+
+    def test_same_created_time_is_paged_by_id(self):
+        Borrows.objects.filter(user=self.user).update(created=timezone.now())
+
+        seen = []
+        cursor = None
+        while True:
+            response = self.client.get(reverse("account"), {"history": cursor or ""})
+            seen += [loan.pk for loan in response.context["history"]]
+            cursor = response.context["history_next"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, sorted((loan.pk for loan in self.history), reverse=True))
+
+    def test_long_history_takes_three_queries(self):
+        Borrows.objects.bulk_create(
+            Borrows(user=self.user, book=self.books[day % 30], returned=timezone.now())
+            for day in range(3000)
+        )
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("account"))
+            # the book and its availability are loaded with the rows
+            for item in response.context["wishlist"]:
+                item.book.availability.available_copies
+        self.assertIsNotNone(response.context["history_next"])
+
+        with self.assertNumQueries(3):
+            self.client.get(
+                reverse("account"), {"history": response.context["history_next"]}
+            )
+
+    def test_bad_cursor_starts_at_the_first_page(self):
+        self.assertIsNone(parse_cursor("yesterday|1"))
+        self.assertIsNone(parse_cursor("2026-01-01T00:00:00|x"))
+
+        response = self.client.get(reverse("account"), {"history": "nonsense"})
+        self.assertEqual(response.context["history"][0].pk, self.history[0].pk)
@@ -0,0 +1,210 @@
+from unittest import mock
+
+from django.db import connection
+from django.contrib.admin.sites import site
+from django.test import TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from catalog.models import Book, Availability, Borrows, Wishlist
+from catalog.paginators import EstimatedCountPaginator
+from catalog.tests.utils import create_books
+from catalog.versioning import get_books_version, get_catalog_version
+
+
+class BaseAdminTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = User.objects.create_superuser(
+            username="admin", password="adminpassword"
+        )
+        self.client.login(username="admin", password="adminpassword")
+
+    def create_books(self, first_id, count):
+        return create_books(count, first_id, total_copies=2, available_copies=1)
+
+
+class AvailabilityAdminTest(BaseAdminTest):
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """
+        Test that the changelist doesn't do a query per row for Availability.__str__.
+        """
+        url = reverse("admin:catalog_availability_changelist")
+        self.create_books(1, 5)
+        self.client.get(url)  # warm up session and content types
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+
+        self.create_books(100, 40)
+        with self.assertNumQueries(len(small.captured_queries)):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_changelist_is_ordered_by_book(self):
+        self.create_books(1, 3)
+        response = self.client.get(
+            reverse("admin:catalog_availability_changelist")
+        )
+        self.assertEqual(
+            [row.book_id for row in response.context["cl"].result_list], [1, 2, 3]
+        )
+
+    def test_add_copy_action(self):
+        """
+        Test that the bulk action increments both counters of the selected rows.
+        """
+        self.create_books(1, 3)
+        response = self.client.post(
+            reverse("admin:catalog_availability_changelist"),
+            {"action": "add_copy", "_selected_action": [1, 2]},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(
+                Availability.objects.order_by("book_id").values_list(
+                    "total_copies", "available_copies"
+                )
+            ),
+            [(3, 2), (3, 2), (2, 1)],
+        )
+
+    def test_remove_copy_action_skips_books_without_available_copies(self):
+        """
+        Test that a copy is never removed from a book that has none on the shelf.
+        """
+        self.create_books(1, 2)
+        Availability.objects.filter(book_id=2).update(available_copies=0)
+        self.client.post(
+            reverse("admin:catalog_availability_changelist"),
+            {"action": "remove_copy", "_selected_action": [1, 2]},
+        )
+        self.assertEqual(
+            list(
+                Availability.objects.order_by("book_id").values_list(
+                    "total_copies", "available_copies"
+                )
+            ),
+            [(1, 0), (2, 0)],
+        )
+
+
+class BookAdminTest(BaseAdminTest):
+    def test_search_by_isbn_and_title_prefix(self):
+        self.create_books(1, 3)
+        url = reverse("admin:catalog_book_changelist")
+
+        response = self.client.get(url, {"q": f"{2:013d}"})
+        self.assertEqual([book.pk for book in response.context["cl"].result_list], [2])
+
+        response = self.client.get(url, {"q": "Title 3"})
+        self.assertEqual([book.pk for book in response.context["cl"].result_list], [3])
+
+        # "author" is only in authors, 2 is the book_id
+        response = self.client.get(url, {"q": "author 2"})
+        self.assertEqual([book.pk for book in response.context["cl"].result_list], [2])
+
+    def test_search_seeks_indexes(self):
+        self.create_books(1, 3)
+        request = RequestFactory().get("/")
+        request.user = self.admin_user
+        for model, term in (
+            (Book, "title 2"),
+            (Availability, "title"),
+            (Borrows, "admin"),
+        ):
+            model_admin = site._registry[model]
+            queryset, _ = model_admin.get_search_results(
+                request, model_admin.get_queryset(request), term
+            )
+            self.assertNotIn("SCAN", queryset.explain())
+
+    def test_related_search(self):
+        self.create_books(1, 3)
+        url = reverse("admin:catalog_availability_changelist")
+
+        response = self.client.get(url, {"q": "TITLE 2"})
+        self.assertEqual(
+            [row.book_id for row in response.context["cl"].result_list], [2]
+        )
+
+    def test_language_filter_has_fixed_choices(self):
+        self.create_books(1, 3)
+        Book.objects.filter(book_id=2).update(language="en-US")
+        Book.objects.filter(book_id=3).update(language="spa")
+        url = reverse("admin:catalog_book_changelist")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"language": "english"})
+
+        self.assertEqual(
+            sorted(book.pk for book in response.context["cl"].result_list), [1, 2]
+        )
+        self.assertFalse(any("DISTINCT" in query["sql"] for query in queries))
+
+    def test_bulk_delete_bumps_the_version_once(self):
+        self.create_books(1, 5)
+        Wishlist.objects.create(user=self.admin_user, book_id=1)
+        before, _ = get_catalog_version()
+        books_before = get_books_version()
+
+        response = self.client.post(
+            reverse("admin:catalog_book_changelist"),
+            {
+                "action": "delete_selected",
+                "_selected_action": [1, 2, 3, 4],
+                "post": "yes",
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Book.objects.values_list("pk", flat=True)), [5])
+        self.assertEqual(get_catalog_version()[0], before + 1)
+        self.assertEqual(get_books_version(), books_before + 1)
+
+    def test_wishlist_changelist(self):
+        book = self.create_books(1, 1)[0]
+        Wishlist.objects.create(user=self.admin_user, book=book)
+        response = self.client.get(reverse("admin:catalog_wishlist_changelist"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Title 1")
+
+
+class EstimatedCountPaginatorTest(BaseAdminTest):
+    def test_unfiltered_queryset_uses_estimate(self):
+        self.create_books(1, 3)
+        with mock.patch(
+            "catalog.paginators.estimated_row_count", return_value=2_000_000
+        ):
+            paginator = EstimatedCountPaginator(Book.objects.all(), 100)
+            self.assertEqual(paginator.count, 2_000_000)
+
+    def test_filtered_queryset_and_small_tables_use_exact_count(self):
+        self.create_books(1, 3)
+        with mock.patch(
+            "catalog.paginators.estimated_row_count", return_value=2_000_000
+        ):
+            paginator = EstimatedCountPaginator(Book.objects.filter(book_id=1), 100)
+            self.assertEqual(paginator.count, 1)
+
+        with mock.patch("catalog.paginators.estimated_row_count", return_value=50):
+            paginator = EstimatedCountPaginator(Book.objects.all(), 100)
+            self.assertEqual(paginator.count, 3)
+
+    def test_estimate_without_statistics(self):
+        """
+        Test that without ANALYZE there is no estimate, even when the ids are large and sparse.
+        """
+        self.create_books(1, 3)
+        self.create_books(20_000_000, 2)
+        Book.objects.filter(book_id=1).delete()
+
+        with mock.patch("catalog.paginators.ESTIMATE_THRESHOLD", 2):
+            paginator = EstimatedCountPaginator(
+                Availability.objects.order_by("book_id"), 100
+            )
+            self.assertEqual(paginator.count, 4)
+            paginator = EstimatedCountPaginator(Book.objects.all(), 100)
+            self.assertEqual(paginator.count, 4)
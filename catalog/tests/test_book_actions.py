@@ -0,0 +1,171 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.shortcuts import get_object_or_404
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from catalog.models import Book, Availability, Borrows, Wishlist
+
+
+class BaseBookActionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.client = Client()
+        self.client.login(username="reader", password="pass")
+
+        self.book = Book.objects.create(
+            book_id=1,
+            isbn="0000000000001",
+            authors="Author",
+            publication_year=2000,
+            title="On the Shelf",
+            language="eng",
+        )
+        Availability.objects.create(book=self.book, total_copies=2, available_copies=1)
+        self.lent_out = Book.objects.create(
+            book_id=2,
+            isbn="0000000000002",
+            authors="Author",
+            publication_year=2000,
+            title="All Lent Out",
+            language="eng",
+        )
+        Availability.objects.create(
+            book=self.lent_out, total_copies=1, available_copies=0
+        )
+
+
+class BorrowActionTest(BaseBookActionTest):
+    def test_fragment_request_gets_the_updated_row(self):
+        response = self.client.post(
+            reverse("borrow", args=[1]),
+            {"next": reverse("books") + "?page=2"},
+            headers={"x-fragment": "row"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "book_list_rows.html")
+        self.assertTemplateNotUsed(response, "book_list.html")
+        self.assertContains(response, '<tr id="book-1">', count=1)
+        # borrowed, so the button is gone
+        self.assertNotContains(response, "Borrow</button>")
+        self.assertContains(response, "<td>0</td>")
+
+    def test_json_request_gets_the_book_state(self):
+        response = self.client.post(
+            reverse("borrow", args=[1]), headers={"accept": "application/json"}
+        )
+
+        self.assertEqual(
+            response.json(),
+            {
+                "book_id": 1,
+                "available_copies": 0,
+                "total_copies": 2,
+                "is_borrowed": True,
+                "is_wishlisted": False,
+            },
+        )
+
+    def test_form_post_goes_back_to_its_page(self):
+        response = self.client.post(
+            reverse("borrow", args=[1]), {"next": "/books/?title=Shelf&page=2"}
+        )
+        self.assertRedirects(
+            response, "/books/?title=Shelf&page=2", fetch_redirect_response=False
+        )
+
+    def test_next_to_another_site_is_ignored(self):
+        response = self.client.post(
+            reverse("borrow", args=[1]), {"next": "https://example.com/books/"}
+        )
+        self.assertRedirects(response, reverse("books"))
+
+    def test_last_copy_taken_meanwhile_is_not_lent_twice(self):
+        def other_reader_takes_it(*args, **kwargs):
+            book = get_object_or_404(*args, **kwargs)  # still shows the copy
+            Availability.objects.filter(book_id=1).update(available_copies=0)
+            return book
+
+        with mock.patch("catalog.views.get_object_or_404", other_reader_takes_it):
+            self.client.post(reverse("borrow", args=[1]))
+
+        self.assertFalse(Borrows.objects.exists())
+        self.assertEqual(Availability.objects.get(book_id=1).available_copies, 0)
+
+    def test_unknown_book_is_not_found(self):
+        response = self.client.post(reverse("borrow", args=[99]))
+        self.assertEqual(response.status_code, 404)
+
+
+class WishlistActionTest(BaseBookActionTest):
+    def test_add_and_remove(self):
+        url = reverse("wishlist", args=[2])
+
+        response = self.client.post(url, headers={"x-fragment": "row"})
+        self.assertContains(response, "Remove from wishlist")
+        # adding twice doesn't toggle it off again
+        self.client.post(url)
+        self.assertTrue(Wishlist.objects.filter(user=self.user, book_id=2).exists())
+
+        response = self.client.post(url, {"remove": "1"}, headers={"x-fragment": "row"})
+        self.assertContains(response, "Add to wishlist")
+        self.assertFalse(Wishlist.objects.filter(user=self.user, book_id=2).exists())
+
+    def test_concurrent_add_is_not_an_error(self):
+        exists = QuerySet.exists
+
+        def other_tab_adds_it_first(queryset):
+            # the row another request inserts right after this one looked
+            if queryset.model is Wishlist and not exists(Wishlist.objects.all()):
+                Wishlist.objects.bulk_create([Wishlist(user=self.user, book_id=2)])
+                return False
+            return exists(queryset)
+
+        with mock.patch.object(QuerySet, "exists", other_tab_adds_it_first):
+            response = self.client.post(
+                reverse("wishlist", args=[2]), headers={"accept": "application/json"}
+            )
+        # the same without looking first
+        response = self.client.post(
+            reverse("wishlist", args=[2]), headers={"accept": "application/json"}
+        )
+
+        self.assertTrue(response.json()["is_wishlisted"])
+        self.assertEqual(Wishlist.objects.count(), 1)
+
+    def test_delete_removes(self):
+        Wishlist.objects.create(user=self.user, book_id=2)
+
+        response = self.client.delete(
+            reverse("wishlist", args=[2]), headers={"accept": "application/json"}
+        )
+
+        self.assertFalse(response.json()["is_wishlisted"])
+        self.assertFalse(Wishlist.objects.exists())
+
+    def test_get_changes_nothing(self):
+        Wishlist.objects.create(user=self.user, book_id=2)
+
+        response = self.client.get(reverse("wishlist", args=[2]))
+
+        self.assertEqual(response.status_code, 405)
+        self.assertTrue(Wishlist.objects.exists())
+
+
+class BookListActionFormsTest(BaseBookActionTest):
+    def test_forms_come_back_to_the_current_page(self):
+        Wishlist.objects.create(user=self.user, book_id=2)
+        self.client.get(reverse("index"))
+
+        response = self.client.get(reverse("books"), {"sort": "book_id", "page": 1})
+
+        next_url = reverse("books") + "?sort=book_id&amp;page=1"
+        self.assertContains(
+            response, f'<input type="hidden" name="next" value="{next_url}">', count=2
+        )
+        self.assertContains(response, 'name="remove"')
+        self.assertNotContains(response, 'method="get"')
+        self.assertEqual(Borrows.objects.count(), 0)
@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from catalog.models import Book, Availability, Wishlist, CatalogVersion
+from catalog.versioning import batched_catalog_changes, get_catalog_version
+
+
+class BaseConditionalTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user1 = User.objects.create_user(username="reader1", password="pass1")
+        self.user2 = User.objects.create_user(username="reader2", password="pass2")
+        self.client.login(username="reader1", password="pass1")
+
+        self.book = Book.objects.create(
+            book_id=1,
+            isbn="9780321765723",
+            authors="Eric Matthes",
+            publication_year=2019,
+            title="Python Crash Course",
+            language="English",
+        )
+        Availability.objects.create(book=self.book, total_copies=2, available_copies=0)
+
+        # the first page sets the CSRF cookie, which is part of the ETag
+        self.client.get(reverse("books"))
+
+
+class CatalogVersionTest(BaseConditionalTest):
+    def test_writes_bump_the_version(self):
+        version, _ = get_catalog_version()
+
+        Wishlist.objects.create(user=self.user1, book=self.book)
+        self.assertEqual(get_catalog_version()[0], version + 1)
+
+        Wishlist.objects.filter(user=self.user1).delete()
+        self.assertEqual(get_catalog_version()[0], version + 2)
+
+    def test_batched_changes_bump_once(self):
+        version, _ = get_catalog_version()
+
+        with batched_catalog_changes():
+            Wishlist.objects.create(user=self.user1, book=self.book)
+            Wishlist.objects.create(user=self.user2, book=self.book)
+            Book.objects.all().delete()
+
+        self.assertEqual(get_catalog_version()[0], version + 1)
+
+    def test_failed_batch_does_not_bump(self):
+        version, _ = get_catalog_version()
+
+        with self.assertRaises(ValueError):
+            with batched_catalog_changes(books=True):
+                Wishlist.objects.create(user=self.user1, book=self.book)
+                raise ValueError
+        self.assertEqual(get_catalog_version()[0], version)
+
+        # the batch is over, the next change bumps on its own again
+        Wishlist.objects.filter(user=self.user1).delete()
+        self.assertEqual(get_catalog_version()[0], version + 1)
+
+    def test_missing_row_is_recreated(self):
+        CatalogVersion.objects.all().delete()
+        self.assertEqual(get_catalog_version(), (0, None))
+
+        Wishlist.objects.create(user=self.user1, book=self.book)
+        self.assertEqual(get_catalog_version()[0], 1)
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    AUTHENTICATION_BACKENDS=["catalog.backends.CachedModelBackend"],
+)
+class ConditionalGetTest(BaseConditionalTest):
+    def test_unchanged_book_list_is_not_modified(self):
+        response = self.client.get(reverse("books"))
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        # the version lookup is the only query, no list query and no rendering
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("books"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_index_is_not_modified(self):
+        response = self.client.get(reverse("index"))
+        self.assertIn("Last-Modified", response)
+
+        response = self.client.get(
+            reverse("index"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_write_changes_the_etag(self):
+        etag = self.client.get(reverse("books"))["ETag"]
+
+        Wishlist.objects.create(user=self.user2, book=self.book)
+
+        response = self.client.get(reverse("books"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_staff_change_changes_the_etag(self):
+        etag = self.client.get(reverse("books"))["ETag"]
+
+        self.user1.is_staff = True
+        self.user1.save()
+
+        response = self.client.get(reverse("books"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Stock-take")
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get(reverse("books"))["ETag"]
+
+        other = Client()
+        other.login(username="reader2", password="pass2")
+        other.get(reverse("books"))
+
+        response = other.get(reverse("books"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,132 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog import facets
+from catalog.models import Book, Availability, Wishlist
+from catalog.versioning import get_books_version
+
+
+class BaseFacetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.client = Client()
+        self.client.login(username="reader", password="pass")
+
+        for book_id, title, year, language in (
+            (1, "Python Tricks", 2017, "English"),
+            (2, "Python Cookbook", 2013, "English"),
+            (3, "Python Kochbuch", 2014, "Deutsch"),
+            (4, "Der Prozess", 1925, "Deutsch"),
+            (5, "Gatsby", 1925, "English"),
+            (6, "Anabasis", -5, "Greek"),
+        ):
+            book = Book.objects.create(
+                book_id=book_id,
+                isbn=f"{book_id:013d}",
+                authors="Author",
+                publication_year=year,
+                title=title,
+                language=language,
+            )
+            Availability.objects.create(book=book, total_copies=1, available_copies=1)
+
+    def counts(self, language=None, decade=None, queryset=None, version=None):
+        queryset = Book.objects.all() if queryset is None else queryset
+        if version is None:
+            version = get_books_version()
+        return facets.facet_counts(
+            queryset, version, str(queryset.query), language, decade
+        )
+
+
+class FacetCountsTest(BaseFacetTest):
+    def test_counts_without_a_selection(self):
+        self.assertEqual(
+            self.counts(),
+            {
+                "language": [("English", 3), ("Deutsch", 2), ("Greek", 1)],
+                "decade": [(-10, 1), (1920, 2), (2010, 3)],
+            },
+        )
+
+    def test_each_facet_ignores_its_own_selection(self):
+        result = self.counts(language="Deutsch", decade=2010)
+        self.assertEqual(result["language"], [("English", 2), ("Deutsch", 1)])
+        self.assertEqual(result["decade"], [(1920, 1), (2010, 1)])
+
+    def test_counts_follow_the_search(self):
+        result = self.counts(queryset=Book.objects.filter(title__contains="Python"))
+        self.assertEqual(result["language"], [("English", 2), ("Deutsch", 1)])
+        self.assertEqual(result["decade"], [(2010, 3)])
+
+    def test_counts_are_cached_per_books_version(self):
+        version = get_books_version()
+        self.counts(version=version)
+        with self.assertNumQueries(0):
+            self.counts(language="English", version=version)
+            self.counts(decade=1920, version=version)
+
+        Book.objects.filter(book_id=6).delete()  # bumps the version
+        self.assertEqual(self.counts()["language"], [("English", 3), ("Deutsch", 2)])
+
+    def test_decade_parsing(self):
+        for value, decade in (
+            ("1920", 1920),
+            ("-10", -10),
+            ("1925", None),
+            ("x", None),
+        ):
+            with self.subTest(value=value):
+                self.assertEqual(facets.parse_decade(value), decade)
+
+
+class BookListFacetTest(BaseFacetTest):
+    def books(self, **params):
+        response = self.client.get(reverse("books"), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [book.pk for book in response.context["book_list"]]
+
+    def test_filters_combine_with_the_search(self):
+        _, found = self.books(title="Python", language="English")
+        self.assertEqual(found, [2, 1])
+
+        _, found = self.books(language="Deutsch", decade="1920")
+        self.assertEqual(found, [4])
+
+        _, found = self.books(decade="-10")
+        self.assertEqual(found, [6])
+
+    def test_facet_links_are_shown(self):
+        response, _ = self.books(title="Python")
+
+        self.assertEqual(response.context["facets"]["decade"], [(2010, 3)])
+        self.assertContains(response, "?title=Python&amp;language=Deutsch")
+        self.assertContains(response, "2010s")
+
+    def test_one_grouped_query_per_search(self):
+        self.books(title="Python")
+
+        # a different facet selection of the same search reuses the cached counts
+        with CaptureQueriesContext(connection) as queries:
+            self.books(title="Python", language="English")
+
+        self.assertFalse(
+            [query for query in queries if "GROUP BY" in query["sql"]], queries
+        )
+
+    def test_loans_and_wishlists_keep_the_cached_counts(self):
+        self.books(title="Python")
+
+        self.client.post(reverse("borrow", args=[1]))
+        Wishlist.objects.create(user=self.user, book_id=2)
+        with CaptureQueriesContext(connection) as queries:
+            self.books(title="Python")
+
+        self.assertFalse(
+            [query for query in queries if "GROUP BY" in query["sql"]], queries
+        )
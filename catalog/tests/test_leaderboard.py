@@ -0,0 +1,207 @@
+import datetime as dt
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog import leaderboard
+from catalog.models import (
+    Borrows,
+    Wishlist,
+    PopularityCounter,
+    PopularityWindow,
+)
+from catalog.tests.utils import create_books
+
+
+class BaseLeaderboardTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f"reader{number}", password="pass")
+            for number in range(3)
+        ]
+        self.books = create_books(3)
+
+    def counts(self, kind, window):
+        cache.clear()
+        return [(book.pk, count) for book, count in leaderboard.top_books(kind, window)]
+
+
+class CounterTest(BaseLeaderboardTest):
+    def test_borrows_are_counted_once(self):
+        loan = Borrows.objects.create(user=self.users[0], book=self.books[0])
+        Borrows.objects.create(user=self.users[1], book=self.books[0])
+        Borrows.objects.create(user=self.users[1], book=self.books[1])
+
+        loan.returned = timezone.now()
+        loan.save()  # returning is not a new borrow
+
+        for window in ("week", "month", "all"):
+            with self.subTest(window=window):
+                self.assertEqual(
+                    self.counts(PopularityCounter.BORROWED, window), [(1, 2), (2, 1)]
+                )
+
+    def test_wishlist_follows_adds_and_removes(self):
+        Wishlist.objects.create(user=self.users[0], book=self.books[2])
+        Wishlist.objects.create(user=self.users[1], book=self.books[2])
+        Wishlist.objects.create(user=self.users[0], book=self.books[1])
+        Wishlist.objects.filter(user=self.users[0], book=self.books[1]).delete()
+
+        self.assertEqual(self.counts(PopularityCounter.WISHLISTED, "all"), [(3, 2)])
+
+    def test_old_buckets_leave_the_windows(self):
+        today = timezone.localdate()
+        PopularityCounter.objects.bulk_create(
+            [
+                PopularityCounter(
+                    book=self.books[0],
+                    kind=PopularityCounter.BORROWED,
+                    bucket=today - dt.timedelta(days=10),
+                    count=5,
+                ),
+                PopularityCounter(
+                    book=self.books[1],
+                    kind=PopularityCounter.BORROWED,
+                    bucket=today - dt.timedelta(days=40),
+                    count=7,
+                ),
+                PopularityCounter(
+                    book=self.books[2],
+                    kind=PopularityCounter.BORROWED,
+                    bucket=today,
+                    count=1,
+                ),
+            ]
+        )
+
+        self.assertEqual(self.counts(PopularityCounter.BORROWED, "week"), [(3, 1)])
+        self.assertEqual(
+            self.counts(PopularityCounter.BORROWED, "month"), [(1, 5), (3, 1)]
+        )
+
+        self.assertEqual(leaderboard.prune_buckets(today), 1)
+
+    def test_windows_read_the_rolled_totals(self):
+        today = timezone.localdate()
+        PopularityCounter.objects.bulk_create(
+            PopularityCounter(
+                book=self.books[0],
+                kind=PopularityCounter.BORROWED,
+                bucket=today - dt.timedelta(days=days),
+                count=2,
+            )
+            for days in (0, 6, 7)
+        )
+        self.assertEqual(leaderboard.roll_windows(today), 2)
+
+        Borrows.objects.create(user=self.users[0], book=self.books[1])
+
+        with CaptureQueriesContext(connection) as queries:
+            week = self.counts(PopularityCounter.BORROWED, "week")
+        self.assertEqual(week, [(1, 4), (2, 1)])
+        self.assertEqual(
+            self.counts(PopularityCounter.BORROWED, "month"), [(1, 6), (2, 1)]
+        )
+        # read from the totals, not summed from the buckets
+        self.assertFalse(
+            any("SUM(" in query["sql"] for query in queries.captured_queries)
+        )
+
+    def test_rolling_drops_the_day_that_left_the_window(self):
+        today = timezone.localdate()
+        PopularityCounter.objects.create(
+            book=self.books[0],
+            kind=PopularityCounter.BORROWED,
+            bucket=today - dt.timedelta(days=6),
+            count=3,
+        )
+        leaderboard.roll_windows(today - dt.timedelta(days=1))
+        self.assertTrue(
+            PopularityWindow.objects.filter(days=7, book=self.books[0]).exists()
+        )
+
+        call_command("rebuild_leaderboard", prune=True, stdout=StringIO())
+
+        self.assertEqual(self.counts(PopularityCounter.BORROWED, "week"), [(1, 3)])
+        PopularityCounter.objects.all().update(bucket=today - dt.timedelta(days=7))
+        leaderboard.roll_windows(today)
+        self.assertEqual(self.counts(PopularityCounter.BORROWED, "week"), [])
+        self.assertEqual(self.counts(PopularityCounter.BORROWED, "month"), [(1, 3)])
+
+    def test_top_list_is_cached(self):
+        Borrows.objects.create(user=self.users[0], book=self.books[0])
+        leaderboard.top_books(PopularityCounter.BORROWED, "all")
+
+        with self.assertNumQueries(0):
+            leaderboard.top_books(PopularityCounter.BORROWED, "all")
+
+
+class RebuildLeaderboardCommandTest(BaseLeaderboardTest):
+    def test_rebuild_matches_incremental_counters(self):
+        Borrows.objects.create(user=self.users[0], book=self.books[0])
+        Borrows.objects.create(user=self.users[1], book=self.books[0])
+        Borrows.objects.create(user=self.users[2], book=self.books[1])
+        Wishlist.objects.create(user=self.users[0], book=self.books[2])
+
+        before = sorted(
+            PopularityCounter.objects.values_list("book_id", "kind", "bucket", "count")
+        )
+        PopularityCounter.objects.all().delete()
+
+        call_command("rebuild_leaderboard", stdout=StringIO())
+
+        after = sorted(
+            PopularityCounter.objects.values_list("book_id", "kind", "bucket", "count")
+        )
+        self.assertEqual(after, before)
+
+    def test_migration_seeds_the_counters(self):
+        """
+        Test that the data migration counts the loans and wishlist items from before 0006.
+        """
+        Borrows.objects.create(user=self.users[0], book=self.books[0])
+        Borrows.objects.create(user=self.users[1], book=self.books[0])
+        Wishlist.objects.create(user=self.users[0], book=self.books[2])
+        expected = sorted(
+            PopularityCounter.objects.values_list("book_id", "kind", "bucket", "count")
+        )
+        PopularityCounter.objects.update(count=0)  # as if they predate the counters
+
+        migration = import_module("catalog.migrations.0015_seed_popularity_counters")
+        migration.seed_popularity_counters(apps, None)
+
+        self.assertEqual(
+            sorted(
+                PopularityCounter.objects.values_list(
+                    "book_id", "kind", "bucket", "count"
+                )
+            ),
+            expected,
+        )
+        self.assertEqual(
+            self.counts(PopularityCounter.BORROWED, "week"), [(1, 2)]
+        )
+
+
+class PopularBooksViewTest(BaseLeaderboardTest):
+    def test_popular_books_page(self):
+        Borrows.objects.create(user=self.users[0], book=self.books[1])
+        client = Client()
+        client.login(username="reader0", password="pass")
+
+        response = client.get(reverse("popular_books"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "popular_books.html")
+        self.assertContains(response, "Most borrowed this week")
+        self.assertContains(response, "Title 2")
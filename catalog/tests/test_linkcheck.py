@@ -0,0 +1,216 @@
+import asyncio
+import datetime as dt
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from catalog import linkcheck
+from catalog.models import Book, AmazonLink
+
+ETAG = '"v1"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # /ok answers 200 with an ETag (304 when it is sent back), /missing 404,
+    # /moved redirects to /ok, /nowhere redirects without a Location, /loop redirects to
+    # itself and /slow takes longer than the tests' timeout
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get("If-None-Match")))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            path = self.path.split("?")[0]
+            if path == "/slow":
+                time.sleep(1)
+                self.answer(200)
+            elif path == "/moved":
+                self.answer(301, Location="/ok")
+            elif path == "/nowhere":
+                self.answer(302)
+            elif path == "/loop":
+                self.answer(302, Location="/loop")
+            elif path.startswith("/ok"):
+                time.sleep(0.01)  # long enough for requests to overlap
+                if self.headers.get("If-None-Match") == ETAG:
+                    self.answer(304)
+                else:
+                    self.answer(200, ETag=ETAG, body=b"a page")
+            else:
+                self.answer(404)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def answer(self, status, body=b"", **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+
+    def handle_error(self, request, client_address):
+        pass  # clients that timed out and hung up
+
+
+class BaseLinkCheckTest(TestCase):
+    def setUp(self):
+        self.server = StubServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.book = Book.objects.create(
+            book_id=1,
+            isbn="1",
+            authors="Author",
+            publication_year=2000,
+            title="Title",
+            language="eng",
+        )
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def add_link(self, path, **fields):
+        return AmazonLink.objects.create(book=self.book, url=self.url(path), **fields)
+
+
+class CheckLinksTest(BaseLinkCheckTest):
+    def test_statuses_are_stored(self):
+        ok = self.add_link("/ok")
+        missing = self.add_link("/missing")
+        moved = self.add_link("/moved")
+        dead = AmazonLink.objects.create(book=self.book, url="http://127.0.0.1:1/")
+
+        self.assertEqual(linkcheck.check_due_links(timeout=5), (2, 2))
+
+        ok.refresh_from_db()
+        self.assertEqual(ok.status, 200)
+        self.assertEqual(ok.etag, ETAG)
+        self.assertIsNotNone(ok.last_checked)
+        self.assertIsNotNone(ok.latency_ms)
+
+        missing.refresh_from_db()
+        self.assertEqual(missing.status, 404)
+        moved.refresh_from_db()
+        self.assertEqual(moved.status, 200)  # the redirect was followed
+        dead.refresh_from_db()
+        self.assertIsNone(dead.status)
+        self.assertFalse(dead.is_alive)
+        self.assertIsNotNone(dead.last_checked)
+
+    def test_recheck_is_conditional(self):
+        link = self.add_link("/ok", status=200, etag=ETAG)
+
+        asyncio.run(linkcheck.check_links([link]))
+
+        self.assertEqual(self.server.requests, [("/ok", ETAG)])
+        self.assertEqual(link.status, 200)
+        self.assertEqual(link.etag, ETAG)
+
+    def test_redirect_without_location_is_broken(self):
+        link = self.add_link("/nowhere")
+
+        asyncio.run(linkcheck.check_links([link], interval=0))
+
+        self.assertEqual(self.server.requests, [("/nowhere", None)])
+        self.assertIsNone(link.status)
+        self.assertFalse(link.is_alive)
+
+    def test_too_many_redirects_are_broken(self):
+        link = self.add_link("/loop")
+
+        asyncio.run(linkcheck.check_links([link], interval=0))
+
+        self.assertEqual(len(self.server.requests), linkcheck.MAX_REDIRECTS + 1)
+        self.assertIsNone(link.status)
+        self.assertFalse(link.is_alive)
+
+    def test_slow_links_time_out(self):
+        link = self.add_link("/slow")
+
+        asyncio.run(linkcheck.check_links([link], timeout=0.2))
+
+        self.assertIsNone(link.status)
+        self.assertLess(link.latency_ms, 1000)
+
+    def test_waiting_for_the_host_is_not_timed(self):
+        links = [
+            AmazonLink(book=self.book, url=self.url(f"/ok?n={number}"))
+            for number in range(20)
+        ]
+
+        # one at a time, the last link waits ~0.5s for its turn
+        started = time.perf_counter()
+        asyncio.run(
+            linkcheck.check_links(links, per_host=1, interval=0.025, timeout=0.2)
+        )
+
+        self.assertGreater(time.perf_counter() - started, 0.4)
+        self.assertTrue(all(link.status == 200 for link in links))
+        self.assertLess(max(link.latency_ms for link in links), 200)
+
+    def test_links_are_checked_concurrently_within_the_host_limit(self):
+        links = [
+            AmazonLink(book=self.book, url=self.url(f"/ok?n={number}"))
+            for number in range(500)
+        ]
+
+        started = time.perf_counter()
+        asyncio.run(linkcheck.check_links(links, per_host=8, interval=0))
+
+        self.assertTrue(all(link.status == 200 for link in links))
+        self.assertLessEqual(self.server.max_in_flight, 8)
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLess(time.perf_counter() - started, 10)
+
+    def test_only_links_past_the_ttl_are_checked(self):
+        fresh = self.add_link(
+            "/ok?fresh", status=200, last_checked=timezone.now() - dt.timedelta(hours=1)
+        )
+        self.add_link(
+            "/ok?stale", status=200, last_checked=timezone.now() - dt.timedelta(days=2)
+        )
+        self.add_link("/ok?new")
+
+        call_command("check_amazon_links", stdout=StringIO())
+
+        self.assertEqual(
+            sorted(path for path, _ in self.server.requests), ["/ok?new", "/ok?stale"]
+        )
+        checked = fresh.last_checked
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.last_checked, checked)
+
+    def test_command_reports_counts(self):
+        self.add_link("/ok")
+        self.add_link("/missing")
+
+        out = StringIO()
+        call_command("check_amazon_links", "--batch-size", "1", stdout=out)
+
+        self.assertIn("Checked 2 links", out.getvalue())
+        self.assertIn("1 alive and 1 broken", out.getvalue())
@@ -1,6 +1,8 @@
 from django.test import TestCase
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
+from django.contrib.auth.models import User
+from django.utils import timezone
 from catalog.models import Book, Wishlist, Borrows, AmazonLink
 import datetime as dt
 
@@ -132,4 +134,40 @@ class BookModelTest(TestCase):
         self.book2.delete()
         self.assertEqual(Book.objects.count(), initial_count - 1)
         with self.assertRaises(Book.DoesNotExist):
-            Book.objects.get(book_id=self.book2.book_id)
\ No newline at end of file
+            Book.objects.get(book_id=self.book2.book_id)
+
+
+class BorrowsModelTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="readerpass")
+        self.book = Book.objects.create(
+            book_id=1,
+            isbn="9780321765723",
+            authors="Eric Matthes",
+            publication_year=2019,
+            title="Python Crash Course",
+            language="English"
+        )
+
+    def test_borrowing_again_after_return_keeps_history(self):
+        """
+        Test that returning a book and borrowing it again adds a second loan.
+        """
+        loan = Borrows.objects.create(user=self.user, book=self.book)
+        loan.returned = timezone.now()
+        loan.save()
+
+        Borrows.objects.create(user=self.user, book=self.book)
+
+        self.assertEqual(self.user.borrowed_items.count(), 2)
+        self.assertEqual(
+            self.user.borrowed_items.filter(returned__isnull=True).count(), 1
+        )
+
+    def test_only_one_active_loan_per_user_and_book(self):
+        """
+        Test that the partial unique index rejects a second active loan of the same book.
+        """
+        Borrows.objects.create(user=self.user, book=self.book)
+        with self.assertRaises(IntegrityError):
+            Borrows.objects.create(user=self.user, book=self.book)
\ No newline at end of file
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from catalog.models import Borrows, JobCheckpoint, OverdueNotice, LOAN_PERIOD
+from catalog.overdue import CHECKPOINT, mark_overdue_loans
+from catalog.tests.utils import create_books
+
+
+class BaseOverdueTest(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.readers = [
+            User.objects.create_user(username=f"reader{number}", password="pass")
+            for number in range(3)
+        ]
+        self.books = create_books(5)
+
+    def lend(self, reader, book, days_overdue, returned=None):
+        return Borrows.objects.create(
+            user=reader,
+            book=book,
+            due=self.now - timedelta(days=days_overdue),
+            returned=returned,
+        )
+
+
+class DueDateTest(BaseOverdueTest):
+    def test_due_date_is_set_when_borrowing(self):
+        loan = Borrows.objects.create(user=self.readers[0], book=self.books[0])
+        self.assertAlmostEqual(
+            loan.due, loan.created + LOAN_PERIOD, delta=timedelta(seconds=1)
+        )
+        self.assertFalse(loan.overdue)
+
+
+class MarkOverdueLoansTest(BaseOverdueTest):
+    def setUp(self):
+        super().setUp()
+        self.overdue = [
+            self.lend(self.readers[0], self.books[0], 3),
+            self.lend(self.readers[1], self.books[0], 2),
+            self.lend(self.readers[2], self.books[1], 1),
+        ]
+        self.lend(self.readers[0], self.books[2], -1)  # due tomorrow
+        self.lend(self.readers[1], self.books[3], 5, returned=self.now)
+
+    def test_overdue_loans_are_marked_in_batches(self):
+        self.assertEqual(mark_overdue_loans(now=self.now, batch_size=2), 3)
+
+        self.assertEqual(set(Borrows.objects.filter(overdue=True)), set(self.overdue))
+        self.assertEqual(
+            sorted(OverdueNotice.objects.values_list("loan_id", "user_id")),
+            sorted((loan.pk, loan.user_id) for loan in self.overdue),
+        )
+
+    def test_a_rerun_reads_only_what_fell_due_since(self):
+        mark_overdue_loans(now=self.now)
+        checkpoint = JobCheckpoint.objects.get(name=CHECKPOINT)
+        self.assertEqual(checkpoint.state["id"], self.overdue[-1].pk)
+
+        # nothing new, and the marked loans are not read again
+        with self.assertNumQueries(2):
+            self.assertEqual(mark_overdue_loans(now=self.now), 0)
+
+        later = self.now + timedelta(days=2)
+        self.assertEqual(mark_overdue_loans(now=later), 1)
+        self.assertEqual(OverdueNotice.objects.count(), 4)
+
+    def test_an_interrupted_run_is_finished_without_duplicates(self):
+        # the first batch was written, the job died before saving the checkpoint
+        first = self.overdue[0]
+        Borrows.objects.filter(pk=first.pk).update(overdue=True)
+        OverdueNotice.objects.create(loan=first, user=first.user)
+        JobCheckpoint.objects.all().delete()
+
+        self.assertEqual(mark_overdue_loans(now=self.now), 2)
+        self.assertEqual(OverdueNotice.objects.count(), 3)
+
+    def test_full_run_ignores_the_checkpoint(self):
+        mark_overdue_loans(now=self.now)
+        # due date moved back by hand, behind the checkpoint
+        late = self.lend(self.readers[2], self.books[4], 10)
+
+        self.assertEqual(mark_overdue_loans(now=self.now), 0)
+        self.assertEqual(mark_overdue_loans(now=self.now, full=True), 1)
+        self.assertTrue(OverdueNotice.objects.filter(loan=late).exists())
+
+    def test_command(self):
+        out = StringIO()
+        call_command("mark_overdue_loans", "--batch-size", "1", stdout=out)
+        self.assertIn("Marked 3 loans as overdue", out.getvalue())
@@ -0,0 +1,130 @@
+import json
+import re
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from catalog.tests.utils import create_books
+from the_library import profiling
+
+FOLDED_LINE = re.compile(r"^[^ ].* \d+$")
+
+
+class BaseProfilingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(
+            PROFILING_DIR=self.directory, PROFILING_MAX_PROFILES=3
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        User.objects.create_user(username="staff", password="pass", is_staff=True)
+        User.objects.create_user(username="reader", password="pass")
+        create_books(100)
+
+    def client_for(self, username):
+        client = Client()
+        client.login(username=username, password="pass")
+        client.get(reverse("index"))  # the first request warms the session cache
+        return client
+
+    def saved(self):
+        return sorted(path.stem for path in self.directory.glob("*.json"))
+
+
+class ProfilingMiddlewareTest(BaseProfilingTest):
+    def test_staff_can_profile_a_page(self):
+        response = self.client_for("staff").get(reverse("books"), {"profile": "1"})
+
+        profile_id = response["X-Profile-Id"]
+        self.assertEqual(self.saved(), [profile_id])
+        summary = json.loads((self.directory / f"{profile_id}.json").read_text())
+        self.assertEqual(summary["trigger"], "staff")
+        self.assertEqual(summary["status"], 200)
+        self.assertGreater(summary["queries"], 0)
+        self.assertEqual(
+            set(summary["phases_ms"]), {"middleware", "view", "template", "sql"}
+        )
+        folded = (self.directory / f"{profile_id}.folded").read_text().splitlines()
+        for line in folded:
+            self.assertRegex(line, FOLDED_LINE)
+
+    def test_readers_cannot_ask_for_a_profile(self):
+        for client in (self.client_for("reader"), Client()):
+            with mock.patch.object(profiling, "RequestProfile") as profile:
+                response = client.get(reverse("books"), {"profile": "1"})
+
+            # not even started and thrown away
+            profile.assert_not_called()
+            self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(self.saved(), [])
+
+    def test_signed_header_profiles_anyone(self):
+        client = self.client_for("reader")
+
+        client.get(reverse("books"), headers={"x-profile": "forged"})
+        self.assertEqual(self.saved(), [])
+
+        response = client.get(
+            reverse("books"), headers={"x-profile": profiling.make_token()}
+        )
+        self.assertEqual(self.saved(), [response["X-Profile-Id"]])
+
+    def test_sampled_requests(self):
+        client = self.client_for("reader")
+        with override_settings(PROFILING_SAMPLE_RATE=1.0):
+            client.get(reverse("index"))
+
+        (profile,) = profiling.list_profiles()
+        self.assertEqual(profile["trigger"], "sampled")
+
+    def test_streamed_page_is_profiled_to_the_last_row(self):
+        response = self.client_for("staff").get(
+            reverse("books"), {"profile": "1", "per_page": 100}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(self.saved(), [])
+
+        b"".join(response.streaming_content)
+        self.assertEqual(self.saved(), [response["X-Profile-Id"]])
+
+    def test_only_the_latest_profiles_are_kept(self):
+        client = self.client_for("staff")
+        ids = [
+            client.get(reverse("index"), {"profile": "1"})["X-Profile-Id"]
+            for _ in range(5)
+        ]
+
+        self.assertEqual(self.saved(), ids[-3:])
+        self.assertEqual(len(list(self.directory.glob("*.folded"))), 3)
+
+
+class ProfilesViewTest(BaseProfilingTest):
+    def test_staff_can_list_and_download(self):
+        client = self.client_for("staff")
+        profile_id = client.get(reverse("books"), {"profile": "1"})["X-Profile-Id"]
+
+        response = client.get(reverse("profiles"))
+        self.assertContains(response, reverse("profile_download", args=[profile_id]))
+        self.assertContains(response, "X-Profile: ")
+
+        response = client.get(reverse("profile_download", args=[profile_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("attachment", response["Content-Disposition"])
+        b"".join(response.streaming_content)
+
+        response = client.get(reverse("profile_download", args=["..%2Fsecret"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_readers_cannot(self):
+        response = self.client_for("reader").get(reverse("profiles"))
+        self.assertEqual(response.status_code, 302)
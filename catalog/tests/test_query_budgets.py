@@ -0,0 +1,154 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog import leaderboard
+from catalog.models import Availability, Borrows, Wishlist
+from catalog.tests.utils import create_books
+
+# the most queries each endpoint may run, whatever the size of the catalog. A view that
+# loops over books with a query per book blows these at the larger sizes
+# the session and the user come from the cache, so these are the views' own queries
+BUDGETS = {
+    "index": 6,
+    "books": 7,  # includes the facet counts, which are cached afterwards
+    "books_page_2": 6,
+    "books_search": 7,
+    "books_faceted": 7,
+    "books_search_form": 0,
+    "popular_books": 5,  # includes the check that the week and month totals are current
+    "account": 3,
+    # the loan, the copy it takes, the version bump and one upsert each for the daily and
+    # all-time counters and for the week and month totals
+    "borrow": 8,
+    "wishlist_add": 6,
+    "wishlist_remove": 6,
+    # the fetch() from the book list, the write and just the updated row
+    "wishlist_row": 10,
+}
+
+
+# the session and the user come from the cache, as they do with a shared cache configured
+# (LIBRARY_CACHE_URL)
+cached_auth = override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    AUTHENTICATION_BACKENDS=["catalog.backends.CachedModelBackend"],
+)
+
+
+class QueryBudgetTests:
+    """
+    Runs every endpoint once and checks its number of queries against BUDGETS. Subclassed
+    below for each catalog size, so a count that grows with the catalog fails at some size.
+    """
+
+    BOOKS = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="reader", password="pass")
+        books = create_books(cls.BOOKS, total_copies=2, varied=True)
+        Availability.objects.update(available_copies=F("book_id") % 3)
+        # the user's own state on the first page: borrowed and wishlisted books
+        first_page = books[:20]
+        Borrows.objects.bulk_create(
+            Borrows(user=cls.user, book=book) for book in first_page[::4]
+        )
+        Wishlist.objects.bulk_create(
+            Wishlist(user=cls.user, book=book) for book in first_page[1::4]
+        )
+        leaderboard.roll_windows()  # as the daily job leaves them
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.login(username="reader", password="pass")
+        self.client.get(reverse("index"))  # the first request warms the session cache
+
+    def assertWithinBudget(self, name, method, url, data=None, fragment=False):
+        headers = {"x-fragment": "row"} if fragment else None
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, headers=headers)
+        self.assertLess(response.status_code, 400)
+        self.assertLessEqual(
+            len(queries),
+            BUDGETS[name],
+            f"{name} ran {len(queries)} queries with {self.BOOKS} books:\n"
+            + "\n".join(query["sql"] for query in queries),
+        )
+        return response
+
+    def test_index(self):
+        self.assertWithinBudget("index", "get", reverse("index"))
+
+    def test_books(self):
+        self.assertWithinBudget("books", "get", reverse("books"))
+        if self.BOOKS > 20:
+            self.assertWithinBudget(
+                "books_page_2", "get", reverse("books"), {"page": 2}
+            )
+
+    def test_books_search(self):
+        self.assertWithinBudget(
+            "books_search",
+            "get",
+            reverse("books"),
+            {"title": "Title", "author": "Author 1", "search_type": "0"},
+        )
+
+    def test_books_faceted(self):
+        self.assertWithinBudget(
+            "books_faceted",
+            "get",
+            reverse("books"),
+            {"language": "English", "decade": "1900", "sort": "publication_year"},
+        )
+
+    def test_books_search_form(self):
+        self.assertWithinBudget("books_search_form", "get", reverse("books_search"))
+
+    def test_popular_books(self):
+        self.assertWithinBudget("popular_books", "get", reverse("popular_books"))
+
+    def test_account(self):
+        self.assertWithinBudget("account", "get", reverse("account"))
+
+    def test_borrow(self):
+        self.assertWithinBudget("borrow", "post", reverse("borrow", args=[2]))
+        self.assertTrue(
+            Borrows.objects.filter(
+                user=self.user, book_id=2, returned__isnull=True
+            ).exists()
+        )
+
+    def test_wishlist(self):
+        self.assertWithinBudget("wishlist_add", "post", reverse("wishlist", args=[3]))
+        self.assertWithinBudget(
+            "wishlist_remove", "post", reverse("wishlist", args=[3]), {"remove": "1"}
+        )
+        self.assertFalse(Wishlist.objects.filter(user=self.user, book_id=3).exists())
+
+    def test_wishlist_row(self):
+        response = self.assertWithinBudget(
+            "wishlist_row", "post", reverse("wishlist", args=[3]), fragment=True
+        )
+        self.assertContains(response, '<tr id="book-3">', count=1)
+
+
+@cached_auth
+class SmallCatalogQueryBudgetTest(QueryBudgetTests, TestCase):
+    BOOKS = 10
+
+
+@cached_auth
+class MediumCatalogQueryBudgetTest(QueryBudgetTests, TestCase):
+    BOOKS = 1_000
+
+
+@cached_auth
+class LargeCatalogQueryBudgetTest(QueryBudgetTests, TestCase):
+    BOOKS = 100_000
@@ -0,0 +1,155 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.models import (
+    Book,
+    Borrows,
+    Wishlist,
+    BookNeighbour,
+    RemovedInteraction,
+)
+from catalog.recommendations import compute_neighbours, load_interactions
+from catalog.signals import batched_removed_interactions
+from catalog.tests.utils import create_books
+
+
+class BaseRecommendationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username=f"reader{number}", password="pass")
+            for number in range(3)
+        ]
+        self.books = create_books(5)
+
+        # reader0: 1, 2   reader1: 1, 2, 3   reader2: 3, wishlist 4
+        for user, book_ids in ((0, [1, 2]), (1, [1, 2, 3]), (2, [3])):
+            for book_id in book_ids:
+                Borrows.objects.create(user=self.users[user], book_id=book_id)
+        Wishlist.objects.create(user=self.users[2], book_id=4)
+
+    def neighbours_of(self, book_id):
+        return list(
+            BookNeighbour.objects.filter(book_id=book_id).values_list(
+                "neighbour_id", flat=True
+            )
+        )
+
+
+class ComputeNeighboursTest(BaseRecommendationTest):
+    def test_cosine_neighbours_in_rank_order(self):
+        book, neighbour, rank, score = compute_neighbours(load_interactions())
+        result = {}
+        for book_id, neighbour_id, value in zip(book, neighbour, score):
+            result.setdefault(int(book_id), []).append(
+                (int(neighbour_id), round(value, 3))
+            )
+
+        self.assertEqual(result[1], [(2, 1.0), (3, 0.5)])
+        # 4 shares one reader with 3 but has a single reader overall, so it scores higher
+        self.assertEqual(result[3], [(4, 0.707), (1, 0.5), (2, 0.5)])
+        self.assertNotIn(5, result)  # nobody borrowed it
+
+    def test_top_k_and_selected_books(self):
+        book, neighbour, rank, score = compute_neighbours(
+            load_interactions(), top_k=1, books={3}
+        )
+        self.assertEqual(list(book), [3])
+        self.assertEqual(list(neighbour), [4])
+        self.assertEqual(list(rank), [0])
+
+    def test_chunks_add_up(self):
+        """
+        Test that expanding the pairs one row at a time gives the same neighbours.
+        """
+        pairs = load_interactions()
+        expected = [list(values) for values in compute_neighbours(pairs)]
+        with mock.patch("catalog.recommendations.CHUNK_PAIRS", 1):
+            chunked = [list(values) for values in compute_neighbours(pairs)]
+        self.assertEqual(chunked, expected)
+
+
+class BuildRecommendationsCommandTest(BaseRecommendationTest):
+    def test_first_run_builds_everything(self):
+        call_command("build_recommendations", stdout=StringIO())
+        self.assertEqual(self.neighbours_of(1), [2, 3])
+        self.assertEqual(self.neighbours_of(4), [3])
+
+    def test_incremental_run_only_touches_changed_books(self):
+        call_command("build_recommendations", stdout=StringIO())
+        # mark book 1's rows so we can tell whether they were recomputed
+        BookNeighbour.objects.filter(book_id=1).update(score=-1)
+
+        Borrows.objects.create(user=self.users[2], book_id=5)
+
+        out = StringIO()
+        call_command("build_recommendations", stdout=out)
+        # 5 and reader2's other books, 3 and 4, which now co-occur with it
+        self.assertIn("Refreshed the neighbours of 3 books", out.getvalue())
+
+        self.assertEqual(self.neighbours_of(5), [4, 3])
+        self.assertEqual(self.neighbours_of(4), [5, 3])
+        self.assertIn(5, self.neighbours_of(3))
+        self.assertTrue(BookNeighbour.objects.filter(book_id=1, score=-1).exists())
+
+    def test_incremental_run_sees_removals(self):
+        call_command("build_recommendations", stdout=StringIO())
+        self.assertEqual(self.neighbours_of(3), [4, 1, 2])
+
+        # reader2 was the only one with both 3 and 4
+        Wishlist.objects.filter(user=self.users[2], book_id=4).delete()
+
+        out = StringIO()
+        call_command("build_recommendations", stdout=out)
+        self.assertIn("Refreshed the neighbours of 2 books", out.getvalue())
+
+        self.assertEqual(self.neighbours_of(3), [1, 2])
+        self.assertEqual(self.neighbours_of(4), [])
+        self.assertFalse(RemovedInteraction.objects.exists())
+
+    def test_cascade_delete_records_removals_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            with batched_removed_interactions():
+                Book.objects.filter(book_id__in=[1, 3]).delete()
+
+        inserts = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith('INSERT INTO "catalog_removedinteraction"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(RemovedInteraction.objects.values_list("user_id", "book_id")),
+            sorted(
+                (self.users[user].pk, book_id)
+                for user, book_id in ((0, 1), (1, 1), (1, 3), (2, 3))
+            ),
+        )
+
+    def test_failed_delete_records_nothing(self):
+        with self.assertRaises(ValueError):
+            with batched_removed_interactions():
+                Borrows.objects.filter(book_id=1).delete()
+                raise ValueError
+        self.assertFalse(RemovedInteraction.objects.exists())
+
+    def test_book_list_shows_recommendations(self):
+        call_command("build_recommendations", stdout=StringIO())
+        client = Client()
+        client.login(username="reader0", password="pass")
+
+        response = client.get(reverse("books"))
+
+        books = {book.pk: book for book in response.context["book_list"]}
+        self.assertEqual(
+            [book.title for book in books[1].recommendations], ["Title 2", "Title 3"]
+        )
+        self.assertContains(response, "Readers also borrowed")
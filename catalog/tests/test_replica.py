@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, TransactionTestCase, Client
+from django.urls import reverse
+
+from catalog.models import Book, Availability, Wishlist
+from the_library import replica
+
+REPLICA = "replica"
+
+
+def make_book(book_id, title):
+    book = Book.objects.create(
+        book_id=book_id,
+        isbn=f"{book_id:013d}",
+        authors="Author",
+        publication_year=2000,
+        title=title,
+        language="eng",
+    )
+    Availability.objects.create(book=book, total_copies=1, available_copies=1)
+    return book
+
+
+class ReplicaTest(TransactionTestCase):
+    # data has to be committed for the backup API to copy it, hence TransactionTestCase.
+    # The replica is a second SQLite file added for these tests only
+    databases = "__all__"  # includes the replica, added before setUpClass reads this
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings[REPLICA] = {
+            **connections["default"].settings_dict,
+            "NAME": os.path.join(cls.directory.name, "replica.sqlite3"),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.directory.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username="reader", password="pass")
+        make_book(1, "Copied Book")
+        # forced, the version numbers start over in every test
+        self.assertIn("Copied the primary", self.refresh("--force"))
+
+        self.client = Client()
+        self.client.login(username="reader", password="pass")
+        self.client.get(reverse("index"))  # the first request warms the session cache
+
+    def refresh(self, *args):
+        out = StringIO()
+        call_command("refresh_replica", *args, stdout=out)
+        return out.getvalue()
+
+    def test_refresh_copies_only_when_the_catalog_changed(self):
+        self.assertEqual(Book.objects.using(REPLICA).get().title, "Copied Book")
+
+        self.assertEqual(self.refresh(), "")
+
+        make_book(2, "New Book")
+        self.assertIn("Copied the primary", self.refresh())
+        self.assertEqual(Book.objects.using(REPLICA).count(), 2)
+
+    def test_files_are_in_wal_mode(self):
+        # readers of the replica aren't blocked while a copy is written into it
+        with connections[REPLICA].cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+
+    def test_writers_carry_on_during_a_copy(self):
+        path = os.path.join(self.directory.name, "primary.sqlite3")
+        primary = DatabaseWrapper(
+            {**connections["default"].settings_dict, "NAME": path}, alias="primary"
+        )
+        self.addCleanup(primary.close)
+        with primary.cursor() as cursor:  # connection_created puts the file in WAL mode
+            cursor.execute("CREATE TABLE loans (id INTEGER)")
+
+        # the backup API holds a read transaction like this one for the whole copy
+        primary.connection.execute("BEGIN")
+        primary.connection.execute("SELECT * FROM loans").fetchall()
+        # without WAL the insert fails with "database is locked"
+        with sqlite3.connect(path, timeout=0) as writer:
+            writer.execute("INSERT INTO loans VALUES (1)")
+        writer.close()
+        primary.connection.execute("COMMIT")
+
+    def test_catalog_views_read_the_replica(self):
+        make_book(2, "Not Copied Yet")
+
+        response = self.client.get(reverse("books"))
+
+        self.assertContains(response, "Copied Book")
+        self.assertNotContains(response, "Not Copied Yet")
+        self.assertNotIn("pin_primary", response.cookies)
+
+    def test_a_write_pins_the_browser_to_the_primary(self):
+        make_book(2, "Not Copied Yet")
+
+        response = self.client.post(reverse("wishlist", args=[2]))
+        self.assertTrue(Wishlist.objects.filter(book_id=2).exists())
+        self.assertIn("pin_primary", response.cookies)
+
+        response = self.client.get(reverse("books"))
+        self.assertContains(response, "Not Copied Yet")
+
+    def test_users_and_sessions_are_read_from_the_primary(self):
+        self.client.logout()
+        User.objects.create_user(username="new", password="pass")
+        # the new user and session aren't in the replica, they don't need to be
+        self.assertTrue(self.client.login(username="new", password="pass"))
+        self.client.get(reverse("index"))
+
+        response = self.client.get(reverse("books"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["user"].username, "new")
+
+
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = replica.ReplicaRouter()
+        replica.start_request()
+        self.addCleanup(replica.finish_request)
+
+    def test_reads_go_to_the_primary_without_a_replica(self):
+        replica.use_replica()
+        self.assertIsNone(self.router.db_for_read(Book))
+
+    def test_reads_after_a_write_go_to_the_primary(self):
+        connections.settings[REPLICA] = connections["default"].settings_dict
+        self.addCleanup(connections.settings.pop, REPLICA)
+        replica.use_replica()
+
+        self.assertEqual(self.router.db_for_read(Book), REPLICA)
+        self.assertIsNone(self.router.db_for_read(User))
+
+        self.assertEqual(self.router.db_for_write(Wishlist), "default")
+        self.assertIsNone(self.router.db_for_read(Book))
+        self.assertTrue(replica.finish_request())
+
+    def test_journal_mode_is_left_alone_without_a_replica(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary = DatabaseWrapper(
+                {
+                    **connections["default"].settings_dict,
+                    "NAME": os.path.join(directory, "primary.sqlite3"),
+                },
+                alias="primary",
+            )
+            with primary.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                self.assertEqual(cursor.fetchone()[0], "delete")
+            primary.close()
+
+    def test_refresh_needs_a_replica(self):
+        with self.assertRaises(CommandError):
+            call_command("refresh_replica", stdout=StringIO())
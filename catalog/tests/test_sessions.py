@@ -0,0 +1,99 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+
+class BaseSessionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username="reader", password="readerpass")
+        self.client.login(username="reader", password="readerpass")
+        self.url = reverse("books_search")  # renders a form, no catalog queries
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.db",
+    AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.ModelBackend"],
+)
+class UncachedRequestFloorTest(BaseSessionTest):
+    def test_every_request_loads_session_and_user(self):
+        """
+        Baseline: db sessions and the plain ModelBackend cost two queries per request.
+        """
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+
+# what a shared cache (LIBRARY_CACHE_URL) turns on, a test run has a single process
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    AUTHENTICATION_BACKENDS=["catalog.backends.CachedModelBackend"],
+)
+class CachedDbRequestFloorTest(BaseSessionTest):
+    def test_cache_hit_costs_no_queries(self):
+        self.client.get(self.url)  # loads the user into the cache
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context["user"], self.user)
+
+    def test_user_change_invalidates_cache(self):
+        self.client.get(self.url)
+
+        self.user.is_active = False
+        self.user.save()
+
+        # inactive users must not be served from a stale cache entry
+        response = self.client.get(reverse("books"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.client.get(self.url)
+
+        self.user.set_password("newpassword")
+        self.user.save()
+
+        response = self.client.get(reverse("books"))
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+    AUTHENTICATION_BACKENDS=["catalog.backends.CachedModelBackend"],
+)
+class SignedCookieRequestFloorTest(BaseSessionTest):
+    def test_cache_hit_costs_no_queries(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+
+@override_settings(SESSION_ENGINE="django.contrib.sessions.backends.db")
+class ClearExpiredSessionsCommandTest(TestCase):
+    def test_only_expired_sessions_are_deleted(self):
+        now = timezone.now()
+        for number in range(5):
+            Session.objects.create(
+                session_key=f"expired{number}",
+                session_data="",
+                expire_date=now - timedelta(days=1),
+            )
+        Session.objects.create(
+            session_key="alive", session_data="", expire_date=now + timedelta(days=1)
+        )
+
+        out = StringIO()
+        call_command("clear_expired_sessions", batch_size=2, stdout=out)
+
+        self.assertIn("Deleted 5 expired sessions", out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list("session_key", flat=True)), ["alive"]
+        )
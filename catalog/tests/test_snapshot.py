@@ -0,0 +1,194 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from catalog import snapshot
+from catalog.models import Book, Availability, Borrows, Wishlist
+from catalog.versioning import get_books_version
+
+
+class BaseSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "catalog.snapshot")
+
+        settings_override = override_settings(CATALOG_SNAPSHOT_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(setattr, snapshot, "_current", None)
+
+        self.user = User.objects.create_user(username="reader", password="pass")
+        self.client = Client()
+        self.client.login(username="reader", password="pass")
+
+        for book_id, title, authors, year in (
+            (3, "Python Crash Course", "Eric Matthes", 2019),
+            (1, "The Great Gatsby", "F. Scott Fitzgerald", 1925),
+            (2, "To Kill a Mockingbird", "Harper Lee", 1960),
+            (4, "Fluent Python", "Luciano Ramalho", 2015),
+        ):
+            book = Book.objects.create(
+                book_id=book_id,
+                isbn=f"{book_id:013d}",
+                authors=authors,
+                publication_year=year,
+                title=title,
+                language="English",
+            )
+            Availability.objects.create(book=book, total_copies=3, available_copies=2)
+        Book.objects.create(
+            book_id=5,
+            isbn="5",
+            authors="Nobody",
+            publication_year=2000,
+            title="Ünïcode Ärger",
+            language="Deutsch",
+        )
+
+    def build(self):
+        call_command("build_catalog_snapshot", stdout=StringIO())
+        return snapshot.current_snapshot(get_books_version())
+
+
+class CatalogSnapshotTest(BaseSnapshotTest):
+    def test_rows_match_the_database(self):
+        mapped = self.build()
+        self.assertEqual(len(mapped), 5)
+
+        books = [mapped.book(row) for row in range(len(mapped))]
+        self.assertEqual(books, list(Book.objects.all()))
+
+        gatsby = books[[book.pk for book in books].index(1)]
+        self.assertEqual(gatsby.authors, "F. Scott Fitzgerald")
+        self.assertEqual(books[-1].title, "Ünïcode Ärger")
+
+        with self.assertNumQueries(1):
+            snapshot.load_availability(books)
+            self.assertEqual(gatsby.availability.available_copies, 2)
+            self.assertEqual(gatsby.availability.book, gatsby)
+            with self.assertRaises(Availability.DoesNotExist):
+                books[-1].availability
+
+    def test_search_is_case_insensitive_like_the_database(self):
+        mapped = self.build()
+        for title, author, match_all in (
+            ("python", None, False),
+            ("PYTHON", "matthes", True),
+            ("python", "harper", False),
+            ("Ärger", None, False),
+            ("zzz", None, False),
+        ):
+            with self.subTest(title=title, author=author):
+                result = snapshot.search(mapped, title, author, match_all=match_all)
+                response = self.client.get(
+                    reverse("books"),
+                    {
+                        "title": title or "",
+                        "author": author or "",
+                        "search_type": "1" if match_all else "0",
+                    },
+                )
+                self.assertEqual(
+                    [book.pk for book in result],
+                    [book.pk for book in response.context["book_list"]],
+                )
+
+    def test_sort_orders(self):
+        mapped = self.build()
+        by_id = snapshot.search(mapped, sort="book_id")
+        self.assertEqual([book.pk for book in by_id], [1, 2, 3, 4, 5])
+
+        by_year = snapshot.search(mapped, sort="publication_year")
+        self.assertEqual(
+            [book.publication_year for book in by_year], [1925, 1960, 2000, 2015, 2019]
+        )
+
+        found = snapshot.search(mapped, title="python", sort="publication_year")
+        self.assertEqual([book.pk for book in found], [4, 3])
+
+    def test_stale_snapshot_is_not_served(self):
+        self.build()
+        Book.objects.filter(book_id=1).first().save()  # bumps the books version
+        self.assertIsNone(snapshot.current_snapshot(get_books_version()))
+
+    def test_loans_and_wishlists_keep_it_current(self):
+        mapped = self.build()
+        Wishlist.objects.create(user=self.user, book_id=1)
+        Borrows.objects.create(user=self.user, book_id=2)
+        Availability.objects.filter(book_id=2).first().save()
+        self.assertIs(snapshot.current_snapshot(get_books_version()), mapped)
+
+    def test_rebuild_swaps_the_file(self):
+        first = self.build()
+        Book.objects.filter(book_id=4).delete()
+        second = self.build()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(len(first), 5)  # still readable by requests that hold it
+        self.assertEqual(len(second), 4)
+
+
+class BookListFromSnapshotTest(BaseSnapshotTest):
+    def test_book_list_is_served_from_the_snapshot(self):
+        self.build()
+        # update() doesn't bump the version, so the snapshot stays current and is served
+        Book.objects.filter(book_id=1).update(title="Changed behind its back")
+
+        response = self.client.get(reverse("books"))
+
+        self.assertContains(response, "The Great Gatsby")
+        self.assertNotContains(response, "Changed behind its back")
+
+    def test_availability_comes_from_the_database(self):
+        self.build()
+        Availability.objects.filter(book_id=1).update(available_copies=0)
+
+        response = self.client.get(reverse("books"))
+
+        copies = {
+            book.pk: getattr(book.availability, "available_copies", None)
+            for book in response.context["book_list"]
+            if book.pk != 5
+        }
+        self.assertEqual(copies, {1: 0, 2: 2, 3: 2, 4: 2})
+
+    def test_user_state_comes_from_the_database(self):
+        Wishlist.objects.create(user=self.user, book_id=2)
+        self.build()
+
+        response = self.client.get(reverse("books"))
+
+        for book in response.context["book_list"]:
+            self.assertEqual(book.is_wishlisted, book.pk == 2)
+
+    def test_falls_back_to_the_database(self):
+        self.build()
+        Book.objects.create(
+            book_id=6,
+            isbn="6",
+            authors="New Author",
+            publication_year=2024,
+            title="Brand New",
+            language="English",
+        )
+
+        response = self.client.get(reverse("books"))
+
+        self.assertContains(response, "Brand New")
+
+    def test_facet_filters_go_to_the_database(self):
+        self.build()
+        Book.objects.filter(book_id=1).update(title="Changed behind its back")
+
+        response = self.client.get(reverse("books"), {"language": "English"})
+
+        self.assertContains(response, "Changed behind its back")
+        self.assertNotContains(response, "Ünïcode Ärger")
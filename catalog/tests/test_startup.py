@@ -0,0 +1,38 @@
+from django.test import SimpleTestCase
+
+from benchmarks.startup import measure_worker_startup
+
+# Modules that must never be imported by a worker just to serve requests. Code that needs them
+# has to import them lazily, like `filldb` does with catalog.ingest.
+HEAVY_MODULES = (
+    "pandas",
+    "numpy",
+    "scipy",
+    "matplotlib",
+    "catalog.ingest",
+    "catalog.recommendations",
+)
+
+# a worker is ~45MB with Django alone, importing pandas took it to ~90MB
+MAX_RSS_MB = 70
+
+
+class WorkerStartupBudgetTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.startup = measure_worker_startup()
+
+    def test_no_heavy_module_on_the_request_path(self):
+        """
+        Test that booting a worker and importing the URLconf doesn't import heavy modules.
+        """
+        loaded = {name.split(".")[0] for name in self.startup["modules"]}
+        loaded.update(self.startup["modules"])
+
+        for module in HEAVY_MODULES:
+            with self.subTest(module=module):
+                self.assertNotIn(module, loaded)
+
+    def test_rss_budget(self):
+        self.assertLess(self.startup["max_rss_mb"], MAX_RSS_MB)
@@ -0,0 +1,196 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from catalog.ingest import current_stock, reconcile_stock
+from catalog.models import Book, Availability, Borrows
+from catalog.versioning import get_catalog_version
+
+STOCK_TAKE = """book_id,isbn,total_copies
+1,,5
+,0000000000002,3
+3,,2
+4,,1
+99,,1
+,,4
+1,0000000000003,2
+5,,x
+6,,2
+6,,3
+"""
+
+
+class BaseStockTakeTest(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username="reader", password="pass")
+        # (total, available) per book, book 2 has no Availability yet
+        for book_id, copies in (
+            (1, (2, 1)),
+            (2, None),
+            (3, (2, 2)),
+            (4, (3, 0)),
+            (5, (1, 1)),
+            (6, (1, 1)),
+            (7, (4, 4)),
+        ):
+            book = Book.objects.create(
+                book_id=book_id,
+                isbn=f"{book_id:013d}",
+                authors="Author",
+                publication_year=2000,
+                title=f"Title {book_id}",
+                language="eng",
+            )
+            if copies:
+                Availability.objects.create(
+                    book=book, total_copies=copies[0], available_copies=copies[1]
+                )
+        Borrows.objects.create(user=self.reader, book_id=1)
+
+    def copies(self, book_id):
+        availability = Availability.objects.get(book_id=book_id)
+        return availability.total_copies, availability.available_copies
+
+
+class ReconcileStockTest(BaseStockTakeTest):
+    def test_only_differences_are_written(self):
+        version, _ = get_catalog_version()
+
+        report = reconcile_stock(StringIO(STOCK_TAKE))
+
+        self.assertEqual(
+            (report["rows"], report["new"], report["changed"], report["unchanged"]),
+            (10, 1, 1, 1),
+        )
+        self.assertEqual(report["missing"], [7])
+
+        self.assertEqual(self.copies(1), (5, 4))  # one copy is still on loan
+        self.assertEqual(self.copies(2), (3, 3))
+        self.assertEqual(self.copies(3), (2, 2))
+        self.assertEqual(self.copies(4), (3, 0))  # invalid rows change nothing
+        self.assertEqual(self.copies(7), (4, 4))
+        self.assertEqual(Borrows.objects.count(), 1)
+        self.assertEqual(get_catalog_version()[0], version + 1)
+
+    def test_invalid_rows_are_reported(self):
+        report = reconcile_stock(StringIO(STOCK_TAKE))
+
+        self.assertEqual(
+            [(row["line"], row["reason"]) for row in report["invalid"]],
+            [
+                (5, "fewer copies than are on loan"),
+                (6, "unknown book"),
+                (7, "no book_id or isbn"),
+                (8, "book_id and isbn are different books"),
+                (9, "total_copies is not a whole number of 0 or more"),
+                (10, "the book is listed more than once"),
+                (11, "the book is listed more than once"),
+            ],
+        )
+
+    def test_unknown_isbn_is_reported(self):
+        report = reconcile_stock(
+            StringIO("book_id,isbn,total_copies\n3,9999999999999,2\n,9999999999999,2\n")
+        )
+
+        self.assertEqual(
+            [(row["line"], row["reason"]) for row in report["invalid"]],
+            [(2, "unknown isbn"), (3, "unknown isbn")],
+        )
+
+    def test_changes_since_the_read_are_kept(self):
+        read = current_stock()
+        # after the read: a borrow of book 3 and 6, and book 5 gets a copy elsewhere
+        Availability.objects.filter(book_id__in=[3, 6]).update(
+            available_copies=F("available_copies") - 1
+        )
+        Availability.objects.filter(book_id=5).update(
+            total_copies=2, available_copies=2
+        )
+
+        with mock.patch("catalog.ingest.current_stock", return_value=read):
+            report = reconcile_stock(StringIO("book_id,total_copies\n3,4\n5,3\n6,0\n"))
+
+        self.assertEqual(self.copies(3), (4, 3))  # the new loan stays on loan
+        self.assertEqual(self.copies(5), (2, 2))
+        self.assertEqual(self.copies(6), (1, 0))  # 0 copies would be less than on loan
+        self.assertEqual(report["changed"], 1)
+        self.assertEqual(
+            [(row["line"], row["reason"]) for row in report["invalid"]],
+            [
+                (3, "changed while the stock-take was applied"),
+                (4, "changed while the stock-take was applied"),
+            ],
+        )
+
+    def test_dry_run_writes_nothing(self):
+        report = reconcile_stock(StringIO(STOCK_TAKE), dry_run=True)
+
+        self.assertEqual(report["changed"], 1)
+        self.assertEqual(self.copies(1), (2, 1))
+        self.assertFalse(Availability.objects.filter(book_id=2).exists())
+
+    def test_file_without_the_columns_is_rejected(self):
+        with self.assertRaises(ValueError):
+            reconcile_stock(StringIO("title,copies\nA,1\n"))
+
+
+class ReconcileStockCommandTest(BaseStockTakeTest):
+    def test_command_writes_the_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stock.csv")
+            report_path = os.path.join(directory, "report.csv")
+            with open(path, "w") as stock_file:
+                stock_file.write(STOCK_TAKE)
+
+            out = StringIO()
+            call_command("reconcile_stock", path, "--report", report_path, stdout=out)
+
+            with open(report_path) as report_file:
+                invalid = list(csv.DictReader(report_file))
+
+        self.assertIn("1 new, 1 changed, 1 unchanged, 7 invalid", out.getvalue())
+        self.assertEqual(len(invalid), 7)
+        self.assertEqual(invalid[0]["reason"], "fewer copies than are on loan")
+        self.assertEqual(self.copies(1), (5, 4))
+
+
+class StockTakeViewTest(BaseStockTakeTest):
+    def upload(self, client, **data):
+        return client.post(
+            reverse("stock_take"),
+            {"file": SimpleUploadedFile("stock.csv", STOCK_TAKE.encode()), **data},
+        )
+
+    def test_staff_can_reconcile(self):
+        User.objects.create_user(username="staff", password="pass", is_staff=True)
+        client = Client()
+        client.login(username="staff", password="pass")
+
+        response = self.upload(client, dry_run="on")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "dry run, nothing was written")
+        self.assertContains(response, "fewer copies than are on loan")
+        self.assertEqual(self.copies(1), (2, 1))
+
+        self.upload(client)
+        self.assertEqual(self.copies(1), (5, 4))
+
+    def test_readers_cannot(self):
+        client = Client()
+        client.login(username="reader", password="pass")
+
+        response = self.upload(client)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.copies(1), (2, 1))
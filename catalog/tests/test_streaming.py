@@ -0,0 +1,160 @@
+import gzip
+import re
+import unittest
+import zlib
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import TestCase, Client, RequestFactory
+from django.urls import reverse
+
+from catalog.tests.utils import create_books
+from catalog.views import BookListView
+from the_library.middleware import compression
+
+CSRF_TOKEN = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]+"')
+
+
+class BaseStreamingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username="reader", password="pass")
+        self.client = Client()
+        self.client.login(username="reader", password="pass")
+
+        create_books(130)
+
+
+class StreamedBookListTest(BaseStreamingTest):
+    def test_large_pages_are_streamed_in_chunks(self):
+        response = self.client.get(reverse("books"), {"per_page": 120})
+
+        self.assertIsInstance(response, StreamingHttpResponse)
+        chunks = list(response.streaming_content)
+        # the page up to the rows, 50 + 50 + 20 rows, the rest of the page
+        self.assertEqual(len(chunks), 5)
+        self.assertIn(b"<tbody>", chunks[0])
+        self.assertNotIn(b"Title 001", chunks[0])
+        self.assertIn(b"Title 001", chunks[1])
+        self.assertIn(b"Title 120", chunks[3])
+        self.assertNotIn(b"Title 121", b"".join(chunks))
+        self.assertIn(b"</html>", chunks[4])
+
+    def test_streamed_page_matches_the_rendered_one(self):
+        streamed = self.client.get(reverse("books"), {"per_page": 100})
+        streamed = b"".join(streamed.streaming_content)
+
+        BookListView.stream_rows = False
+        self.addCleanup(setattr, BookListView, "stream_rows", True)
+        rendered = self.client.get(reverse("books"), {"per_page": 100}).content
+
+        # the masked csrf token differs on every render
+        self.assertEqual(
+            CSRF_TOKEN.sub(b"", streamed).split(), CSRF_TOKEN.sub(b"", rendered).split()
+        )
+
+    def test_default_page_is_rendered_in_one_go(self):
+        response = self.client.get(reverse("books"))
+
+        self.assertNotIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(len(response.context["book_list"]), 20)
+
+    def test_page_size_is_bounded(self):
+        for per_page, size in (("0", 1), ("x", 20), ("100000", 2000)):
+            with self.subTest(per_page=per_page):
+                response = self.client.get(reverse("books"), {"per_page": per_page})
+                self.assertEqual(response.context["paginator"].per_page, size)
+
+
+class CompressionTest(BaseStreamingTest):
+    def test_streamed_page_is_gzipped_chunk_by_chunk(self):
+        response = self.client.get(
+            reverse("books"), {"per_page": 120}, headers={"accept-encoding": "gzip"}
+        )
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertFalse(response.has_header("Content-Length"))
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        self.assertIn(b"Title 120", gzip.decompress(b"".join(chunks)))
+
+        # every chunk is flushed, the top of the page can be shown before the rows arrive
+        decompressor = zlib.decompressobj(wbits=31)
+        head = decompressor.decompress(chunks[0])
+        self.assertIn(b"<tbody>", head)
+        self.assertNotIn(b"Title 001", head)
+
+    def test_regular_page_is_gzipped(self):
+        response = self.client.get(
+            reverse("books"), headers={"accept-encoding": "gzip"}
+        )
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn(b"Title 001", gzip.decompress(response.content))
+
+    def test_not_compressed_without_accept_encoding(self):
+        response = self.client.get(reverse("books"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_compressed_content_is_left_alone(self):
+        request = RequestFactory().get("/", headers={"accept-encoding": "gzip, br"})
+        middleware = compression.CompressionMiddleware(lambda request: None)
+
+        image = HttpResponse(b"\x89PNG" + b"\0" * 1000, content_type="image/png")
+        self.assertFalse(
+            middleware.process_response(request, image).has_header("Content-Encoding")
+        )
+
+        encoded = HttpResponse(b"x" * 1000)
+        encoded["Content-Encoding"] = "identity"
+        self.assertEqual(
+            middleware.process_response(request, encoded).content, b"x" * 1000
+        )
+
+    def test_accept_encoding_parsing(self):
+        self.assertEqual(
+            compression.accepted_encodings("gzip, br;q=0.8, deflate;q=0, *;q=0"),
+            {"gzip", "br"},
+        )
+
+    def test_compressed_length_varies(self):
+        # against BREACH, the same page never compresses to the same length every time
+        body = b"csrfmiddlewaretoken=secret&q=Title " * 50
+        middleware = compression.CompressionMiddleware(lambda request: None)
+        encodings = ["gzip"] + (["br"] if compression.brotli else [])
+        for encoding in encodings:
+            request = RequestFactory().get("/", headers={"accept-encoding": encoding})
+            responses = [
+                middleware.process_response(request, HttpResponse(body))
+                for _ in range(20)
+            ]
+            self.assertEqual(responses[0]["Content-Encoding"], encoding)
+            self.assertGreater(
+                len({len(response.content) for response in responses}), 1
+            )
+
+    @unittest.skipUnless(compression.brotli, "brotli is not installed")
+    def test_brotli_padding_is_skipped_by_decoders(self):
+        body = b"Title 001 " * 100
+        request = RequestFactory().get("/", headers={"accept-encoding": "br"})
+        middleware = compression.CompressionMiddleware(lambda request: None)
+
+        response = middleware.process_response(request, HttpResponse(body))
+        self.assertEqual(compression.brotli.decompress(response.content), body)
+
+        stream = compression.BrotliStream(256)
+        compressed = b"".join(compression.compress_stream(stream, [body, body]))
+        self.assertEqual(compression.brotli.decompress(compressed), body * 2)
+
+    @unittest.skipUnless(compression.brotli, "brotli is not installed")
+    def test_brotli_is_preferred_when_installed(self):
+        response = self.client.get(
+            reverse("books"), {"per_page": 120}, headers={"accept-encoding": "gzip, br"}
+        )
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        body = compression.brotli.decompress(b"".join(response.streaming_content))
+        self.assertIn(b"Title 120", body)
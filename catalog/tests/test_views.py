@@ -1,13 +1,15 @@
 from datetime import timedelta
 import datetime as dt
+from unittest import mock
 
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Sum, F
+from django.shortcuts import get_object_or_404
 
-from catalog.models import Book, Availability, Wishlist, Borrows
+from catalog.models import Book, Availability, Wishlist, Borrows, CatalogVersion
 from catalog.views import index, BookListView, books_search, filldb, wishlist, borrow
 
 
@@ -258,3 +260,78 @@ class BookSearchTest(BaseViewTest):
     def test_book_search_post_not_allowed(self):
         response = self.client.post(reverse("books_search"))
         self.assertEqual(response.status_code, 405)  # Method Not Allowed
+
+
+class BorrowViewTest(BaseViewTest):
+    def test_borrow_creates_loan_and_takes_a_copy(self):
+        response = self.client.post(reverse("borrow", args=[self.book1.book_id]))
+        self.assertRedirects(response, reverse("books"))
+
+        self.assertTrue(
+            Borrows.objects.filter(
+                user=self.user1, book=self.book1, returned__isnull=True
+            ).exists()
+        )
+        self.assertEqual(Availability.objects.get(book=self.book1).available_copies, 2)
+
+    def test_borrow_twice_keeps_one_active_loan(self):
+        self.client.post(reverse("borrow", args=[self.book1.book_id]))
+        self.client.post(reverse("borrow", args=[self.book1.book_id]))
+
+        self.assertEqual(Borrows.objects.filter(user=self.user1).count(), 1)
+        self.assertEqual(Availability.objects.get(book=self.book1).available_copies, 2)
+
+    def test_borrow_that_loses_the_last_copy_changes_nothing(self):
+        """
+        Test that a borrow whose copy was taken after the view read the availability rolls
+        back the loan and leaves the catalog version alone.
+        """
+        version = CatalogVersion.objects.get(pk=1).version
+
+        def stale_book(*args, **kwargs):
+            # the view sees the last copy, another borrow took it in the meantime
+            book = get_object_or_404(*args, **kwargs)
+            book.availability.available_copies = 1
+            return book
+
+        with mock.patch("catalog.views.get_object_or_404", side_effect=stale_book):
+            self.client.post(reverse("borrow", args=[self.book2.book_id]))
+
+        self.assertFalse(Borrows.objects.filter(book=self.book2).exists())
+        self.assertEqual(Availability.objects.get(book=self.book2).available_copies, 0)
+        self.assertEqual(CatalogVersion.objects.get(pk=1).version, version)
+
+    def test_borrow_again_after_return(self):
+        Borrows.objects.create(
+            user=self.user1,
+            book=self.book1,
+            created=timezone.now() - timedelta(days=5),
+            returned=timezone.now() - timedelta(days=3),
+        )
+        self.client.post(reverse("borrow", args=[self.book1.book_id]))
+
+        self.assertEqual(Borrows.objects.filter(user=self.user1).count(), 2)
+
+    def test_returned_loans_are_not_with_customers(self):
+        Borrows.objects.create(
+            user=self.user1, book=self.book1, returned=timezone.now()
+        )
+        Borrows.objects.create(user=self.user1, book=self.book1)
+
+        response = self.client.get(reverse("index"))
+        self.assertEqual(response.context["total_with_customer"], 1)
+
+
+class FillDbTest(BaseViewTest):
+    def test_filldb_replaces_catalog_from_csv(self):
+        response = self.client.get(reverse("filldb"))
+        self.assertRedirects(response, reverse("index"))
+
+        self.assertEqual(Book.objects.count(), 99)
+        self.assertFalse(Book.objects.filter(book_id=self.book1.book_id).exists())
+        self.assertEqual(Availability.objects.count(), 99)
+        self.assertFalse(
+            Availability.objects.filter(
+                available_copies__gt=F("total_copies")
+            ).exists()
+        )
@@ -0,0 +1,44 @@
+from catalog.models import Book, Availability
+
+LANGUAGES = ("English", "Deutsch", "Français")
+
+
+def create_books(
+    count, first_id=1, total_copies=1, available_copies=None, varied=False
+):
+    """
+    Bulk creates `count` books numbered from `first_id`, each with an Availability of
+    `total_copies`, `available_copies` of them on the shelf (all by default). Titles are
+    "Title <book_id>" padded so they sort like the ids. Books are all by "Author <book_id>",
+    in "eng" and from 2000, unless `varied` spreads them over 100 authors, 120 years and a
+    few languages like a real catalog, for the facets and searches to have something to do.
+    """
+    width = len(str(first_id + count - 1))
+    books = Book.objects.bulk_create(
+        (
+            Book(
+                book_id=book_id,
+                isbn=f"{book_id:013d}",
+                authors=f"Author {book_id % 100 if varied else book_id}",
+                publication_year=1900 + book_id % 120 if varied else 2000,
+                title=f"Title {book_id:0{width}d}",
+                language=LANGUAGES[book_id % 3] if varied else "eng",
+            )
+            for book_id in range(first_id, first_id + count)
+        ),
+        batch_size=5000,
+    )
+    if available_copies is None:
+        available_copies = total_copies
+    Availability.objects.bulk_create(
+        (
+            Availability(
+                book=book,
+                total_copies=total_copies,
+                available_copies=available_copies,
+            )
+            for book in books
+        ),
+        batch_size=5000,
+    )
+    return books
@@ -5,8 +5,13 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('books/', views.BookListView.as_view(), name='books'),
     path('books_search/', views.books_search, name='books_search'),    
+    path('popular/', views.popular_books, name='popular_books'),
+    path('account/', views.account, name='account'),
     path('wishlists/<int:book_id>', views.wishlist, name='wishlist'),
     path('borrows/<int:book_id>', views.borrow, name='borrow'),
     path('filldb/', views.filldb, name='filldb'),
+    path('stock-take/', views.stock_take, name='stock_take'),
+    path('profiles/', views.profiles, name='profiles'),
+    path('profiles/<str:profile_id>', views.profile_download, name='profile_download'),
     path('logout/', views.logout, name = 'logout')
     ]
\ No newline at end of file
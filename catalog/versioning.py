@@ -0,0 +1,118 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CatalogVersion
+
+VERSION_ROW_ID = 1
+# only bumped by changes to Book, what the catalog snapshot holds. Availability, loans and
+# wishlists change with every borrow and are read from the database
+BOOKS_VERSION_ROW_ID = 2
+
+_state = threading.local()
+
+
+def bump_catalog_version(books=False):
+    """
+    Marks the catalog as changed, and with `books` the Book rows too.
+    Called by the model signals in catalog.signals, code that writes with
+    `update()`/`bulk_create()` (no signals) has to call it itself.
+    """
+    if getattr(_state, "batch_depth", 0):
+        # batched_catalog_changes bumps once when the block ends
+        _state.batch_books = _state.batch_books or books
+        return
+
+    rows = [VERSION_ROW_ID, BOOKS_VERSION_ROW_ID] if books else [VERSION_ROW_ID]
+    now = timezone.now()
+    updated = CatalogVersion.objects.filter(pk__in=rows).update(
+        version=F("version") + 1, changed=now
+    )
+    if updated < len(rows):  # created by migrations, but tests may flush them
+        for row in rows:
+            CatalogVersion.objects.get_or_create(
+                pk=row, defaults={"version": 1, "changed": now}
+            )
+
+
+@contextmanager
+def batched_catalog_changes(books=False):
+    """
+    Bumps the version once for everything written inside the block instead of once per row,
+    e.g. a cascade delete of the whole catalog. `books` if the block writes Book rows without
+    signals. Nothing is bumped if the block raises: its transaction may be broken, and a bump
+    there would hide the error (PostgreSQL's "current transaction is aborted").
+    """
+    depth = getattr(_state, "batch_depth", 0)
+    outer_books = getattr(_state, "batch_books", False)
+    _state.batch_depth = depth + 1
+    _state.batch_books = outer_books or books
+    try:
+        yield
+    except BaseException:
+        _state.batch_depth = depth
+        if not depth:
+            _state.batch_books = False
+        raise
+    else:
+        _state.batch_depth = depth
+        if not depth:
+            books, _state.batch_books = _state.batch_books, False
+            bump_catalog_version(books=books)
+
+
+def _versions(request):
+    # both rows in one query, kept on the request so the ETag and Last-Modified functions and
+    # the view share it
+    cached = getattr(request, "_catalog_versions", None)
+    if cached is not None:
+        return cached
+
+    versions = {
+        row: (version, changed)
+        for row, version, changed in CatalogVersion.objects.filter(
+            pk__in=[VERSION_ROW_ID, BOOKS_VERSION_ROW_ID]
+        ).values_list("pk", "version", "changed")
+    }
+    if request is not None:
+        request._catalog_versions = versions
+    return versions
+
+
+def get_catalog_version(request=None):
+    """
+    Returns (version, changed) of the whole catalog, loans and wishlists included.
+    """
+    return _versions(request).get(VERSION_ROW_ID, (0, None))
+
+
+def get_books_version(request=None):
+    """
+    Returns the version of the Book rows, what the catalog snapshot holds.
+    """
+    return _versions(request).get(BOOKS_VERSION_ROW_ID, (0, None))[0]
+
+
+def catalog_etag(request, *args, **kwargs):
+    # The pages show per-user state (wishlist, borrows, user name, the staff-only links) and
+    # embed a CSRF token, so the tag is per user and role and changes when the CSRF cookie is
+    # rotated on login
+    version, _ = get_catalog_version(request)
+    key = "|".join(
+        (
+            str(version),
+            str(request.user.pk),
+            str(request.user.is_staff),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        )
+    )
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    _, changed = get_catalog_version(request)
+    return changed
@@ -1,22 +1,58 @@
-import random
-
-import pandas as pd
 from django.shortcuts import render
 from django.views import generic
-from django.db.models import Sum, Q, Count, ExpressionWrapper, DurationField, Avg, F
-from django.shortcuts import redirect
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Q, ExpressionWrapper, DurationField, Avg, F
+from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse
-from django.http import HttpResponse
-from django.views.decorators.http import require_http_methods
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_http_methods, condition
+from django.views.decorators.cache import cache_control
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
 import django.contrib.auth
 from django.contrib.auth.models import User
 
 
-from .models import Book, Availability, Wishlist, Borrows
-from .forms import BookSearch
-
-
+from . import facets, leaderboard, streaming
+from .models import (
+    Book,
+    Availability,
+    Wishlist,
+    Borrows,
+    BookNeighbour,
+    PopularityCounter,
+)
+from .forms import BookSearch, StockTakeForm
+from .paginators import keyset_page
+from .snapshot import (
+    SORT_ORDERS,
+    current_snapshot,
+    load_availability,
+    search as snapshot_search,
+)
+from .versioning import (
+    batched_catalog_changes,
+    catalog_etag,
+    catalog_last_modified,
+    get_books_version,
+)
+from the_library import profiling
+
+
+RECOMMENDATIONS_SHOWN = 3
+LEADERBOARD_SIZE = 10
+REPORT_ROWS_SHOWN = 100
+ACCOUNT_ROWS = 20
+
+
+# index and books answer `304 Not Modified` while the catalog version is unchanged, without running
+# their queries or rendering. no_cache makes browsers revalidate every time instead of guessing
 @require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
 def index(request):
     num_books = Book.objects.all().count()
     all_books = Availability.objects.aggregate(Sum("total_copies", default=0))[
@@ -26,7 +62,8 @@ def index(request):
         Sum("available_copies", default=0)
     )["available_copies__sum"]
 
-    total_with_customer = Borrows.objects.aggregate(Count("book"))["book__count"]
+    # active loans only, counted from the partial unique index on (user, book) WHERE returned IS NULL
+    total_with_customer = Borrows.objects.filter(returned__isnull=True).count()
 
     completed_borrowings = Borrows.objects.filter(returned__isnull=False)
     borrowings_with_duration = completed_borrowings.annotate(
@@ -58,16 +95,54 @@ def index(request):
     return render(request, "index.html", context=context)
 
 
+@method_decorator(
+    [
+        cache_control(private=True, no_cache=True),
+        condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified),
+    ],
+    name="dispatch",
+)
 class BookListView(generic.ListView):
     paginate_by = 20
+    max_paginate_by = 2000
     template_name = "book_list.html"
+    context_object_name = "book_list"  # snapshot results aren't querysets
+    # pages with more than one chunk of rows are streamed, header and table first and then
+    # the rows chunk by chunk. a default page is small enough to send in one go
+    stream_rows = True
+    rows_per_chunk = 50
+    from_snapshot = False
+
+    def get_paginate_by(self, queryset):
+        try:
+            per_page = int(self.request.GET.get("per_page", self.paginate_by))
+        except ValueError:
+            return self.paginate_by
+        return min(max(per_page, 1), self.max_paginate_by)
+
+    def render_to_response(self, context, **response_kwargs):
+        if not self.stream_rows or len(context["book_list"]) <= self.rows_per_chunk:
+            return super().render_to_response(context, **response_kwargs)
+        return streaming.stream_rows(
+            self.request,
+            self.get_template_names(),
+            context,
+            "book_list_rows.html",
+            rows_key="book_list",
+            chunk_size=self.rows_per_chunk,
+        )
 
     def get_queryset(self):
         # generic query to return all books or by search term
-        user = django.contrib.auth.get_user(self.request)
         title = self.request.GET.get("title")
         author = self.request.GET.get("author")
         search_type = self.request.GET.get("search_type")
+        sort = self.request.GET.get("sort")
+        if sort not in SORT_ORDERS:
+            sort = "title"
+        self.language = self.request.GET.get("language") or None
+        self.decade = facets.parse_decade(self.request.GET.get("decade"))
+        self.search_key = (title, author, search_type == "1")
 
         filter_type = Q.AND if search_type == "1" else Q.OR
 
@@ -79,13 +154,122 @@ class BookListView(generic.ListView):
         if author:
             filters.add(Q(authors__contains=author), filter_type)
 
-        qset = Book.objects.all().filter(filters)
-        for book in qset:
-            book.is_wishlisted = book.wishlisted_by.filter(user=user).exists()
-            book.is_borrowed = book.borrowed_by.filter(user=user).exists()
+        # the search without facets, its facet counts are cached (see get_context_data)
+        self.search = Book.objects.all().filter(filters)
+
+        # served from the shared mmap snapshot when it is built from the current books version,
+        # facet selections go to the database, which has indexes for them
+        snapshot = current_snapshot(get_books_version(self.request))
+        self.from_snapshot = snapshot is not None and not (
+            self.language or self.decade is not None
+        )
+        if self.from_snapshot:
+            return snapshot_search(
+                snapshot, title, author, match_all=search_type == "1", sort=sort
+            )
+
+        qset = facets.filter_books(
+            self.search, self.language, self.decade
+        ).select_related("availability")
+        if sort != "title":
+            qset = qset.order_by(sort, "title", "book_id")
 
         return qset
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        # only the books of the current page are looked at
+        if self.from_snapshot:
+            load_availability(context["book_list"])
+        mark_books({book.pk: book for book in context["book_list"]}, self.request.user)
+
+        context["facets"] = facets.facet_counts(
+            self.search,
+            get_books_version(self.request),
+            self.search_key,
+            self.language,
+            self.decade,
+        )
+        context["selected_language"] = self.language
+        context["selected_decade"] = self.decade
+        # the borrow and wishlist forms come back to this page, with its page and search parameters
+        context["next_url"] = self.request.get_full_path()
+
+        return context
+
+
+def mark_books(books, user):
+    """
+    Sets is_wishlisted, is_borrowed and recommendations on `books`, a dict of books by primary
+    key, with three queries however many books there are.
+    """
+    wishlisted = set(
+        Wishlist.objects.filter(user_id=user.pk, book__in=books).values_list(
+            "book_id", flat=True
+        )
+    )
+    borrowed = set(
+        Borrows.objects.filter(
+            user_id=user.pk, book__in=books, returned__isnull=True
+        ).values_list("book_id", flat=True)
+    )
+    for book in books.values():
+        book.is_wishlisted = book.pk in wishlisted
+        book.is_borrowed = book.pk in borrowed
+        book.recommendations = []
+
+    # "readers also borrowed", precomputed by build_recommendations
+    neighbours = (
+        BookNeighbour.objects.filter(book__in=books, rank__lt=RECOMMENDATIONS_SHOWN)
+        .select_related("neighbour")
+        .only("book_id", "rank", "neighbour__book_id", "neighbour__title")
+    )
+    for neighbour in neighbours:
+        books[neighbour.book_id].recommendations.append(neighbour.neighbour)
+
+
+@require_http_methods(["GET"])
+def popular_books(request):
+    # every list is read from the precomputed counters, see catalog.leaderboard
+    context = {
+        "leaderboards": [
+            (title, leaderboard.top_books(kind, window, limit=LEADERBOARD_SIZE))
+            for title, kind, window in (
+                ("Most borrowed this week", PopularityCounter.BORROWED, "week"),
+                ("Most borrowed this month", PopularityCounter.BORROWED, "month"),
+                ("Most borrowed of all time", PopularityCounter.BORROWED, "all"),
+                ("Most wishlisted", PopularityCounter.WISHLISTED, "all"),
+            )
+        ]
+    }
+    return render(request, "popular_books.html", context=context)
+
+
+@require_http_methods(["GET"])
+def account(request):
+    # active loans, loan history and wishlist, each a keyset page over its (user, created, id)
+    # index with the book and its availability joined in: three queries however long the
+    # history is. ?loans=, ?history= and ?wishlist= carry the cursor of each list
+    loans = Borrows.objects.filter(user=request.user).select_related(
+        "book__availability"
+    )
+    wishlist = Wishlist.objects.filter(user=request.user).select_related(
+        "book__availability"
+    )
+
+    context = {"now": timezone.now()}
+    for name, queryset in (
+        ("loans", loans.filter(returned__isnull=True)),
+        ("history", loans.filter(returned__isnull=False)),
+        ("wishlist", wishlist),
+    ):
+        context[name], context[f"{name}_next"] = keyset_page(
+            queryset, request.GET.get(name), ACCOUNT_ROWS
+        )
+
+    return render(request, "account.html", context=context)
+
 
 @require_http_methods(["GET"])
 def books_search(request):
@@ -106,70 +290,148 @@ def books_search(request):
 
 
 def filldb(request):
-    Book.objects.all().delete()
+    # pandas is only needed here, importing it lazily keeps it out of every web worker
+    from .ingest import reset_catalog
 
-    df = pd.read_csv("books_data.csv")
+    reset_catalog("books_data.csv")
+
+    return redirect(index)
+
+
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def stock_take(request):
+    form = StockTakeForm(request.POST or None, request.FILES or None)
+    report = None
 
-    name_map = {
-        "Id": "book_id",
-        "ISBN": "isbn",
-        "Authors": "authors",
-        "Publication Year": "publication_year",
-        "Title": "title",
-        "Language": "language",
+    if form.is_valid():
+        # pandas is only needed here, like in filldb
+        from .ingest import reconcile_stock
+
+        try:
+            report = reconcile_stock(
+                form.cleaned_data["file"], dry_run=form.cleaned_data["dry_run"]
+            )
+        except ValueError as error:
+            form.add_error("file", str(error))
+
+    context = {"form": form, "report": report, "rows_shown": REPORT_ROWS_SHOWN}
+    return render(request, "stock_take.html", context=context)
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def profiles(request):
+    # the profiles saved by the_library.middleware.profiling, and a token to ask for more
+    context = {
+        "profiles": profiling.list_profiles(),
+        "token": profiling.make_token(),
+        "token_hours": settings.PROFILING_TOKEN_MAX_AGE // 3600,
     }
+    return render(request, "profiles.html", context=context)
 
-    for _, row in df.iterrows():
-        new_record = {name_map[column]: row[column] for column in row.keys()}
-        book = Book.objects.create(**new_record)
-        total_copies = random.randint(1, 5)
-        available_copies = random.randint(-total_copies, total_copies)
 
-        # Give more chance to cases where book is not available to borrow
-        available_copies = 0 if available_copies < 0 else available_copies
+@staff_member_required
+@require_http_methods(["GET"])
+def profile_download(request, profile_id):
+    path = profiling.folded_path(profile_id)
+    if path is None or not path.exists():
+        raise Http404("No such profile.")
+    return FileResponse(
+        open(path, "rb"),
+        as_attachment=True,
+        filename=path.name,
+        content_type="text/plain; charset=utf-8",
+    )
 
-        # Let's add some random availability
-        Availability.objects.create(
-            book=book, total_copies=total_copies, available_copies=available_copies
+
+def book_action_response(request, book_id):
+    # the buttons in book_list.html fetch() just the updated row (X-Fragment: row) and swap it in,
+    # API clients can ask for JSON. A plain form post goes back to the page it came from
+    fragment = request.headers.get("X-Fragment") == "row"
+    if fragment or "application/json" in request.headers.get("Accept", ""):
+        book = get_object_or_404(
+            Book.objects.select_related("availability"), book_id=book_id
+        )
+        mark_books({book.pk: book}, request.user)
+
+        if fragment:
+            context = {"book_list": [book], "next_url": request.POST.get("next", "")}
+            return render(request, "book_list_rows.html", context=context)
+
+        availability = getattr(book, "availability", None)
+        return JsonResponse(
+            {
+                "book_id": book.book_id,
+                "available_copies": availability and availability.available_copies,
+                "total_copies": availability and availability.total_copies,
+                "is_borrowed": book.is_borrowed,
+                "is_wishlisted": book.is_wishlisted,
+            }
         )
 
-    return redirect(index)
+    next_url = request.POST.get("next")
+    if not url_has_allowed_host_and_scheme(
+        next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        next_url = reverse("books")
+    return redirect(next_url)
 
 
-@require_http_methods(["GET", "POST"])
+@require_http_methods(["POST", "DELETE"])
 def wishlist(request, book_id):
-    # here if record exists, we just remove it, like toggeling
-    # The standard way is to have a POST and DELETE but I didn't want to write AJAX and html doesn't support DELETE for forms
-    user = django.contrib.auth.get_user(request)
-    book = Book.objects.get(book_id=book_id)
+    # POST adds the book, DELETE (or a form's POST with `remove`, html forms can't send DELETE)
+    # takes it off. Repeating either changes nothing, a double click doesn't toggle it back
+    user = request.user
+    book = get_object_or_404(Book, book_id=book_id)
 
-    wobj = Wishlist.objects.filter(user=user, book=book)
-
-    if wobj:
-        wobj.delete()
+    if request.method == "DELETE" or request.POST.get("remove"):
+        Wishlist.objects.filter(user=user, book=book).delete()
     else:
-        Wishlist.objects.create(user=user, book=book)
+        try:
+            with transaction.atomic():
+                # a repeated add, a double click or another tab, fails on
+                # unique_wishlist_user_book and changes nothing
+                Wishlist.objects.create(user=user, book=book)
+        except IntegrityError:
+            pass
+
+    return book_action_response(request, book_id)
+
 
-    return redirect("books")
+class _NoCopyLeft(Exception):
+    # another borrow took the last copy first, raised to roll back the loan and skip the
+    # catalog version bump
+    pass
 
 
 @require_http_methods(["POST", "DELETE"])
 def borrow(request, book_id):
     if request.method == "POST":
-        user = django.contrib.auth.get_user(request)
-        book = Book.objects.get(book_id=book_id)
+        user = request.user
+        book = get_object_or_404(
+            Book.objects.select_related("availability"), book_id=book_id
+        )
 
         if book.availability.available_copies > 0:  # if a book is available to be lend
-            if (
-                not book.borrowed_by.all().filter(user=user.id).exists()
-            ):  # if user has not borrowed the same book before
-                aobj = Availability.objects.get(book=book)
-                aobj.available_copies -= 1
-                aobj.save()
-
-                Borrows.objects.create(book=book, user=user)
-
-    return redirect("books")
+            try:
+                # one version bump for the loan and the copy it takes
+                with batched_catalog_changes(), transaction.atomic():
+                    # unique_active_loan rejects a second active loan of the book, from a
+                    # double click or a concurrent request
+                    Borrows.objects.create(book=book, user=user)
+
+                    # checked and taken in one statement, two borrows of the last copy
+                    # can't both get it
+                    taken = Availability.objects.filter(
+                        book=book, available_copies__gt=0
+                    ).update(available_copies=F("available_copies") - 1)
+                    if not taken:
+                        raise _NoCopyLeft
+            except (IntegrityError, _NoCopyLeft):
+                pass
+
+    return book_action_response(request, book_id)
 
 
 def logout(request):
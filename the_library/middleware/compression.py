@@ -0,0 +1,174 @@
+import gzip
+import secrets
+import string
+import zlib
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import StreamingBuffer, compress_string
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is used without it
+    brotli = None
+
+# formats that are compressed already, another pass only costs CPU
+COMPRESSED_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/pdf",
+    "application/octet-stream",
+)
+BROTLI_QUALITY = 5  # the higher levels are too slow for responses made on the fly
+
+
+def accepted_encodings(header):
+    # "gzip, br;q=0.9, *;q=0" -> {"gzip", "br"}
+    encodings = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip().removeprefix("q=") if "q=" in params else "1"
+        try:
+            if float(quality) > 0:
+                encodings.add(name.strip().lower())
+        except ValueError:
+            pass
+    return encodings
+
+
+class GzipStream:
+    # django's compress_sequence leaves small chunks in zlib's buffer until enough has piled
+    # up, so a streamed page would still arrive in one piece. this flushes after every chunk
+    # (Z_SYNC_FLUSH) and keeps the random file name django puts in the header against BREACH
+
+    def __init__(self, max_random_bytes):
+        self.buffer = StreamingBuffer()
+        name = "".join(
+            secrets.choice(string.ascii_letters)
+            for _ in range(secrets.randbelow(max_random_bytes) + 1)
+        )
+        self.file = gzip.GzipFile(
+            filename=name, mode="wb", compresslevel=6, fileobj=self.buffer, mtime=0
+        )
+
+    def compress(self, chunk):
+        self.file.write(chunk)
+        self.file.flush(zlib.Z_SYNC_FLUSH)
+        return self.buffer.read()
+
+    def finish(self):
+        self.file.close()
+        return self.buffer.read()
+
+
+def brotli_padding(max_random_bytes):
+    # brotli has no file name to randomise like gzip, so against BREACH the stream gets a
+    # metadata meta-block of 1 to max_random_bytes (at most 256) random bytes that decoders
+    # skip (RFC 7932 section 9.2). Its header, least significant bit first: ISLAST 0,
+    # MNIBBLES 0 (11), a reserved 0, MSKIPBYTES 1, the length - 1 in 8 bits, 0s to the byte
+    length = secrets.randbelow(min(max_random_bytes, 256)) + 1
+    header = bytes([0x16 | (length - 1 & 3) << 6, length - 1 >> 2])
+    return header + secrets.token_bytes(length)
+
+
+class BrotliStream:
+    def __init__(self, max_random_bytes):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        # the flush ends the stream header on a byte boundary, where a meta-block can start
+        self.pending = (
+            self.compressor.process(b"")
+            + self.compressor.flush()
+            + brotli_padding(max_random_bytes)
+        )
+
+    def compress(self, chunk):
+        data = self.pending + self.compressor.process(chunk) + self.compressor.flush()
+        self.pending = b""
+        return data
+
+    def finish(self):
+        return self.pending + self.compressor.finish()
+
+
+def compress_stream(stream, sequence):
+    for chunk in sequence:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+async def compress_async_stream(stream, sequence):
+    async for chunk in sequence:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Django's GZipMiddleware, plus brotli when it is installed and accepted, no second
+    compression of content that is compressed already, and streamed responses compressed
+    chunk by chunk so they still arrive incrementally.
+    """
+
+    def process_response(self, request, response):
+        # it's not worth compressing really short responses
+        if not response.streaming and len(response.content) < 200:
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+        if response.get("Content-Type", "").lower().startswith(COMPRESSED_TYPES):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if brotli is not None and "br" in accepted:
+            encoding, stream_class = "br", BrotliStream
+        elif "gzip" in accepted:
+            encoding, stream_class = "gzip", GzipStream
+        else:
+            return response
+
+        if response.streaming:
+            stream = stream_class(self.max_random_bytes)
+            if response.is_async:
+                response.streaming_content = compress_async_stream(
+                    stream, response.streaming_content
+                )
+            else:
+                response.streaming_content = compress_stream(
+                    stream, response.streaming_content
+                )
+            # the compressed size isn't known until the last chunk
+            del response.headers["Content-Length"]
+        else:
+            if encoding == "br":
+                compressed = b"".join(
+                    compress_stream(
+                        BrotliStream(self.max_random_bytes), [response.content]
+                    )
+                )
+            else:
+                compressed = compress_string(
+                    response.content, max_random_bytes=self.max_random_bytes
+                )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(response.content))
+
+        # a strong ETag becomes weak, it still matches conditional requests
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+
+        return response
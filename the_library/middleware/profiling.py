@@ -0,0 +1,73 @@
+import random
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib import auth
+
+from the_library import profiling
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request (see the_library.profiling) when it carries a valid X-Profile token,
+    when a staff user adds ?profile=1, or at random with settings.PROFILING_SAMPLE_RATE.
+    First in the chain, so the other middleware is profiled too. The profile's id is sent
+    back in X-Profile-Id.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        profile = profiling.RequestProfile(settings.PROFILING_INTERVAL)
+        profile.start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            profile.stop()
+            raise
+
+        response.headers["X-Profile-Id"] = profile.id
+        if response.streaming and not response.is_async:
+            # the page is rendered while it is sent, the profile ends with the last chunk
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, profile, trigger
+            )
+        else:
+            self.finish(request, response, profile, trigger)
+        return response
+
+    def trigger(self, request):
+        if profiling.valid_token(request.headers.get("X-Profile", "")):
+            return "token"
+        if request.GET.get("profile") == "1" and self.is_staff(request):
+            return "staff"
+        if settings.PROFILING_SAMPLE_RATE and (
+            random.random() < settings.PROFILING_SAMPLE_RATE
+        ):
+            return "sampled"
+        return None
+
+    def is_staff(self, request):
+        # decided before the profile starts, nobody else gets a sampler thread. The session and
+        # auth middleware have not run yet, the user is loaded the way they will load it
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if session_key is None:
+            return False
+        engine = import_module(settings.SESSION_ENGINE)
+        request.session = engine.SessionStore(session_key)  # replaced by SessionMiddleware
+        return auth.get_user(request).is_staff
+
+    def stream(self, content, request, response, profile, trigger):
+        try:
+            yield from content
+        finally:
+            self.finish(request, response, profile, trigger)
+
+    def finish(self, request, response, profile, trigger):
+        profile.stop()
+        profiling.save_profile(profile, profile.summary(request, response, trigger))
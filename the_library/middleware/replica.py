@@ -0,0 +1,40 @@
+from django.conf import settings
+
+from the_library import replica
+
+
+class ReplicaMiddleware:
+    """
+    Lets the views in settings.REPLICA_READ_VIEWS read the catalog from the replica on
+    GET and HEAD. A request that writes pins its browser to the primary for
+    settings.REPLICA_PIN_SECONDS with a cookie, longer than the replica takes to catch up,
+    so the page a borrow redirects to already shows the loan.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replica.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = replica.finish_request()
+
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in ("GET", "HEAD")
+            and request.resolver_match.url_name in settings.REPLICA_READ_VIEWS
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        ):
+            replica.use_replica()
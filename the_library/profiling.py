@@ -0,0 +1,205 @@
+# per-request profiling, see the_library.middleware.profiling. A background thread samples the
+# stack of the request's thread every PROFILING_INTERVAL seconds. The samples are saved as
+# "folded" stacks (one `frame;frame;frame count` line per stack), the input of flamegraph.pl,
+# speedscope and inferno, next to a json summary of the request. PROFILING_DIR keeps the last
+# PROFILING_MAX_PROFILES of them, older ones are dropped
+
+import collections
+import contextlib
+import functools
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+
+import django.db
+import django.template
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.utils import timezone
+
+TOKEN_SALT = "the_library.profiling"
+PROFILE_ID = re.compile(r"\d+-[0-9a-f]{6}")
+
+OTHER_PHASE = "middleware"  # the handler, the middleware chain and everything else
+
+
+@functools.cache
+def phases():
+    """
+    Where the time of a sample went, decided by the innermost frame from one of these paths.
+    The project's own apps are the views.
+    """
+    return (
+        ("sql", os.path.dirname(django.db.__file__)),
+        ("template", os.path.dirname(django.template.__file__)),
+        *(
+            ("view", app.path)
+            for app in apps.get_app_configs()
+            if app.path.startswith(str(settings.BASE_DIR))
+        ),
+    )
+
+
+def make_token():
+    """
+    A token for the X-Profile header, valid for settings.PROFILING_TOKEN_MAX_AGE seconds.
+    """
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign("profile")
+
+
+def valid_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class RequestProfile:
+    """
+    Samples the stack of the thread that creates it until `stop()`, and times every query
+    that thread runs.
+    """
+
+    def __init__(self, interval):
+        self.id = f"{time.time_ns()}-{secrets.token_hex(3)}"
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = collections.Counter()
+        self.phases = collections.Counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.labels = {}
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.query_timers = contextlib.ExitStack()
+
+    def start(self):
+        self.started_at = timezone.now()
+        self.started = time.perf_counter()
+        for alias in connections:
+            self.query_timers.enter_context(
+                connections[alias].execute_wrapper(self.time_query)
+            )
+        self.sampler.start()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.started
+        self.stopped.set()
+        self.sampler.join()
+        self.query_timers.close()
+
+    def time_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - started
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if not codes:
+                continue
+
+            self.phases[self.phase(codes)] += 1
+            self.stacks[";".join(self.label(code) for code in reversed(codes))] += 1
+
+    def phase(self, codes):
+        for code in codes:  # innermost first
+            for name, path in phases():
+                if code.co_filename.startswith(path):
+                    return name
+        return OTHER_PHASE
+
+    def label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in sorted(sys.path, key=len, reverse=True):
+                if prefix and filename.startswith(prefix):
+                    filename = os.path.relpath(filename, prefix)
+                    break
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(
+                ";", ","
+            )
+            self.labels[code] = label
+        return label
+
+    def summary(self, request, response, trigger):
+        interval_ms = self.interval * 1000
+        return {
+            "id": self.id,
+            "trigger": trigger,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "started": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": sum(self.stacks.values()),
+            "interval_ms": interval_ms,
+            # estimated from the samples, except the exact sql numbers below
+            "phases_ms": {
+                phase: round(self.phases[phase] * interval_ms, 1)
+                for phase in ("middleware", "view", "template", "sql")
+            },
+            "queries": self.queries,
+            "sql_ms": round(self.sql_seconds * 1000, 1),
+        }
+
+    def folded(self):
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+def write_atomically(path, content):
+    temporary = path.with_name(path.name + ".tmp")
+    temporary.write_text(content)
+    os.replace(temporary, path)
+
+
+def save_profile(profile, summary):
+    directory = settings.PROFILING_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    # the summary last, only complete profiles are listed
+    write_atomically(directory / f"{profile.id}.folded", profile.folded())
+    write_atomically(directory / f"{profile.id}.json", json.dumps(summary))
+
+    # ids start with the time, so the oldest sort first
+    summaries = sorted(directory.glob("*.json"))
+    for old in summaries[: max(len(summaries) - settings.PROFILING_MAX_PROFILES, 0)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".folded").unlink(missing_ok=True)
+
+
+def list_profiles():
+    """
+    The summaries of the saved profiles, newest first.
+    """
+    profiles = []
+    for path in sorted(settings.PROFILING_DIR.glob("*.json"), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):  # dropped by another worker meanwhile
+            pass
+    return profiles
+
+
+def folded_path(profile_id):
+    if not PROFILE_ID.fullmatch(profile_id):
+        return None
+    return settings.PROFILING_DIR / f"{profile_id}.folded"
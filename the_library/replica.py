@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# apps whose reads may go to the replica. Sessions and users stay on the primary: a session
+# created at login must be readable by the very next request
+REPLICATED_APPS = {"catalog"}
+
+_state = threading.local()
+
+
+def replica_configured():
+    return settings.REPLICA_DATABASE in connections.settings
+
+
+def start_request():
+    _state.replica_reads = False
+    _state.wrote = False
+
+
+def use_replica():
+    """
+    Lets the rest of the request read from the replica, until it writes.
+    """
+    _state.replica_reads = replica_configured()
+
+
+def finish_request():
+    """
+    Returns whether the request wrote to the primary.
+    """
+    wrote = getattr(_state, "wrote", False)
+    _state.replica_reads = False
+    _state.wrote = False
+    return wrote
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of catalog models to the replica while a request allows it (see
+    the_library.middleware.replica) and every write to the primary. After the first write
+    the rest of the request reads from the primary too, so it sees what it just wrote.
+    Outside requests (commands, tests, shell) everything goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            getattr(_state, "replica_reads", False)
+            and not _state.wrote
+            and model._meta.app_label in REPLICATED_APPS
+        ):
+            return settings.REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # the replica is a copy of the primary, the same rows live in both
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db == settings.REPLICA_DATABASE:
+            return False  # the schema arrives with the copy
+        return None
+
+
+# the files this process has put in WAL mode
+_wal_files = set()
+
+
+@receiver(connection_created)
+def enable_wal(sender, connection, **kwargs):
+    """
+    Puts the SQLite files in WAL mode when a replica is configured, so readers and a writer
+    don't block each other during a copy. The mode is stored in the file, so the PRAGMA only
+    runs on the first connection to each file in a process. Without a replica the journal
+    mode is left as it is.
+    """
+    if (
+        connection.vendor != "sqlite"
+        or connection.is_in_memory_db()
+        or not replica_configured()
+    ):
+        return
+    name = str(connection.settings_dict["NAME"])
+    if name in _wal_files:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    _wal_files.add(name)
+
+
+def copy_database(source="default", target=None):
+    """
+    Copies the primary into the replica with SQLite's online backup API. The copy is one
+    read transaction on the primary: in WAL mode (see enable_wal) it reads a snapshot and
+    writers to the primary carry on, in the rollback journal mode they would wait for the
+    whole copy. The replica is written in WAL mode too, its readers keep reading the old
+    copy until the new one is committed.
+    """
+    target = target or settings.REPLICA_DATABASE
+    for alias in (source, target):
+        if connections[alias].vendor != "sqlite":
+            raise ValueError(f"{alias} is not a SQLite database")
+
+    source_connection = connections[source]
+    source_connection.ensure_connection()
+    # a separate connection, Django's own one to the replica may be in the middle of a request
+    with sqlite3.connect(connections[target].settings_dict["NAME"]) as replica:
+        replica.execute("PRAGMA journal_mode=WAL")
+        source_connection.connection.backup(replica)
+    replica.close()
@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,7 +48,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so everything below it shows up in the profiles
+    "the_library.middleware.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # compresses what the middleware below and the views return, streamed responses included
+    "the_library.middleware.compression.CompressionMiddleware",
+    # outside the session middleware, so the session saved on login counts as a write
+    "the_library.middleware.replica.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -84,6 +94,100 @@ DATABASES = {
     }
 }
 
+# Read replica, a copy of the primary kept up to date with
+# `manage.py refresh_replica --watch 2`. The catalog views below read from it,
+# everything else and every write go to "default" (see the_library.replica)
+REPLICA_DATABASE = "replica"
+REPLICA_READ_VIEWS = ["index", "books", "books_search", "popular_books"]
+# a browser that wrote reads from the primary for this long, the replica has caught up by then
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = "pin_primary"
+
+if os.environ.get("LIBRARY_REPLICA_DB"):
+    DATABASES[REPLICA_DATABASE] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ["LIBRARY_REPLICA_DB"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["the_library.replica.ReplicaRouter"]
+
+
+# A cache shared by all worker processes, LIBRARY_CACHE_URL=redis://127.0.0.1:6379/0 (needs
+# the redis package) or memcached://127.0.0.1:11211 (needs pymemcache). Without one every
+# process has a LocMemCache of its own
+CACHE_URL = urlsplit(os.environ.get("LIBRARY_CACHE_URL", ""))
+
+if CACHE_URL.scheme in ("redis", "rediss"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL.geturl(),
+        }
+    }
+elif CACHE_URL.scheme == "memcached":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": CACHE_URL.netloc,
+        }
+    }
+elif CACHE_URL.scheme:
+    raise ImproperlyConfigured(
+        f"LIBRARY_CACHE_URL must be a redis:// or memcached:// url, not {CACHE_URL.scheme}://"
+    )
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "the-library",
+        }
+    }
+
+SHARED_CACHE = bool(CACHE_URL.scheme)
+
+
+# Sessions and authentication
+# Every request used to cost a session query plus an auth_user query before any catalog work.
+# "cached_db" reads sessions from the cache and keeps the database as the source of truth,
+# "signed_cookies" doesn't store sessions at all.
+# Caching sessions and users needs the shared cache: a logout, password change or deactivation
+# only drops the cached entry in the cache it runs against, with a LocMemCache per process the
+# other workers would keep accepting the old session and user. So without a shared cache
+# sessions live in the database and every request loads the user.
+
+SESSION_ENGINE = os.environ.get(
+    "LIBRARY_SESSION_ENGINE",
+    (
+        "django.contrib.sessions.backends.cached_db"
+        if SHARED_CACHE
+        else "django.contrib.sessions.backends.db"
+    ),
+)
+
+AUTHENTICATION_BACKENDS = [
+    (
+        "catalog.backends.CachedModelBackend"
+        if SHARED_CACHE
+        else "django.contrib.auth.backends.ModelBackend"
+    )
+]
+
+# seconds a logged-in user stays cached, it is dropped earlier when the user is saved
+USER_CACHE_TIMEOUT = 300
+
+# Shared read-only catalog snapshot, mapped by every worker (see catalog.snapshot).
+# Disabled unless a path is set, build it with `manage.py build_catalog_snapshot --watch 2`
+CATALOG_SNAPSHOT_PATH = os.environ.get("LIBRARY_CATALOG_SNAPSHOT") or None
+
+# Per-request profiling (see the_library.profiling). A request is profiled when it sends an
+# X-Profile token from the staff "Profiles" page, when a staff user adds ?profile=1 to the URL,
+# or at random with PROFILING_SAMPLE_RATE (0.01 profiles one request in a hundred)
+PROFILING_DIR = Path(os.environ.get("LIBRARY_PROFILING_DIR", BASE_DIR / "profiles"))
+PROFILING_MAX_PROFILES = 200  # the oldest ones are dropped
+PROFILING_SAMPLE_RATE = float(os.environ.get("LIBRARY_PROFILING_RATE", "0"))
+PROFILING_INTERVAL = 0.001  # seconds between two samples of the stack
+PROFILING_TOKEN_MAX_AGE = 3600
 
 
 # Internationalization